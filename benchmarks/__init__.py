@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of building, solving and processing solph models.
+
+:mod:`benchmarks.generator` creates synthetic energy systems of adjustable
+size and structure, :mod:`benchmarks.run` times the stages from creating
+such a system to processing the results of its model and compares the
+timings against a stored baseline. Run the suite from the root of the
+repository with::
+
+    python -m benchmarks
+
+See `python -m benchmarks --help` for the options. The benchmarks aren't
+installed with oemof.
+"""
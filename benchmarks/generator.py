@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Generate synthetic solph energy systems for benchmarks.
+"""
+
+import numpy as np
+import pandas as pd
+
+import oemof.solph as solph
+
+
+def synthetic_system(regions=4, fan_in=3, arity=1, storages=1, chps=1,
+                     nonconvex=0, periods=24, seed=0):
+    """ Create a synthetic energy system of `regions` connected regions.
+
+    Every region has an electricity bus fed by `fan_in` power plants, a
+    curtailable wind source, a fixed demand and `storages` storages, as well
+    as slack sources and sinks with high costs keeping the model feasible.
+    The power plants burn `arity` fuels at once, i.e. they are transformers
+    with `arity` inputs, the fuels being supplied to all regions by one source
+    each. The first `nonconvex` power plants of every region have nonconvex
+    output flows with a minimum load, turning the model into a mixed integer
+    problem. If `chps` is positive, every region also has a heat bus with a
+    heat demand, a boiler and `chps` extraction CHPs. The regions are
+    connected in a ring by lines in both directions.
+
+    Parameters
+    ----------
+    regions : int
+        The number of regions.
+    fan_in : int
+        The number of power plants per region.
+    arity : int
+        The number of inputs of the power plants.
+    storages : int
+        The number of storages per region.
+    chps : int
+        The number of CHPs per region.
+    nonconvex : int
+        The number of power plants per region with a nonconvex output flow.
+    periods : int
+        The number of hourly timesteps.
+    seed : int
+        The seed of the random capacities, costs and profiles.
+
+    Returns
+    -------
+    :class:`EnergySystem <oemof.solph.network.EnergySystem>`
+
+    Examples
+    --------
+    >>> es = synthetic_system(regions=2, fan_in=2, periods=3)
+    >>> len(es.nodes), len(es.flows())
+    (30, 39)
+    """
+    if chps and not arity:
+        raise ValueError("CHPs need at least one fuel, i.e. an arity of at "
+                         "least one.")
+    rng = np.random.RandomState(seed)
+    timeindex = pd.date_range('1/1/2017', periods=periods, freq='H')
+    hours = np.arange(periods)
+    es = solph.EnergySystem(timeindex=timeindex)
+
+    with es.active():
+        fuels = []
+        for k in range(arity):
+            fuel = solph.Bus(label='fuel_{}'.format(k))
+            solph.Source(label='fuel_{}_supply'.format(k), outputs={
+                fuel: solph.Flow(variable_costs=20 + 5 * k)})
+            fuels.append(fuel)
+
+        electricity = []
+        for r in range(regions):
+            el = solph.Bus(label='el_{}'.format(r))
+            electricity.append(el)
+            # a daily demand cycle, shifted per region
+            demand = 0.6 + 0.3 * np.sin(2 * np.pi * (hours + 3 * r) / 24)
+            peak = 100 * fan_in
+            solph.Sink(label='demand_el_{}'.format(r), inputs={
+                el: solph.Flow(nominal_value=peak,
+                               actual_value=demand.tolist(), fixed=True)})
+            solph.Source(label='wind_{}'.format(r), outputs={el: solph.Flow(
+                nominal_value=peak * rng.uniform(0.2, 0.6),
+                max=rng.uniform(0, 1, periods).tolist())})
+            solph.Source(label='shortage_el_{}'.format(r), outputs={
+                el: solph.Flow(variable_costs=1e4)})
+            solph.Sink(label='excess_el_{}'.format(r), inputs={
+                el: solph.Flow(variable_costs=1e3)})
+
+            for i in range(fan_in):
+                output = dict(nominal_value=rng.uniform(50, 150),
+                              variable_costs=rng.uniform(0, 5))
+                if i < nonconvex:
+                    output.update(min=0.4, nonconvex=solph.NonConvex())
+                shares = rng.uniform(0.5, 1, arity)
+                conversion_factors = {el: rng.uniform(0.3, 0.5)}
+                conversion_factors.update(zip(fuels, shares / shares.sum()))
+                solph.Transformer(
+                    label='pp_{}_{}'.format(r, i),
+                    inputs={fuel: solph.Flow() for fuel in fuels},
+                    outputs={el: solph.Flow(**output)},
+                    conversion_factors=conversion_factors)
+
+            for i in range(storages):
+                solph.components.GenericStorage(
+                    label='storage_{}_{}'.format(r, i),
+                    inputs={el: solph.Flow(variable_costs=0.1)},
+                    outputs={el: solph.Flow()},
+                    nominal_capacity=rng.uniform(100, 400),
+                    capacity_loss=0.001, initial_capacity=0.5,
+                    nominal_input_capacity_ratio=1/6,
+                    nominal_output_capacity_ratio=1/6,
+                    inflow_conversion_factor=0.95,
+                    outflow_conversion_factor=0.95)
+
+            if chps:
+                th = solph.Bus(label='th_{}'.format(r))
+                heat = 0.5 + 0.4 * np.cos(2 * np.pi * hours / 24)
+                solph.Sink(label='demand_th_{}'.format(r), inputs={
+                    th: solph.Flow(nominal_value=50 * chps,
+                                   actual_value=heat.tolist(), fixed=True)})
+                solph.Transformer(
+                    label='boiler_{}'.format(r),
+                    inputs={fuels[0]: solph.Flow()},
+                    outputs={th: solph.Flow(nominal_value=50 * chps,
+                                            variable_costs=10)},
+                    conversion_factors={th: 0.9})
+                solph.Sink(label='excess_th_{}'.format(r), inputs={
+                    th: solph.Flow(variable_costs=1e3)})
+                for i in range(chps):
+                    solph.components.VariableFractionTransformer(
+                        label='chp_{}_{}'.format(r, i),
+                        inputs={fuels[0]: solph.Flow(
+                            nominal_value=rng.uniform(100, 200))},
+                        outputs={el: solph.Flow(), th: solph.Flow()},
+                        conversion_factors={el: 0.3, th: 0.5},
+                        conversion_factor_single_flow={el: 0.5})
+
+        # connect neighbouring regions in a ring, or two regions once
+        pairs = [(r, (r + 1) % regions) for r in range(regions)]
+        for a, b in pairs[:regions if regions > 2 else regions - 1]:
+            for source, target in ((a, b), (b, a)):
+                solph.Transformer(
+                    label='line_{}_{}'.format(source, target),
+                    inputs={electricity[source]: solph.Flow()},
+                    outputs={electricity[target]: solph.Flow(
+                        nominal_value=100, variable_costs=0.01)},
+                    conversion_factors={electricity[target]: 0.97})
+
+    return es
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Time building, solving and processing the models of synthetic energy systems.
+
+Every case of :data:`CASES` is run through the following stages, each of
+which is timed with :mod:`oemof.tools.timing`:
+
+construction
+    Creating the energy system with
+    :func:`benchmarks.generator.synthetic_system`.
+grouping
+    Grouping its nodes, i.e. accessing its groups for the first time.
+OperationalModel
+    Building the model, including the stages of building the blocks.
+write
+    Writing the model as an LP file.
+solve
+    Solving the model, including writing the problem, running the solver and
+    loading its results.
+results
+    Processing the results with :func:`processing.results
+    <oemof.outputlib.processing.results>`.
+
+The results are written as JSON and can be compared against a baseline
+written the same way. Stages slower than in the baseline by more than a
+tolerance count as regressions.
+"""
+
+from collections import OrderedDict
+from tempfile import TemporaryDirectory
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+
+import pandas as pd
+from pyomo.opt import SolverFactory
+
+import oemof
+import oemof.solph as solph
+from oemof.outputlib import processing
+from oemof.tools import timing
+from benchmarks.generator import synthetic_system
+
+
+#: The benchmarked cases, mapping names to the parameters of
+#: :func:`benchmarks.generator.synthetic_system`.
+CASES = OrderedDict([
+    ('dispatch', dict(regions=8, fan_in=4, arity=1, storages=1, chps=1,
+                      periods=48)),
+    ('multi_fuel', dict(regions=4, fan_in=8, arity=3, storages=0, chps=0,
+                        periods=48)),
+    ('long_horizon', dict(regions=2, fan_in=3, arity=1, storages=1, chps=1,
+                          periods=720)),
+    ('unit_commitment', dict(regions=3, fan_in=4, arity=1, storages=1,
+                             chps=0, nonconvex=2, periods=24)),
+])
+
+#: The path of the stored baseline.
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'baseline.json')
+
+
+def run_case(parameters, solver='cbc', repeat=3):
+    """ Run the stages of one case `repeat` times.
+
+    The model is only solved and its results are processed if `solver` is
+    available. Returns a dictionary holding the `'parameters'`, the
+    `'size'` of the energy system and the model and the `'timings'` of all
+    stages and the stages nested in them, the shortest of all repetitions
+    in seconds.
+    """
+    solve = SolverFactory(solver).available(exception_flag=False)
+    timings = {}
+    for _ in range(repeat):
+        gc.collect()
+        timing.reset()
+        timing.enable()
+        try:
+            with timing.timed('construction'):
+                es = synthetic_system(**parameters)
+            with timing.timed('grouping'):
+                es.groups
+            om = solph.OperationalModel(es)
+            with TemporaryDirectory() as path, timing.timed('write'):
+                om.write(os.path.join(path, 'model.lp'),
+                         io_options={'symbolic_solver_labels': False})
+            if solve:
+                om.solve(solver=solver)
+                processing.results(om)
+        finally:
+            timing.disable()
+        for stage, seconds in timing.report()['total'].items():
+            timings[stage] = min(seconds, timings.get(stage, seconds))
+    timing.reset()
+
+    size = (processing.meta_results(om)['size'] if solve
+            else processing._model_size(om, None))
+    size.update(nodes=len(es.nodes), flows=len(es.flows()))
+    return {'parameters': parameters, 'size': size, 'timings': timings}
+
+
+def run(cases=None, solver='cbc', repeat=3):
+    """ Run the `cases`, given by their names in :data:`CASES`, or all
+    cases.
+
+    Returns a dictionary holding the results of :func:`run_case` by case
+    in `'cases'`, along with the versions of oemof and Python, the platform
+    and the solver.
+    """
+    if cases is None:
+        cases = list(CASES)
+    available = SolverFactory(solver).available(exception_flag=False)
+    # warm up, so that the first case isn't timed with one-off costs like
+    # loading the solver plugins
+    run_case(dict(regions=1, fan_in=1, periods=2), solver, 1)
+    return {'oemof': oemof.__version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'solver': solver if available else None,
+            'cases': OrderedDict((name, run_case(CASES[name], solver, repeat))
+                                 for name in cases)}
+
+
+def compare(results, baseline, tolerance=0.3, threshold=0.1):
+    """ Compare the timings of the stages in `results` to `baseline`.
+
+    Only the cases run with the same parameters in both are compared.
+    Returns a :class:`pandas.DataFrame` with a row per case and stage, the
+    stages nested in others excluded, holding the seconds taken in the
+    `'baseline'` and `'current'` run, their `'ratio'` and whether the stage
+    is a `'regression'`. A stage is, if it is slower than in the baseline by
+    more than the relative `tolerance` and the absolute `threshold` in
+    seconds.
+    """
+    rows = []
+    for name, case in results['cases'].items():
+        base = baseline['cases'].get(name)
+        if base is None or base['parameters'] != case['parameters']:
+            continue
+        for stage, current in case['timings'].items():
+            if '/' in stage or stage not in base['timings']:
+                continue
+            before = base['timings'][stage]
+            rows.append((name, stage, before, current,
+                         current / before if before else float('nan'),
+                         current > before * (1 + tolerance) and
+                         current - before > threshold))
+    return pd.DataFrame(rows, columns=['case', 'stage', 'baseline',
+                                       'current', 'ratio', 'regression'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description="Time building, solving and processing solph models of "
+                    "synthetic energy systems.")
+    parser.add_argument('cases', nargs='*',
+                        help="The cases to run, all by default. One or more "
+                             "of: {}.".format(', '.join(CASES)))
+    parser.add_argument('--solver', default='cbc',
+                        help="The solver to use, e.g. 'cbc' or 'glpk'.")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Run every case this many times and keep the "
+                             "shortest times.")
+    parser.add_argument('--output', help="Write the results to this file.")
+    parser.add_argument('--baseline', default=BASELINE,
+                        help="Compare to the results in this file.")
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help="The relative slowdown considered a "
+                             "regression.")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Write the results to the baseline file.")
+    arguments = parser.parse_args(argv)
+    unknown = [c for c in arguments.cases if c not in CASES]
+    if unknown:
+        parser.error("unknown cases: {}".format(', '.join(unknown)))
+
+    results = run(arguments.cases or None, arguments.solver,
+                  arguments.repeat)
+    for path in filter(None, (arguments.output, arguments.update_baseline and
+                              arguments.baseline)):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if arguments.update_baseline or not os.path.isfile(arguments.baseline):
+        return 0
+    with open(arguments.baseline) as f:
+        comparison = compare(results, json.load(f), arguments.tolerance)
+    with pd.option_context('display.width', 120):
+        print(comparison.to_string(index=False))
+    return int(comparison['regression'].any())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
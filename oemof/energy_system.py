@@ -1,15 +1,137 @@
 # -*- coding: utf-8 -*-
 
-from functools import partial
+try:
+    from collections.abc import Iterable, MutableMapping as MuMa
+except ImportError:
+    from collections import Iterable, MutableMapping as MuMa
+from contextlib import contextmanager
+from copy import copy
+from weakref import WeakSet, ref
 import logging
 import os
+import time
+
+import numpy as np
 import pandas as pd
 
 import dill as pickle
 
 from oemof.network import Entity
 from oemof.groupings import DEFAULT as BY_UID, Grouping, Nodes
-from oemof.network import Node
+from oemof.network import Adjacency, Node, flow
+from oemof import persistence
+from oemof.tools import timing
+
+
+class _FlowCache:
+    """ Caches the flows of an energy system until they change.
+
+    The cache is dropped when a flow starting at one of the energy system's
+    nodes is set or removed, or when nodes are added to or removed from the
+    energy system.
+    """
+    def __init__(self, energy_system):
+        self._energy_system = ref(energy_system)
+        self._ref = ref(self)
+        self.clear()
+
+    def clear(self):
+        self._nodes = None
+        self._length = None
+        self._sources = set()
+        self._flows = None
+        self._arrays = None
+
+    def _edge_set(self, source, target, new):
+        if source in self._sources:
+            self.clear()
+
+    def _edge_removed(self, source, target):
+        if source in self._sources:
+            self.clear()
+
+    def flows(self):
+        energy_system = self._energy_system()
+        nodes = energy_system.nodes
+        if (self._flows is None or nodes is not self._nodes or
+                len(nodes) != self._length):
+            self.clear()
+            # Activating the energy system makes sure the flows of forks
+            # are seen, no matter which energy system is currently active.
+            with energy_system.active():
+                self._flows = {(source, target): source.outputs[target]
+                               for source in nodes
+                               for target in source.outputs}
+            self._nodes, self._length = nodes, len(nodes)
+            self._sources = set(nodes)
+            flow._watch(nodes, self._ref)
+        return self._flows
+
+    def arrays(self):
+        flows = self.flows()
+        if self._arrays is None:
+            adjacency = self._energy_system().adjacency
+            adjacency._sync()
+            ids = adjacency._ids
+            sources = np.fromiter((ids[s] for s, _ in flows), dtype=np.intp,
+                                  count=len(flows))
+            targets = np.fromiter((ids.get(t, -1) for _, t in flows),
+                                  dtype=np.intp, count=len(flows))
+            objects = np.empty(len(flows), dtype=object)
+            objects[:] = list(flows.values())
+            order = np.lexsort((targets, sources))
+            self._arrays = (sources[order], targets[order], objects[order])
+        return self._arrays
+
+
+class _CopyOnWriteGroups(MuMa):
+    """ The groups of a forked energy system.
+
+    Reads fall through to the groups of the base energy system, unless the
+    fork changed or deleted the group. While :attr:`writing` is set, groups
+    read from the base energy system are copied into the fork first, so
+    that groupings merging into them in place don't change the base.
+    """
+    def __init__(self, base):
+        self._base = base
+        self._local = {}
+        self._deleted = set()
+        self.writing = False
+
+    def __contains__(self, key):
+        return key in self._local or (key not in self._deleted and
+                                      key in self._base)
+
+    def __getitem__(self, key):
+        if key in self._local:
+            return self._local[key]
+        if key in self._deleted:
+            raise KeyError(key)
+        group = self._base[key]
+        if self.writing and isinstance(group, Iterable):
+            group = self._local[key] = copy(group)
+        return group
+
+    def __setitem__(self, key, group):
+        self._local[key] = group
+        self._deleted.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._local.pop(key, None)
+        if key in self._base:
+            self._deleted.add(key)
+
+    def __iter__(self):
+        for key in self._local:
+            yield key
+        for key in self._base:
+            if key not in self._local and key not in self._deleted:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
 
 
 class EnergySystem:
@@ -62,6 +184,17 @@ class EnergySystem:
         Define the time range and increment for the energy system. This is an
         optional atribute but might be import for other functions/methods that
         use the EnergySystem class as an input parameter.
+    adjacency : :class:`Adjacency <oemof.network.Adjacency>`
+        An index of the flows between the nodes of this energy system for fast
+        (vectorized) graph queries. Created on first access and kept up to
+        date afterwards.
+
+    Notes
+    -----
+    The registry is local to the current thread and context, so creating an
+    :class:`EnergySystem` in one thread doesn't affect nodes created in
+    another one. Use :meth:`active` to temporarily switch the registry to an
+    existing energy system.
 
 
     .. _energy-system-examples:
@@ -95,8 +228,33 @@ class EnergySystem:
     >>> components == es.groups[Sink]
     True
 
+    Nodes are added to the energy system which was created last in the
+    current thread, unless another one is explicitly made :meth:`active`:
+
+    >>> first, second = EnergySystem(), EnergySystem()
+    >>> with first.active():
+    ...     bus = Bus(label="first's bus")
+    >>> bus in first.nodes, bus in second.nodes
+    (True, False)
+
     """
+    # The energy system this one was forked from and the flows replacing
+    # the base energy system's flows in this one. See :meth:`fork`.
+    _base = None
+    _flow_overrides = None
+    # The live forks of this energy system, which share its nodes and flows.
+    _forks = ()
+    # The defaults for energy systems restored from dumps written before
+    # grouping was deferred and construction was timed.
+    _ungrouped = ()
+    _construction = 0.
+    # Nodes removed from the energy system but not yet from the list of
+    # entities, see :attr:`entities`.
+    _removed = frozenset()
+
+    @timing.timed('EnergySystem')
     def __init__(self, **kwargs):
+        start = time.perf_counter()
         for attribute in ['entities']:
             setattr(self, attribute, kwargs.get(attribute, []))
 
@@ -106,45 +264,291 @@ class EnergySystem:
         self._groupings = ([BY_UID] +
                            [g if isinstance(g, Grouping) else Nodes(g)
                             for g in kwargs.get('groupings', [])])
-        for e in self.entities:
-            for g in self._groupings:
-                g(e, self.groups)
+        self._ungrouped = list(self.entities)
         self.results = kwargs.get('results')
         self.timeindex = kwargs.get('timeindex',
                                     pd.date_range(start=pd.to_datetime('today'),
                                                   periods=1, freq='H'))
+        # The seconds spent constructing the energy system, registering and
+        # grouping its nodes, see :func:`processing.meta_results
+        # <oemof.outputlib.processing.meta_results>`.
+        self._construction = time.perf_counter() - start
+
+    @contextmanager
+    def active(self):
+        """ Make this energy system the registry for the `with` block.
 
-    @staticmethod
-    def _regroup(entity, groups, groupings):
-        for g in groupings:
-            g(entity, groups)
-        return groups
+        Nodes and entities created inside the block are added to this
+        energy system. The previous registry is restored on exit. Only the
+        current thread (or context) is affected.
+
+        If this energy system is a :meth:`fork`, looking up flows via
+        :attr:`Node.inputs <oemof.network.Node.inputs>` and
+        :attr:`Node.outputs <oemof.network.Node.outputs>` inside the block
+        returns the fork's flows.
+        """
+        node_token = Node._registry.set(self)
+        entity_token = Entity._registry.set(self)
+        overlay_token = flow._overlay.set(self._flow_overrides)
+        try:
+            yield self
+        finally:
+            flow._overlay.reset(overlay_token)
+            Entity._registry.reset(entity_token)
+            Node._registry.reset(node_token)
+
+    def _check_not_forked(self):
+        if self._base is not None:
+            raise TypeError("Nodes can't be added to or removed from a fork "
+                            "of an energy system. Only its flows can be "
+                            "changed, using `modify_flow`.")
+        self._check_no_forks()
+
+    def _check_no_forks(self):
+        if self._forks:
+            raise TypeError("The nodes and flows of an energy system can't be "
+                            "changed while forks of it exist, as the forks "
+                            "share them.")
 
     def add(self, entity):
         """ Add an `entity` to this energy system.
+
+        Grouping `entity` is deferred until :attr:`groups` is accessed the
+        next time. See :meth:`add_many`.
         """
+        start = time.perf_counter()
+        self._check_not_forked()
         self.entities.append(entity)
-        self._groups = partial(self._regroup, entity, self.groups,
-                               self._groupings)
+        self.__dict__.setdefault('_ungrouped', []).append(entity)
+        self._construction += time.perf_counter() - start
+
+    def add_many(self, entities):
+        """ Add all of `entities` to this energy system.
+
+        Like with :meth:`add`, the groupings are only evaluated when
+        :attr:`groups` is accessed the next time. They are then evaluated in
+        one pass over all entities added since the last access and merged
+        into the existing groups in place. As long as the groupings don't
+        depend on the order in which entities are grouped, the resulting
+        :attr:`groups` are the same as if every entity had been grouped
+        immediately.
+        """
+        start = time.perf_counter()
+        self._check_not_forked()
+        entities = list(entities)
+        self.entities.extend(entities)
+        self.__dict__.setdefault('_ungrouped', []).extend(entities)
+        self._construction += time.perf_counter() - start
+
+    def _ungroup(self, entities):
+        for e in entities:
+            for g in self._groupings:
+                g.remove(e, self._groups)
+
+    @timing.timed('groupings')
+    def _regroup(self, entities):
+        start = time.perf_counter()
+        for e in entities:
+            for g in self._groupings:
+                g(e, self._groups)
+        self._construction += time.perf_counter() - start
+
+    def remove(self, node):
+        """ Remove `node` and all of its flows from this energy system.
+
+        The :attr:`groups` are updated incrementally. To do so, `node` and its
+        neighbours are removed from their groups before the flows are deleted
+        and the neighbours are grouped again afterwards. This assumes that the
+        groups a node contributes to only depend on the node itself and its
+        flows, which holds for all groupings shipped with oemof.
+        """
+        self._check_not_forked()
+        self.groups
+        adjacency = self.adjacency
+        neighbours = [n for n in set(node.inputs).union(node.outputs)
+                      if n is not node and n in adjacency]
+        self._ungroup([node] + neighbours)
+        for source in list(node.inputs):
+            del node.inputs[source]
+        for target in list(node.outputs):
+            del node.outputs[target]
+        # the list of entities is only compacted on its next access, so
+        # removing many nodes takes one pass over it instead of one each
+        self.__dict__.setdefault('_removed', set()).add(node)
+        adjacency._node_removed(node)
+        self._regroup(neighbours)
+
+    def remove_flow(self, source, target):
+        """ Remove the flow from `source` to `target`.
+
+        Only the groups of `source` and `target` are updated, see
+        :meth:`remove`.
+        """
+        self._check_not_forked()
+        self.groups
+        adjacency = self.adjacency
+        endpoints = [n for n in set((source, target)) if n in adjacency]
+        self._ungroup(endpoints)
+        del source.outputs[target]
+        self._regroup(endpoints)
+
+    def fork(self):
+        """ Return a copy-on-write copy of this energy system.
+
+        The fork shares the nodes, flows and groups of this energy system.
+        Changing a flow via :meth:`modify_flow` replaces it with a modified
+        copy in the fork only, and only the groups containing the flow are
+        copied, so the memory used by a fork grows with the number of changes
+        instead of the size of the energy system. Build a model from the fork
+        like from any other energy system.
+
+        Sequences of a flow are shared between the fork and this energy
+        system, too, so replace them via :meth:`modify_flow` instead of
+        changing them in place. Nodes can't be added to or removed from a
+        fork. As long as the fork exists, this energy system can't be changed
+        via :meth:`add`, :meth:`remove`, :meth:`remove_flow` or
+        :meth:`modify_flow` either, so the fork stays a snapshot of it.
+        Changes made directly to the shared nodes, e.g. to their
+        :attr:`outputs <oemof.network.Node.outputs>`, affect both.
+        """
+        groups = self.groups
+        start = time.perf_counter()
+        fork = copy(self)
+        fork._base = self
+        fork.__dict__.pop('_forks', None)
+        self.__dict__.setdefault('_forks', WeakSet()).add(fork)
+        fork._groups = _CopyOnWriteGroups(groups)
+        fork._ungrouped = []
+        fork._flow_overrides = dict(self._flow_overrides or {})
+        fork._flows = None
+        fork.results = None
+        fork._construction = time.perf_counter() - start
+        return fork
+
+    def _copy_flow(self, flow, attributes):
+        """ Return a copy of `flow` with the given `attributes` changed.
+        """
+        flow = copy(flow)
+        for attribute, value in attributes.items():
+            setattr(flow, attribute, value)
+        return flow
+
+    def modify_flow(self, source, target, **attributes):
+        """ Replace the flow from `source` to `target` with a modified copy.
+
+        The keyword arguments are set as attributes of the copy, which is
+        returned. If this energy system is a :meth:`fork`, the copy is only
+        used by the fork. Otherwise it replaces the flow for every energy
+        system containing `source`. Like with :meth:`remove_flow`, only the
+        groups of `source` and `target` are updated.
+        """
+        self._check_no_forks()
+        self.groups
+        endpoints = [n for n in set((source, target)) if n in self.adjacency]
+        with self.active():
+            modified = self._copy_flow(source.outputs[target], attributes)
+            if self._base is None:
+                self._ungroup(endpoints)
+                source.outputs[target] = modified
+                self._regroup(endpoints)
+                return modified
+            self._groups.writing = True
+            try:
+                self._ungroup(endpoints)
+                self._flow_overrides[source, target] = modified
+                self._regroup(endpoints)
+            finally:
+                self._groups.writing = False
+        self._flows = None
+        return modified
 
     @property
     def groups(self):
-        while callable(self._groups):
-            self._groups = self._groups()
+        if self._ungrouped:
+            ungrouped, self._ungrouped = self._ungrouped, []
+            self._regroup(ungrouped)
         return self._groups
 
+    @property
+    def entities(self):
+        if self._removed:
+            removed, self._removed = self._removed, set()
+            self._entities[:] = [e for e in self._entities
+                                 if e not in removed]
+        return self._entities
+
+    @entities.setter
+    def entities(self, value):
+        self._entities = value
+        self._removed = set()
+
     @property
     def nodes(self):
         return self.entities
 
+    @property
+    def adjacency(self):
+        if self.__dict__.get('_adjacency') is None:
+            self._adjacency = Adjacency(self)
+        return self._adjacency
+
     @nodes.setter
     def nodes(self, value):
         self.entities = value
 
+    def _flow_cache(self):
+        if self.__dict__.get('_flows') is None:
+            self._flows = _FlowCache(self)
+        return self._flows
+
     def flows(self):
-        return {(source, target): source.outputs[target]
-                for source in self.nodes
-                for target in source.outputs}
+        """ Return a dictionary mapping `(source, target)` to flows.
+
+        Contains all flows starting at one of this energy system's nodes. The
+        result is cached until the flows or the nodes of the energy system
+        change, so calling this repeatedly is cheap. You get a new
+        :class:`dict` on every call, which is safe to modify.
+        """
+        return dict(self._flow_cache().flows())
+
+    def flow_arrays(self):
+        """ Return the flows of this energy system as three aligned arrays.
+
+        The first two arrays contain the :attr:`adjacency` ids of the source
+        and target nodes, with `-1` marking targets which aren't part of this
+        energy system, and the third one is an object array of the flows.
+        Flows are sorted by source and target id, so the order is stable as
+        long as the energy system doesn't change. Like :meth:`flows`, the
+        arrays are cached and should be treated as read only.
+        """
+        return self._flow_cache().arrays()
+
+    def save(self, path):
+        """ Store this energy system in the directory `path`.
+
+        Unlike :meth:`dump`, this uses the columnar format described in
+        :mod:`oemof.persistence`. Nodes, flows and the :attr:`timeindex` are
+        stored, while groups are rebuilt by :meth:`load` and results aren't
+        stored at all.
+        """
+        persistence.save(self, path)
+
+    @classmethod
+    @timing.timed('EnergySystem.load')
+    def load(cls, path, mmap=True, **kwargs):
+        """ Create an energy system from the nodes stored in `path`.
+
+        The keyword arguments are passed on to the constructor, e.g. to
+        supply `groupings`, and override the stored attributes. Sequences of
+        numbers are loaded as :class:`numpy arrays <numpy.ndarray>`, which are
+        memory mapped unless `mmap` is `False`. See :func:`persistence.load
+        <oemof.persistence.load>`.
+        """
+        nodes, attributes = persistence.load(path, mmap=mmap)
+        attributes.update(kwargs)
+        energy_system = cls(**attributes)
+        energy_system.add_many(nodes)
+        return energy_system
 
     def dump(self, dpath=None, filename=None):
         r""" Dump an EnergySystem instance.
@@ -160,7 +564,14 @@ class EnergySystem:
         if filename is None:
             filename = 'es_dump.oemof'
 
-        pickle.dump(self.__dict__, open(os.path.join(dpath, filename), 'wb'))
+        # The adjacency index and the flows are only cached and get rebuilt
+        # on demand.
+        self.entities
+        state = {k: v for k, v in self.__dict__.items()
+                 if k not in ('_adjacency', '_flows', '_entities',
+                              '_removed', '_forks')}
+        state['entities'] = self._entities
+        pickle.dump(state, open(os.path.join(dpath, filename), 'wb'))
 
         msg = ('Attributes dumped to: {0}'.format(os.path.join(
             dpath, filename)))
@@ -178,7 +589,10 @@ class EnergySystem:
         if filename is None:
             filename = 'es_dump.oemof'
 
-        self.__dict__ = pickle.load(open(os.path.join(dpath, filename), "rb"))
+        state = pickle.load(open(os.path.join(dpath, filename), "rb"))
+        entities = state.pop('entities')
+        self.__dict__ = state
+        self.entities = entities
         msg = ('Attributes restored from: {0}'.format(os.path.join(
             dpath, filename)))
         logging.debug(msg)
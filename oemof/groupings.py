@@ -6,6 +6,7 @@ try:
 except ImportError:
     from collections import (Hashable, Iterable, Mapping,
                              MutableMapping as MuMa)
+from copy import copy
 from itertools import chain, filterfalse
 
 
@@ -16,10 +17,12 @@ class Grouping:
     :attr:`groups <oemof.core.energy_system.EnergySystem.groups>`.
 
     The way :class:`Groupings <Grouping>` work is that each :class:`Grouping`
-    :obj:`g` of an energy system is called whenever an :class:`entity
-    <oemof.core.network.Entity>` is added to the energy system (and for each
+    :obj:`g` of an energy system is called for every :class:`entity
+    <oemof.core.network.Entity>` added to the energy system (and for each
     :class:`entity <oemof.core.network.Entity>` already present, if the energy
-    system is created with existing enties).
+    system is created with existing enties). This happens lazily, i.e. the
+    next time the :attr:`groups
+    <oemof.core.energy_system.EnergySystem.groups>` are accessed.
     The call :obj:`g(e, groups)`, where :obj:`e` is an :class:`entity
     <oemof.core.network.Entity>` and :attr:`groups
     <oemof.core.energy_system.EnergySystem.groups>` is a dictionary mapping
@@ -84,6 +87,10 @@ class Grouping:
 
         Overrides the default behaviour of :meth:`merge <Grouping.merge>`.
 
+    unmerge: callable, optional
+
+        Overrides the default behaviour of :meth:`unmerge <Grouping.unmerge>`.
+
     """
 
     def __init__(self, key=None, constant_key=None, filter=None, **kwargs):
@@ -100,7 +107,7 @@ class Grouping:
                 "Grouping constructor missing required argument: " +
                 "one of `key` or `constant_key`.")
         self.filter = filter
-        for kw in ["value", "merge", "filter"]:
+        for kw in ["value", "merge", "unmerge", "filter"]:
             if kw in kwargs:
                 setattr(self, kw, kwargs[kw])
 
@@ -181,26 +188,78 @@ class Grouping:
             "Please let us know by filing a bug at:\n\n    " +
             "https://github.com/oemof/oemof/issues\n")
 
-    def __call__(self, e, d):
+    def unmerge(self, old, group):
+        """ Remove a part :obj:`old` from a :obj:`group`.
+
+        The inverse of :meth:`merge`. Called by :meth:`remove` with
+        :obj:`old` being the value :meth:`value(e) <Grouping.value>` and
+        :obj:`group` being the value stored under :meth:`key(e)
+        <Grouping.key>`. Should return what remains of :obj:`group`, or
+        :obj:`None` if nothing remains, in which case the group is deleted.
+
+        The default deletes the group if :obj:`old` and :obj:`group` are
+        identical and leaves it untouched otherwise.
+        """
+        return None if old is group else group
+
+    def _keys_and_value(self, e):
+        """ Compute the group keys and the (filtered) value for :obj:`e`.
+
+        Returns :obj:`(None, None)` if :obj:`e` doesn't end up in any group.
+        """
         k = self.key(e) if callable(self.key) else self.key
         if k is None:
-            return
+            return None, None
         v = self.value(e)
         if isinstance(v, MuMa):
-            for k in list(filterfalse(self.filter, v)):
-                v.pop(k)
+            for x in list(filterfalse(self.filter, v)):
+                v.pop(x)
         elif isinstance(v, Mapping):
-            v = type(v)((k, v[k]) for k in v if self.filter(k))
+            v = type(v)((x, v[x]) for x in v if self.filter(x))
         elif isinstance(v, Iterable):
             v = type(v)(filter(self.filter, v))
         elif self.filter and not self.filter(v):
-            return
+            return None, None
         if not v:
+            return None, None
+        return ((k if (isinstance(k, Iterable) and not isinstance(k, Hashable))
+                 else [k]),
+                v)
+
+    def __call__(self, e, d):
+        keys, v = self._keys_and_value(e)
+        if keys is None:
             return
-        for group in (k if (isinstance(k, Iterable) and not
-                            isinstance(k, Hashable))
-                      else [k]):
-            d[group] = (self.merge(v, d[group]) if group in d else v)
+        fresh = v
+        for group in keys:
+            if group in d:
+                d[group] = self.merge(v, d[group])
+            else:
+                d[group] = fresh
+                # Groups may be merged into in place, so they must not share
+                # the same container object.
+                if isinstance(v, Iterable):
+                    fresh = copy(v)
+
+    def remove(self, e, d):
+        """ Undo the effect of calling this grouping on :obj:`e`.
+
+        Recomputes the keys and the value for :obj:`e` and uses
+        :meth:`unmerge` to remove the value from the groups stored in
+        :obj:`d`. Used when removing entities from an :class:`energy system
+        <oemof.core.energy_system.EnergySystem>`, which has to make sure that
+        :obj:`e` is still in the same state as when it was grouped.
+        """
+        keys, v = self._keys_and_value(e)
+        if keys is None:
+            return
+        for group in keys:
+            if group in d:
+                remaining = self.unmerge(v, d[group])
+                if remaining is None:
+                    del d[group]
+                else:
+                    d[group] = remaining
 
 
 class Nodes(Grouping):
@@ -219,8 +278,19 @@ class Nodes(Grouping):
         """
         :meth:`Updates <set.update>` :obj:`old` to be the union of :obj:`old`
         and :obj:`new`.
+
+        The update happens in place, so groups don't get copied every time an
+        :class:`entity <oemof.core.network.Entity>` is added to them.
+        """
+        old.update(new)
+        return old
+
+    def unmerge(self, old, group):
+        """
+        Removes the elements of :obj:`old` from :obj:`group` in place.
         """
-        return old.union(new)
+        group.difference_update(old)
+        return group or None
 
 
 class Flows(Nodes):
@@ -241,6 +311,10 @@ class Flows(Nodes):
         flows = set(chain(n.outputs.values(), n.inputs.values()))
         super().__call__(flows, d)
 
+    def remove(self, n, d):
+        flows = set(chain(n.outputs.values(), n.inputs.values()))
+        super().remove(flows, d)
+
 
 class FlowsWithNodes(Nodes):
     """
@@ -257,11 +331,16 @@ class FlowsWithNodes(Nodes):
         """
         return set(tuples)
 
-    def __call__(self, n, d):
-        tuples = set(chain(
+    def _tuples(self, n):
+        return set(chain(
             ((n, t, f) for (t, f) in n.outputs.items()),
             ((s, n, f) for (s, f) in n.inputs.items())))
-        super().__call__(tuples, d)
+
+    def __call__(self, n, d):
+        super().__call__(self._tuples(n), d)
+
+    def remove(self, n, d):
+        super().remove(self._tuples(n), d)
 
 
 def _uid_or_str(node_or_entity):
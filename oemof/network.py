@@ -1,6 +1,3 @@
-from collections import MutableMapping as MM
-from functools import total_ordering
-from weakref import WeakKeyDictionary as WeKeDi, WeakSet as WeSe
 """
 This package (along with its subpackages) contains the classes used to model
 energy systems. An energy system is modelled as a graph/network of entities
@@ -8,6 +5,67 @@ with very specific constraints on which types of entities are allowed to be
 connected.
 
 """
+try:
+    from collections.abc import MutableMapping as MM
+except ImportError:
+    from collections import MutableMapping as MM
+try:
+    from contextvars import ContextVar
+except ImportError:
+    ContextVar = None
+from functools import total_ordering
+from threading import RLock, local
+from weakref import WeakKeyDictionary as WeKeDi, WeakSet as WeSe, ref
+
+import numpy as np
+
+
+class _ThreadLocalVar:
+    """ Fallback for :class:`contextvars.ContextVar` on Python < 3.7.
+
+    Only implements the parts of the interface used in this module. Values
+    are local to the current thread instead of the current context, which is
+    the same as long as no coroutines are involved.
+    """
+    def __init__(self, name, default=None):
+        self.name = name
+        self._default = default
+        self._local = local()
+
+    def get(self):
+        return getattr(self._local, 'value', self._default)
+
+    def set(self, value):
+        token = self.get()
+        self._local.value = value
+        return token
+
+    def reset(self, token):
+        self._local.value = token
+
+
+def _context_local(name):
+    return (ContextVar(name, default=None) if ContextVar is not None
+            else _ThreadLocalVar(name, default=None))
+
+
+class _Registered(type):
+    """ Metaclass making the `registry` class attribute context-local.
+
+    Reading or assigning :attr:`registry` on a class using this metaclass (or
+    on any of its subclasses) reads or sets a context variable, so different
+    threads (or contexts) can register nodes with different energy systems
+    at the same time. Assigning to the attribute keeps working as before,
+    but prefer :meth:`EnergySystem.active
+    <oemof.energy_system.EnergySystem.active>` to scope a registry.
+    """
+    @property
+    def registry(cls):
+        return cls._registry.get()
+
+    @registry.setter
+    def registry(cls, value):
+        cls._registry.set(value)
 
 
 class Inputs(MM):
@@ -27,7 +85,7 @@ class Inputs(MM):
         return self.flows.__setitem__((key, self.target), value)
 
     def __iter__(self):
-        return self.flows._in_edges.get(self.target, ()).__iter__()
+        return iter(self.flows._neighbours(self.flows._in_edges, self.target))
 
     def __len__(self):
         return self.flows._in_edges.get(self.target, ()).__len__()
@@ -50,7 +108,8 @@ class Outputs(MM):
         return self.flows.__setitem__((self.source, key), value)
 
     def __iter__(self):
-        return self.flows._out_edges.get(self.source, ()).__iter__()
+        return iter(self.flows._neighbours(self.flows._out_edges,
+                                           self.source))
 
     def __len__(self):
         return self.flows._out_edges.get(self.source, ()).__len__()
@@ -67,6 +126,20 @@ class _Edges(MM):
     """
     _in_edges = WeKeDi()
     _out_edges = WeKeDi()
+    # Guards all modifications of the class level edge store, which is shared
+    # by all threads.
+    _lock = RLock()
+    # Weak references to the objects which want to be notified when edges
+    # starting at a node are set or removed, keyed by the node. Registered
+    # via :meth:`_watch`, so that changing an edge only notifies the energy
+    # systems containing its source. Watchers have to implement
+    # `_edge_set(source, target, new)`, where `new` tells whether the edge
+    # didn't exist before, and `_edge_removed(source, target)`.
+    _watchers = WeKeDi()
+    # Flows shadowing the stored ones in the current context, keyed like
+    # `_flows`. Set by :meth:`EnergySystem.active
+    # <oemof.energy_system.EnergySystem.active>` for forked energy systems.
+    _overlay = _context_local('oemof_flow_overlay')
     # TODO: Either figure out how to use weak references here, or convert the
     #       whole graph datastructure to normal dictionaries.
     #       Background: I had to stop wrestling with the garbage collector,
@@ -82,30 +155,73 @@ class _Edges(MM):
     def __delitem__(self, key):
         source, target = key
 
-        # TODO: Refactor this to not have duplicate code.
-        self._in_edges[target].remove(source)
-        if not self._in_edges[target]:
-          del self._in_edges[target]
+        with self._lock:
+            # TODO: Refactor this to not have duplicate code.
+            self._in_edges[target].remove(source)
+            if not self._in_edges[target]:
+                del self._in_edges[target]
 
-        self._out_edges[source].remove(target)
-        if not self._out_edges[source]:
-          del self._out_edges[source]
+            self._out_edges[source].remove(target)
+            if not self._out_edges[source]:
+                del self._out_edges[source]
 
-        del self._flows[key]
+            del self._flows[key]
+            for watcher in self._watchers.get(source, ()):
+                watcher = watcher()
+                if watcher is not None:
+                    watcher._edge_removed(source, target)
 
     def __getitem__(self, key):
+        overlay = self._overlay.get()
+        if overlay and key in overlay:
+            return overlay[key]
         return self._flows.__getitem__(key)
 
     def __setitem__(self, key, value):
         source, target = key
-        # TODO: Refactor this to remove duplicate code.
-        self._in_edges[target] = self._in_edges.get(target, WeSe())
-        self._in_edges[target].add(source)
-
-        self._out_edges[source] = self._out_edges.get(source, WeSe())
-        self._out_edges[source].add(target)
-
-        self._flows.__setitem__(key, value)
+        with self._lock:
+            new = key not in self._flows
+            # TODO: Refactor this to remove duplicate code.
+            self._in_edges[target] = self._in_edges.get(target, WeSe())
+            self._in_edges[target].add(source)
+
+            self._out_edges[source] = self._out_edges.get(source, WeSe())
+            self._out_edges[source].add(target)
+
+            self._flows.__setitem__(key, value)
+            for watcher in self._watchers.get(source, ()):
+                watcher = watcher()
+                if watcher is not None:
+                    watcher._edge_set(source, target, new)
+
+    def _watch(self, nodes, watcher):
+        """ Notify the object referenced weakly by `watcher` of changes to
+        the edges starting at `nodes`.
+        """
+        with self._lock:
+            for node in nodes:
+                watchers = self._watchers.get(node)
+                if watchers is None:
+                    self._watchers[node] = [watcher]
+                elif watcher not in watchers:
+                    # drop the references to collected watchers on the way
+                    watchers[:] = [w for w in watchers if w() is not None]
+                    watchers.append(watcher)
+
+    def _unwatch(self, node, watcher):
+        with self._lock:
+            watchers = self._watchers.get(node, ())
+            if watcher in watchers:
+                watchers.remove(watcher)
+
+    def _neighbours(self, edges, node):
+        """ Snapshot of the nodes adjacent to `node` in `edges`.
+
+        Taken while holding the lock, so that iterating over it is safe even
+        if other threads are adding flows at the same time.
+        """
+        with self._lock:
+            return list(edges.get(node, ()))
 
     def __call__(self, source=None, target=None):
         if ((source is None) and (target is None)):
@@ -114,7 +230,7 @@ class _Edges(MM):
             return Inputs(self, target)
         if (target is None):
             return Outputs(self, source)
-        return self._flows[source, target]
+        return self[source, target]
 
     def __iter__(self):
         return self._flows.__iter__()
@@ -126,8 +242,213 @@ class _Edges(MM):
 flow = _Edges()
 
 
+class Adjacency:
+    """ Compressed sparse row index of the flows between an energy system's
+    nodes.
+
+    Each node of the :class:`energy system
+    <oemof.energy_system.EnergySystem>` gets an integer id, its position in
+    :attr:`nodes`. Ids of removed nodes are not reused, their slot in
+    :attr:`nodes` is set to `None` instead. Successors and predecessors of
+    all nodes are stored as two CSR structures, i.e. as one array of
+    neighbour ids per direction, sorted by node id, plus an array of offsets
+    into it. This allows for vectorized neighbourhood queries over many nodes
+    at once.
+
+    The index is kept up to date automatically. Nodes added to the energy
+    system are indexed lazily on the next query and flows added or removed
+    between already indexed nodes are recorded as they happen. The CSR
+    arrays are only rebuilt once per batch of changes, when they are needed.
+    Don't create instances of this class directly, use
+    :attr:`EnergySystem.adjacency
+    <oemof.energy_system.EnergySystem.adjacency>` instead.
+
+    Methods accepting `nodes` take a single :class:`Node`, an iterable of
+    nodes or an (array of) integer node ids.
+
+    Attributes
+    ----------
+    nodes: list
+        The indexed nodes. The id of a node is its position in this list.
+
+    Examples
+    --------
+    >>> from oemof.energy_system import EnergySystem
+    >>> es = EnergySystem()
+    >>> bus = Bus(label="bus")
+    >>> plants = [Transformer(label="pp{}".format(i), outputs=[bus])
+    ...           for i in range(3)]
+    >>> sink = Sink(label="sink", inputs=[bus])
+    >>> adjacency = es.adjacency
+    >>> sorted(adjacency.nodes[i].label for i in adjacency.predecessors(bus))
+    ['pp0', 'pp1', 'pp2']
+    >>> adjacency.in_degree([bus, sink]).tolist()
+    [3, 1]
+    >>> adjacency.out_degree().tolist()
+    [1, 1, 1, 1, 0]
+    """
+    def __init__(self, energy_system):
+        self._energy_system = ref(energy_system)
+        self._ref = ref(self)
+        self._reset()
+
+    def _reset(self):
+        self._source = None
+        self.nodes = []
+        self._ids = {}
+        self._edges = {}
+        self._removed = 0
+        self._csr = None
+
+    def _sync(self):
+        """ Index nodes added to the energy system since the last query.
+        """
+        # The energy system removes nodes from its list of nodes lazily, so
+        # the list is read without compacting it. Nodes removed from the
+        # energy system are also removed from this index right away, but
+        # may still be in the list.
+        # Edges are set and removed under the lock, so taking it here makes
+        # sure that the scan below and the notifications don't interleave.
+        with flow._lock:
+            energy_system = self._energy_system()
+            nodes = energy_system._entities
+            indexed = (len(self.nodes) - self._removed +
+                       len(energy_system._removed))
+            if nodes is not self._source or len(nodes) < indexed:
+                self._reset()
+                self._source = nodes = energy_system.entities
+                indexed = 0
+            added = nodes[indexed:]
+            flow._watch(added, self._ref)
+            for node in added:
+                i = len(self.nodes)
+                self.nodes.append(node)
+                self._ids[node] = i
+                if not isinstance(node, Node):
+                    continue
+                for target in node.outputs:
+                    if target in self._ids:
+                        self._edges[i, self._ids[target]] = None
+                for source in node.inputs:
+                    if source in self._ids and source is not node:
+                        self._edges[self._ids[source], i] = None
+                self._csr = None
+            if self._csr is None:
+                self._csr = self._compress()
+            return self._csr
+
+    def _compress(self):
+        n = len(self.nodes)
+        with flow._lock:
+            edges = list(self._edges)
+        edges = np.array(edges, dtype=np.intp).reshape(-1, 2)
+        csr = {}
+        for direction, (row, column) in (('out', (0, 1)), ('in', (1, 0))):
+            rows, columns = edges[:, row], edges[:, column]
+            order = np.lexsort((columns, rows))
+            indptr = np.zeros(n + 1, dtype=np.intp)
+            np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+            csr[direction] = (indptr, columns[order])
+        return csr
+
+    def _edge_set(self, source, target, new):
+        if new and source in self._ids and target in self._ids:
+            self._edges[self._ids[source], self._ids[target]] = None
+            self._csr = None
+
+    def _edge_removed(self, source, target):
+        if source in self._ids and target in self._ids:
+            self._edges.pop((self._ids[source], self._ids[target]), None)
+            self._csr = None
+
+    def _node_removed(self, node):
+        """ Forget about `node`, which has been removed from the energy system.
+
+        Ids aren't reused, so the slot of `node` in :attr:`nodes` is set to
+        `None` and all other ids stay valid.
+        """
+        i = self._ids.pop(node, None)
+        if i is not None:
+            flow._unwatch(node, self._ref)
+            self.nodes[i] = None
+            self._removed += 1
+            self._csr = None
+
+    def __contains__(self, node):
+        self._sync()
+        return node in self._ids
+
+    def index(self, nodes):
+        """ Return the id of a node or an array with the ids of many nodes.
+        """
+        self._sync()
+        if isinstance(nodes, (Node, Entity)):
+            return self._ids[nodes]
+        return np.fromiter((self._ids[n] for n in nodes), dtype=np.intp)
+
+    def _as_ids(self, nodes):
+        if nodes is None:
+            return np.arange(len(self.nodes), dtype=np.intp)
+        if isinstance(nodes, (Node, Entity)):
+            return np.array([self._ids[nodes]], dtype=np.intp)
+        ids = np.asarray(nodes)
+        if ids.dtype == object:
+            return self.index(nodes)
+        return np.atleast_1d(ids).astype(np.intp)
+
+    def _gather(self, direction, nodes):
+        indptr, indices = self._sync()[direction]
+        ids = self._as_ids(nodes)
+        starts, lengths = indptr[ids], indptr[ids + 1] - indptr[ids]
+        offsets = (np.repeat(starts - np.cumsum(lengths) + lengths, lengths) +
+                   np.arange(lengths.sum()))
+        return indices[offsets]
+
+    def successors(self, nodes):
+        """ Ids of the targets of all outflows of `nodes`, concatenated.
+        """
+        return self._gather('out', nodes)
+
+    def predecessors(self, nodes):
+        """ Ids of the sources of all inflows of `nodes`, concatenated.
+        """
+        return self._gather('in', nodes)
+
+    def out_degree(self, nodes=None):
+        """ Number of outflows of `nodes`, or of all nodes if not given.
+        """
+        indptr = self._sync()['out'][0]
+        return np.diff(indptr)[self._as_ids(nodes)]
+
+    def in_degree(self, nodes=None):
+        """ Number of inflows of `nodes`, or of all nodes if not given.
+        """
+        indptr = self._sync()['in'][0]
+        return np.diff(indptr)[self._as_ids(nodes)]
+
+    def components(self):
+        """ Label the weakly connected components of the graph.
+
+        Returns an array containing, for every node id, the smallest node id
+        in its component.
+        """
+        indptr, targets = self._sync()['out']
+        sources = np.repeat(np.arange(len(self.nodes), dtype=np.intp),
+                            np.diff(indptr))
+        labels = np.arange(len(self.nodes), dtype=np.intp)
+        while True:
+            minima = np.minimum(labels[sources], labels[targets])
+            updated = labels.copy()
+            np.minimum.at(updated, sources, minima)
+            np.minimum.at(updated, targets, minima)
+            updated = updated[updated]
+            if np.array_equal(updated, labels):
+                return labels
+            labels = updated
+
+
 @total_ordering
-class Node:
+class Node(metaclass=_Registered):
     """ Represents a Node in an energy system graph.
 
     Abstract superclass of the two general types of nodes of an energy system
@@ -158,19 +479,35 @@ class Node:
         A function taking this node and a target node as a parameter (i.e.
         something of the form :python:`def f(self, target)`), returning the
         flow originating from this node into :python:`target`.
+    frozen: bool, optional
+        If `True`, the :attr:`label` of this node can't be changed after
+        construction. Defaults to `False`.
 
     Attributes
     ----------
+    registry: :class:`EnergySystem <oemof.energy_system.EnergySystem>`
+        The energy system newly created nodes are added to. This is local to
+        the current thread and context (see :mod:`contextvars`), so energy
+        systems can be built concurrently. If it is `None`, nodes are not
+        kept track of.
     label: object
         If this node was given a `label` on construction, this attribute holds
         the actual object passed as a parameter. Otherwise py:``node.label`` is
-        a synonym for ``str(node)``.
+        a synonym for ``str(node)``. The hash of a node is computed from its
+        initial label once and doesn't change if the node is relabeled, which
+        is fine as nodes compare equal by identity only. Relabeling does
+        however invalidate lookups by label, like the groups created by
+        :const:`DEFAULT <oemof.groupings.DEFAULT>`, so relabeling
+        :attr:`frozen` nodes raises an :class:`AttributeError`.
     inputs: dict
         Dictionary mapping input :class:`Node`s `n` to flows from `n` into
-        `self`.
+        `self`. The mapping is a live view which is created only once per
+        node.
     outputs: dict
         Dictionary mapping output :class:`Node`s `n` to flows from `self` into
-        `n`.
+        `n`. Like :attr:`inputs`, this is a cached live view.
+    frozen: bool
+        Whether the :attr:`label` of this node is immutable.
 
     """
 
@@ -184,14 +521,21 @@ class Node:
     #       But more sophisticated research and minimal test cases are
     #       needed to confirm that.
 
-    registry = None
-    __slots__ = ["__weakref__", "_label", "_inputs", "_state"]
+    _registry = _context_local('oemof_node_registry')
+    __slots__ = ["__weakref__", "_label", "_inputs", "_outputs", "_state",
+                 "_hash", "_frozen"]
 
     def __init__(self, *args, **kwargs):
+        registry = __class__.registry
+        # fail before any flows are stored, if the registry can't take
+        # new nodes
+        check = getattr(registry, '_check_not_forked', None)
+        if check is not None:
+            check()
         self._state = (args, kwargs)
         self.__setstate__(self._state)
-        if __class__.registry is not None:
-            __class__.registry.add(self)
+        if registry is not None:
+            registry.add(self)
 
     def __getstate__(self):
         return self._state
@@ -201,6 +545,10 @@ class Node:
         for optional in ['label']:
             if optional in kwargs:
                 setattr(self, '_' + optional, kwargs[optional])
+        self._frozen = kwargs.get('frozen', False)
+        self._hash = hash(self.label)
+        self._inputs = Inputs(flow, self)
+        self._outputs = Outputs(flow, self)
         for i in kwargs.get('inputs', {}):
             try:
                 flow[i, self] = kwargs['inputs'].get(i)
@@ -212,14 +560,15 @@ class Node:
             except AttributeError:
                 flow[self, o] = None
 
-    def __eq__(self, other):
-        return id(self) == id(other)
+    # Nodes compare equal by identity only, which is what `object.__eq__`
+    # does. Not overriding it keeps comparisons in C, which speeds up dict
+    # and list operations on nodes.
 
     def __lt__(self, other):
         return self.label < other.label
 
     def __hash__(self):
-        return hash(self.label)
+        return self._hash
 
     def __str__(self):
         return str(self.label)
@@ -229,13 +578,24 @@ class Node:
         return (self._label if hasattr(self, "_label")
                 else "<{} #0x{:x}>".format(type(self).__name__, id(self)))
 
+    @label.setter
+    def label(self, label):
+        if self._frozen:
+            raise AttributeError(
+                "Can't change the label of frozen node {}.".format(self))
+        self._label = label
+
+    @property
+    def frozen(self):
+        return self._frozen
+
     @property
     def inputs(self):
-        return Inputs(flow, self)
+        return self._inputs
 
     @property
     def outputs(self):
-        return Outputs(flow, self)
+        return self._outputs
 
 
 class Bus(Node):
@@ -260,7 +620,7 @@ class Transformer(Component):
 
 # TODO: Adhere to PEP 0257 by listing the exported classes with a short
 #       summary.
-class Entity:
+class Entity(metaclass=_Registered):
     r"""
     The most abstract type of vertex in an energy system graph. Since each
     entity in an energy system has to be uniquely identifiable and
@@ -290,11 +650,12 @@ class Entity:
         <oemof.core.energy_system.EnergySystem>` it automatically becomes the
         entity registry, i.e. all entities created are added to its
         :attr:`entities <oemof.core.energy_system.EnergySystem.entities>`
-        attribute on construction.
+        attribute on construction. Like :attr:`Node.registry`, this is local
+        to the current thread and context.
     """
     optimization_options = {}
 
-    registry = None
+    _registry = _context_local('oemof_entity_registry')
 
     def __init__(self, **kwargs):
         # TODO: @Günni:
@@ -311,8 +672,9 @@ class Entity:
         self.geo_data = kwargs.get("geo_data", None)
         self.regions = []
         self.add_regions(kwargs.get('regions', []))
-        if __class__.registry is not None:
-            __class__.registry.add(self)
+        registry = __class__.registry
+        if registry is not None:
+            registry.add(self)
 
         # TODO: @Gunni Yupp! Add docstring.
     def add_regions(self, regions):
@@ -1,3 +1,4 @@
 from oemof.outputlib import processing
 from oemof.outputlib import views
 from oemof.outputlib import graph_tools
+from oemof.outputlib import store
@@ -1,10 +1,18 @@
 # -*- coding: utf-8 -*-
 """Modules for creating and manipulating energy system graphs."""
 
+from numbers import Number
+from xml.sax.saxutils import escape, quoteattr
+import json
 import logging
+import math
 import re
 import warnings
 
+import numpy as np
+
+from oemof.network import Node
+
 try:
     from matplotlib import pyplot as plt
 except ImportError:
@@ -138,10 +146,9 @@ def graph(energy_system, optimization_model=None, edge_labels=True,
 
         # remove nodes based on substrings
         if remove_nodes_with_substrings is not None:
+            index = LabelIndex(energy_system.nodes)
             for i in remove_nodes_with_substrings:
-                remove_nodes = [v.label for v in energy_system.nodes
-                                if i in v.label]
-                G.remove_nodes_from(remove_nodes)
+                G.remove_nodes_from(v.label for v in index.matching(i))
 
         if type(node_color) is dict:
             node_color = [node_color.get(g, '#AFAFAF') for g in G.nodes()]
@@ -176,6 +183,311 @@ def graph(energy_system, optimization_model=None, edge_labels=True,
     return G
 
 
+class LabelIndex:
+    """
+    An index of node labels for finding nodes by substrings of their labels.
+
+    Every trigram of every label is indexed, so looking up a substring only
+    checks the labels containing all of its trigrams instead of scanning all
+    labels. Substrings shorter than three characters fall back to a scan.
+
+    Examples
+    --------
+    >>> from oemof.network import Bus
+    >>> index = LabelIndex([Bus(label=l) for l in ['el_de', 'el_fr', 'gas']])
+    >>> [str(n) for n in index.matching('el_')]
+    ['el_de', 'el_fr']
+    """
+    def __init__(self, nodes):
+        self.nodes = list(nodes)
+        self.labels = [str(n) for n in self.nodes]
+        self._trigrams = {}
+        for i, label in enumerate(self.labels):
+            for gram in set(label[j:j + 3] for j in range(len(label) - 2)):
+                self._trigrams.setdefault(gram, []).append(i)
+
+    def matching(self, substring):
+        """ Return the nodes whose labels contain `substring`, in the order
+        they were indexed.
+        """
+        if len(substring) < 3:
+            candidates = range(len(self.labels))
+        else:
+            postings = sorted(
+                (self._trigrams.get(substring[j:j + 3], ())
+                 for j in range(len(substring) - 2)), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            candidates = sorted(candidates)
+        return [self.nodes[i] for i in candidates
+                if substring in self.labels[i]]
+
+
+def select_nodes(energy_system, include=None, exclude=None, index=None):
+    """
+    Select the nodes of `energy_system` by substrings of their labels.
+
+    Returns the nodes matching any of the substrings in `include` (all nodes
+    if it is `None`) and none of the ones in `exclude`. An existing
+    :class:`LabelIndex` of the nodes can be passed as `index` to reuse it for
+    multiple selections.
+    """
+    if index is None:
+        index = LabelIndex(energy_system.nodes)
+    if include is None:
+        selected = set(index.nodes)
+    else:
+        selected = set(n for i in include for n in index.matching(i))
+    for e in exclude or ():
+        selected.difference_update(index.matching(e))
+    return [n for n in index.nodes if n in selected]
+
+
+def _scalar(value):
+    """ Return `value` as a scalar suited for a graph attribute or `None`.
+
+    Sequences are only exported if they are constant, i.e. if they are
+    created from a scalar and haven't been changed. `NaN` and infinite values,
+    like the default maximum of an investment, are dropped, as neither JSON
+    nor GraphML's `double` can represent them the same way.
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, (bool, Number, str)):
+        return value
+    # solph's sequences created from scalars, see
+    # :func:`oemof.solph.plumbing.sequence`
+    default = getattr(value, 'default', None)
+    data = getattr(value, 'data', None)
+    if (default is not None and isinstance(data, list) and
+            all(v == default for v in data)):
+        return _scalar(default)
+    return None
+
+
+def _attributes(obj, prefix=''):
+    """ Return the scalar attributes of `obj`, including the ones of its
+    attribute objects like :class:`Investment
+    <oemof.solph.options.Investment>`, prefixed with the attribute name.
+    """
+    attributes = {}
+    for name, value in sorted(getattr(obj, '__dict__', {}).items()):
+        if name.startswith('_'):
+            continue
+        scalar = _scalar(value)
+        if scalar is not None:
+            attributes[prefix + name] = scalar
+        elif not prefix and hasattr(value, '__dict__') and not isinstance(
+                value, Node):
+            attributes.update(_attributes(value, prefix=name + '.'))
+    return attributes
+
+
+def _aggregated_results(results, aggregate, labels):
+    """ Aggregate the sequences of `results` and return them together with
+    the scalars, keyed by tuples of node labels. Only the keys of which all
+    nodes are among `labels` are aggregated.
+    """
+    aggregated = {}
+    for key in results:
+        ids = tuple(str(n) for n in key)
+        if not labels.issuperset(ids):
+            continue
+        sequences = results[key]['sequences']
+        scalars = results[key]['scalars']
+        if isinstance(aggregate, str):
+            values = getattr(sequences, aggregate)()
+        else:
+            values = sequences.apply(aggregate)
+        values = dict(values.items())
+        values.update(scalars.items())
+        aggregated[ids] = {
+            str(k): v for k, v in values.items()
+            if _scalar(v) is not None}
+    return aggregated
+
+
+def _selection(energy_system, nodes, results, aggregate):
+    """ Return the `nodes` to export, all nodes by default, and their
+    aggregated `results`.
+    """
+    nodes = energy_system.nodes if nodes is None else list(nodes)
+    if results is None:
+        return nodes, {}
+    return nodes, _aggregated_results(results, aggregate,
+                                      set(str(n) for n in nodes))
+
+
+def _graph_elements(energy_system, nodes, results):
+    """ Yield the `nodes` and the edges between them as `(kind, ids,
+    attributes)` tuples, adding the aggregated `results`.
+    """
+    labels = {}
+    for n in nodes:
+        labels[n] = str(n)
+        attributes = {'type': type(n).__name__}
+        attributes.update(_attributes(n))
+        attributes.update(results.get((labels[n],), {}))
+        yield 'node', (labels[n],), attributes
+    for (source, target), f in energy_system.flows().items():
+        if source not in labels or target not in labels:
+            continue
+        ids = (labels[source], labels[target])
+        attributes = _attributes(f)
+        attributes.update(results.get(ids, {}))
+        yield 'edge', ids, attributes
+
+
+def _open(path_or_file):
+    if hasattr(path_or_file, 'write'):
+        return path_or_file, False
+    return open(path_or_file, 'w', encoding='utf-8'), True
+
+
+_GRAPHML_TYPES = {bool: 'boolean', int: 'long', float: 'double',
+                  str: 'string'}
+
+
+def _graphml_type(value):
+    for t in (bool, int, float):
+        if isinstance(value, t):
+            return t
+    return str
+
+
+def _graphml_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return escape(str(value))
+
+
+def write_graphml(energy_system, path_or_file, nodes=None, results=None,
+                  aggregate='sum'):
+    """
+    Write the graph of `energy_system` to a GraphML file.
+
+    The file is written element by element, without building a graph in
+    memory or computing a layout, so this works for large energy systems and
+    without networkx or graphviz. Programs like yEd or Gephi can lay out and
+    display the result.
+
+    Nodes are identified by their label and get their type and their scalar
+    attributes as data. Edges get the scalar attributes of their flows,
+    including the ones of e.g. their investment options, prefixed with
+    `'investment.'`.
+
+    Parameters
+    ----------
+    energy_system : `oemof.energy_system.EnergySystem`
+    path_or_file : str or file
+        The path of the file to write or a file opened for writing text.
+    nodes : iterable, optional
+        Only write these nodes and the flows between them, e.g. as selected
+        by :func:`select_nodes`.
+    results : dict, optional
+        Results as returned by :func:`processing.results
+        <oemof.outputlib.processing.results>`, keyed by nodes or labels.
+        Their sequences are aggregated with `aggregate` and added, together
+        with the scalars, to the data of the corresponding nodes and edges.
+    aggregate : str or callable
+        The name of a :class:`pandas.DataFrame` method, e.g. `'sum'`,
+        `'mean'` or `'max'`, or a function aggregating a
+        :class:`pandas.Series`. Defaults to `'sum'`.
+    """
+    nodes, results = _selection(energy_system, nodes, results, aggregate)
+    # the attribute keys have to be declared before the graph, so the types
+    # are collected in a first pass
+    types = {'node': {}, 'edge': {}}
+    for kind, _, attributes in _graph_elements(energy_system, nodes,
+                                               results):
+        for name, value in attributes.items():
+            t = _graphml_type(value)
+            known = types[kind].setdefault(name, t)
+            if known is not t:
+                types[kind][name] = (float if {known, t} == {int, float}
+                                     else str)
+    keys = {}
+    f, close = _open(path_or_file)
+    try:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+        for kind in ('node', 'edge'):
+            for name, t in sorted(types[kind].items()):
+                keys[kind, name] = 'd{}'.format(len(keys))
+                f.write('  <key id="{}" for="{}" attr.name={} '
+                        'attr.type="{}"/>\n'.format(
+                            keys[kind, name], kind, quoteattr(name),
+                            _GRAPHML_TYPES[t]))
+        f.write('  <graph edgedefault="directed">\n')
+        for kind, ids, attributes in _graph_elements(energy_system, nodes,
+                                                     results):
+            if kind == 'node':
+                f.write('    <node id={}>'.format(quoteattr(ids[0])))
+            else:
+                f.write('    <edge source={} target={}>'.format(
+                    quoteattr(ids[0]), quoteattr(ids[1])))
+            for name, value in sorted(attributes.items()):
+                f.write('<data key="{}">{}</data>'.format(
+                    keys[kind, name], _graphml_value(value)))
+            f.write('</{}>\n'.format(kind))
+        f.write('  </graph>\n</graphml>\n')
+    finally:
+        if close:
+            f.close()
+
+
+def write_json(energy_system, path_or_file, nodes=None, results=None,
+               aggregate='sum'):
+    """
+    Write the graph of `energy_system` to a JSON file.
+
+    The graph is written in the node-link format read by
+    :func:`networkx.readwrite.json_graph.node_link_graph`, element by
+    element like :func:`write_graphml`, which describes the parameters.
+
+    Examples
+    --------
+    >>> from io import StringIO
+    >>> from oemof.energy_system import EnergySystem
+    >>> from oemof.network import Bus, Sink
+    >>> es = EnergySystem()
+    >>> bus = Bus(label='bus')
+    >>> sink = Sink(label='sink', inputs={bus: None})
+    >>> f = StringIO()
+    >>> write_json(es, f)
+    >>> graph = json.loads(f.getvalue())
+    >>> [n['id'] for n in graph['nodes']]
+    ['bus', 'sink']
+    >>> [(l['source'], l['target']) for l in graph['links']]
+    [('bus', 'sink')]
+    """
+    nodes, results = _selection(energy_system, nodes, results, aggregate)
+    f, close = _open(path_or_file)
+    try:
+        f.write('{"directed": true, "multigraph": false, "graph": {}, '
+                '"nodes": [')
+        separator = '\n  '
+        kind = 'node'
+        for element, ids, attributes in _graph_elements(
+                energy_system, nodes, results):
+            if element != kind:
+                f.write('\n], "links": [')
+                separator, kind = '\n  ', element
+            if element == 'node':
+                attributes['id'] = ids[0]
+            else:
+                attributes['source'], attributes['target'] = ids
+            f.write(separator + json.dumps(attributes, sort_keys=True))
+            separator = ',\n  '
+        if kind == 'node':
+            f.write('\n], "links": [')
+        f.write('\n]}\n')
+    finally:
+        if close:
+            f.close()
+
+
 for o in [graph]:
     if (((nx is None) or (graphviz_layout is None) or (pygraphviz is None)) and
             (getattr(o, "__doc__") is not None)):
@@ -5,12 +5,113 @@ Modules for providing a convenient data structure for solph results.
 Information about the possible usage is provided within the examples.
 """
 
+try:
+    from collections.abc import MutableMapping as MuMa
+except ImportError:
+    from collections import MutableMapping as MuMa
+
+from itertools import repeat
+from numbers import Number
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+import numpy as np
 import pandas as pd
-from itertools import groupby
 from oemof.network import Node
+from oemof.tools import timing
+from pyomo.core.base.constraint import Constraint
 from pyomo.core.base.var import Var
 
 
+class Results(MuMa):
+    """
+    A dictionary of results which are only assembled when accessed.
+
+    The keys are available right away, but the pandas objects holding the
+    `'scalars'` and `'sequences'` of an oemof tuple are only created on first
+    access and cached afterwards. Apart from that, this behaves like the
+    dictionary :func:`results` used to return. The sequences are views of one
+    array holding all values, so they don't use additional memory.
+    """
+    def __init__(self, timeindex, keys, values, names, bounds, splits, rows,
+                 extras):
+        self._timeindex = timeindex
+        self._values = values
+        self._names = names
+        self._bounds = bounds
+        self._splits = splits
+        self._rows = rows
+        self._extras = extras
+        self._positions = {key: k for k, key in enumerate(keys)}
+        self._keys = list(keys)
+        self._keys.extend(k for k in extras if k not in self._positions)
+        self._cache = {}
+        # Built by :func:`views.node_index <oemof.outputlib.views.node_index>`
+        # and dropped whenever the results are modified.
+        self._node_index = None
+
+    def _assemble(self, key):
+        if key in self._positions:
+            k = self._positions[key]
+            start, split, stop = (self._bounds[k], self._splits[k],
+                                  self._bounds[k + 1])
+            row = self._rows[k]
+            sequences = pd.DataFrame(
+                self._values[:, start:split], index=self._timeindex,
+                columns=pd.Index(self._names[start:split],
+                                 name='variable_name'))
+            scalars = pd.Series(
+                self._values[row, split:stop], name=self._timeindex[row],
+                index=pd.Index(self._names[split:stop], name='variable_name'))
+        elif key in self._extras:
+            sequences = pd.DataFrame(index=self._timeindex)
+            scalars = pd.Series()
+        else:
+            raise KeyError(key)
+        for column, timed, value in self._extras.get(key, ()):
+            if timed:
+                sequences[column] = value
+            else:
+                scalars[column] = value
+        return {'scalars': scalars, 'sequences': sequences}
+
+    def __getitem__(self, key):
+        if key not in self._cache:
+            self._cache[key] = self._assemble(key)
+        return self._cache[key]
+
+    def __setitem__(self, key, value):
+        if key not in self._cache and key not in self:
+            self._keys.append(key)
+        self._cache[key] = value
+        self._node_index = None
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._keys.remove(key)
+        self._positions.pop(key, None)
+        self._extras.pop(key, None)
+        self._cache.pop(key, None)
+        self._node_index = None
+
+    def __contains__(self, key):
+        return (key in self._cache or key in self._positions or
+                key in self._extras)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+
 def get_tuple(x):
     """
     Get oemof tuple within iterable or create it.
@@ -53,6 +154,51 @@ def remove_timestep(x):
         return x[:-1]
 
 
+def _index_columns(index):
+    """
+    Split the `index` of a pyomo component into oemof tuples and timesteps.
+
+    The index of a component is homogeneous, so it is classified once, using
+    its first element, instead of calling :func:`get_tuple`,
+    :func:`get_timestep` and :func:`remove_timestep` on every element.
+    Returns the oemof tuples, the timesteps and whether the index contains
+    timesteps at all. Components indexed by timesteps only get the empty
+    tuple as oemof tuple.
+    """
+    first = index[0]
+    zeros = np.zeros(len(index), dtype=np.int64)
+    if isinstance(first, Node):
+        return list(zip(index)), zeros, False
+    if first is None:
+        return [()] * len(index), zeros, False
+    if not isinstance(first, tuple):
+        return [()] * len(index), np.array(index, dtype=np.int64), True
+    if all(isinstance(n, Node) for n in first):
+        return index, zeros, False
+    columns = np.empty((len(index), len(first)), dtype=object)
+    columns[:] = index
+    return (list(zip(*columns[:, :-1].T)), columns[:, -1].astype(np.int64),
+            True)
+
+
+def _variable_columns(bv):
+    """
+    Get the columns of the result dataframe for one pyomo variable.
+    """
+    name = str(bv).split('.')
+    block, variable = name[0], name[-1]
+    index = list(bv._index)
+    try:
+        data = bv._data
+        values = [data[i].value for i in index]
+    except KeyError:
+        values = [bv[i].value for i in index]
+    pyomo_tuples = list(zip(repeat(block), repeat(variable), index))
+    oemof_tuples, timesteps, _ = _index_columns(index)
+    return pyomo_tuples, values, variable, oemof_tuples, timesteps
+
+
+@timing.timed('create_dataframe')
 def create_dataframe(om):
     """
     Create a result dataframe with all optimization data.
@@ -62,35 +208,48 @@ def create_dataframe(om):
     components or the timesteps.
     """
     # get all pyomo variables including their block
-    block_vars = []
-    for bv in om.component_data_objects(Var):
-        block_vars.append(bv.parent_component())
-    block_vars = list(set(block_vars))
-
-    # write them into a dict with tuples as keys
-    var_dict = {(str(bv).split('.')[0], str(bv).split('.')[-1], i): bv[i].value
-                for bv in block_vars for i in getattr(bv, '_index')}
-
-    # use this to create a pandas dataframe
-    df = pd.DataFrame(list(var_dict.items()), columns=['pyomo_tuple', 'value'])
-    df['variable_name'] = df['pyomo_tuple'].str[1]
-
-    # adapt the dataframe by separating tuple data into columns depending
-    # on which dimension the variable/parameter has (scalar/sequence).
-    # columns for the oemof tuple and timestep are created
-    df['oemof_tuple'] = df['pyomo_tuple'].map(get_tuple)
-    df['timestep'] = df['oemof_tuple'].map(get_timestep)
-    df['oemof_tuple'] = df['oemof_tuple'].map(remove_timestep)
-
-    # order the data by oemof tuple and timestep
-    df = df.sort_values(['oemof_tuple', 'timestep'], ascending=[True, True])
+    block_vars = list(set(bv for bv in om.component_objects(Var)
+                          if len(bv._index)))
+
+    pyomo_tuples, values, names, oemof_tuples, timesteps = [], [], [], [], []
+    for bv in block_vars:
+        p, v, n, o, t = _variable_columns(bv)
+        pyomo_tuples.extend(p)
+        values.extend(v)
+        names.extend(repeat(n, len(v)))
+        oemof_tuples.extend(o)
+        timesteps.append(t)
+    timesteps = (np.concatenate(timesteps) if timesteps
+                 else np.empty(0, dtype=np.int64))
+    values = np.array(values, dtype=np.float64)
+
+    # order the data by oemof tuple and timestep: the oemof tuples are
+    # sorted once and replaced by their rank, so the rows can be ordered by
+    # integers
+    pyomo_tuples = pd.Series(pyomo_tuples, dtype=object).values
+    oemof_tuples = pd.Series(oemof_tuples, dtype=object).values
+    codes, uniques = pd.factorize(oemof_tuples)
+    ranks = np.empty(len(uniques), dtype=np.int64)
+    ranks[sorted(range(len(uniques)), key=uniques.__getitem__)] = (
+        np.arange(len(uniques)))
+    order = np.lexsort((timesteps, ranks[codes]))
 
     # drop empty decision variables
-    df = df.dropna(subset=['value'])
+    order = order[~np.isnan(values[order])]
+
+    df = pd.DataFrame({'pyomo_tuple': pyomo_tuples[order],
+                       'value': values[order],
+                       'variable_name': np.array(names, dtype=object)[order],
+                       'oemof_tuple': oemof_tuples[order],
+                       'timestep': timesteps[order]},
+                      index=order,
+                      columns=['pyomo_tuple', 'value', 'variable_name',
+                               'oemof_tuple', 'timestep'])
 
     return df
 
 
+@timing.timed('results')
 def results(om):
     """
     Create a result dictionary from the result DataFrame.
@@ -99,43 +258,338 @@ def results(om):
     a Series holds all scalar values and a dataframe all sequences for nodes
     and flows.
     The dictionary is keyed by the nodes e.g. `results[(n,)]['scalars']`
-    and flows e.g. `results[(n,n)]['sequences']`.
+    and flows e.g. `results[(n,n)]['sequences']`. It is a :class:`Results`
+    object, which only creates the pandas objects of a key when the key is
+    accessed.
     """
+    start = time.perf_counter()
     df = create_dataframe(om)
-
-    # create a dict of dataframes keyed by oemof tuples
-    df_dict = {k: v[['timestep', 'variable_name', 'value']]
-               for k, v in df.groupby('oemof_tuple')}
-
-    # create final result dictionary by splitting up the dataframes in the
-    # dataframe dict into a series for scalar data and dataframe for sequences
-    results = {}
-    for k, v in df_dict.items():
-        df_dict[k].set_index('timestep', inplace=True)
-        df_dict[k] = df_dict[k].pivot(columns='variable_name', values='value')
-        df_dict[k].index = om.es.timeindex
-        try:
-            condition = df_dict[k].isnull().any()
-            scalars = df_dict[k].loc[:, condition].dropna().iloc[0]
-            sequences = df_dict[k].loc[:, ~(condition)]
-            results[k] = {'scalars': scalars, 'sequences': sequences}
-        except IndexError:
+    timeindex = om.es.timeindex
+
+    # pivot all values at once into one dense array with a column per oemof
+    # tuple and variable and a row per timestep
+    key_codes, keys = pd.factorize(df['oemof_tuple'].values)
+    name_codes, names = pd.factorize(df['variable_name'].values)
+    column_codes, columns = pd.factorize(key_codes * len(names) + name_codes)
+    column_keys, column_names = np.divmod(columns, len(names))
+    dense = np.full((len(timeindex), len(columns)), np.nan)
+    dense[df['timestep'].values, column_codes] = df['value'].values
+
+    # columns containing missing values are scalars, the others sequences
+    scalar = np.isnan(dense).any(axis=0)
+
+    # order the columns by oemof tuple, sequences before scalars and
+    # variable name, so that the columns of every oemof tuple and kind are
+    # adjacent and can be handed out as views
+    name_ranks = np.argsort(np.argsort(names.astype(str)))
+    order = np.lexsort((name_ranks[column_names], scalar, column_keys))
+    dense = dense[:, order]
+    column_keys = column_keys[order]
+    column_names = names[column_names[order]]
+    scalar = scalar[order]
+    bounds = np.searchsorted(column_keys, np.arange(len(keys) + 1))
+    splits = bounds[:-1] + np.bincount(column_keys[~scalar],
+                                       minlength=len(keys))
+
+    # scalars are taken from the first timestep at which all scalars of an
+    # oemof tuple are defined
+    rows = np.zeros(len(keys), dtype=np.intp)
+    with_scalars = np.flatnonzero(bounds[1:] > splits)
+    if len(with_scalars):
+        starts = np.searchsorted(np.flatnonzero(scalar), splits[with_scalars])
+        complete = np.logical_and.reduceat(
+            ~np.isnan(dense[:, scalar]), starts, axis=1)
+        if not complete.any(axis=0).all():
             error_message = ('Cannot access index on result data. ' +
                              'Did the optimization terminate without errors?')
             raise IndexError(error_message)
+        rows[with_scalars] = complete.argmax(axis=0)
 
-    # add dual variables for bus constraints
+    # attach duals and reduced costs, if the model imported them
+    extras = {}
     if hasattr(om, 'dual'):
-        grouped = groupby(sorted(om.Bus.balance.iterkeys()), lambda p: p[0])
-        for bus, timesteps in grouped:
-            duals = [om.dual[om.Bus.balance[bus, t]] for _, t in timesteps]
-            df = pd.DataFrame({'duals': duals}, index=om.es.timeindex)
-            if (bus,) not in results.keys():
-                results[(bus,)] = {'sequences': df, 'scalars': pd.Series()}
+        for name, values in duals(om).items():
+            column = 'duals' if name == 'Bus.balance' else name + '.dual'
+            _add_extras(extras, column, values)
+    if hasattr(om, 'rc'):
+        for name, values in reduced_costs(om).items():
+            _add_extras(extras, name + '.rc', values)
+
+    results = Results(timeindex, keys, dense, column_names, bounds, splits,
+                      rows, extras)
+    if hasattr(om, 'timings'):
+        om.timings['results'] = time.perf_counter() - start
+    return results
+
+
+def _add_extras(extras, column, values):
+    """ Add the DataFrame or Series `values` as `column` to the results of
+    the oemof tuples in its columns or index, respectively. Other columns or
+    index entries are skipped.
+    """
+    if isinstance(values, pd.DataFrame):
+        for i, key in enumerate(values.columns):
+            if _is_oemof_tuple(key):
+                extras.setdefault(key, []).append(
+                    (column, True, values.values[:, i]))
+    else:
+        for key, value in zip(values.index, values.values):
+            if _is_oemof_tuple(key):
+                extras.setdefault(key, []).append((column, False, value))
+
+
+def _is_oemof_tuple(key):
+    """ Whether `key` is a non-empty tuple of nodes. """
+    return (isinstance(key, tuple) and len(key) > 0 and
+            all(isinstance(n, Node) for n in key))
+
+
+def _timestep_indexed(component, om):
+    """
+    Whether the last element of the index of `component` is a timestep.
+
+    That's the case if the component is indexed over `om.TIMESTEPS`, either
+    alone or as the last set of a product, or if it is declared over nodes
+    only and its elements were added as `(nodes..., timestep)` later on, like
+    the bus balances.
+    """
+    subsets = getattr(component, '_implicit_subsets', None)
+    if subsets:
+        return subsets[-1] is om.TIMESTEPS
+    index_set = component.index_set()
+    if index_set is om.TIMESTEPS:
+        return True
+    first = next(iter(component._data))
+    return (isinstance(first, tuple) and
+            len(first) == (index_set.dimen or 0) + 1 and
+            first[-1] in om.TIMESTEPS)
+
+
+def _suffix_values(om, suffix, ctype):
+    """
+    Read `suffix` for all components of type `ctype` in one pass per
+    component.
+
+    Returns a dictionary keyed by component name, e.g. `'Bus.balance'`. Time
+    dependent components are returned as a DataFrame with a row per timestep
+    and a column per oemof tuple, the others as a Series indexed by the oemof
+    tuples. Missing values are `NaN`. Components which aren't indexed by
+    nodes and timesteps, e.g. ones added by users, are returned as a Series
+    indexed by their own index.
+    """
+    frames = {}
+    get = suffix.get
+    periods = len(om.es.timeindex)
+    for component in om.component_objects(ctype, active=True):
+        items = list(component._data.items())
+        if not items:
+            continue
+        index = [i for i, _ in items]
+        values = np.array([get(data) for _, data in items], dtype=np.float64)
+        frame = None
+        if _timestep_indexed(component, om):
+            try:
+                oemof_tuples, timesteps, timed = _index_columns(index)
+            except (ValueError, TypeError):
+                timed = False
             else:
-                results[(bus,)]['sequences']['duals'] = duals
+                timed = (timed and timesteps.min() >= 0 and
+                         timesteps.max() < periods)
+        else:
+            timed = False
+            if all(isinstance(i, Node) or _is_oemof_tuple(i) for i in index):
+                oemof_tuples = [i if isinstance(i, tuple) else (i,)
+                                for i in index]
+                frame = pd.Series
+        if timed:
+            codes, keys = pd.factorize(
+                pd.Series(oemof_tuples, dtype=object).values)
+            if all(k == () or _is_oemof_tuple(k) for k in keys):
+                frame = pd.DataFrame
+        if frame is pd.DataFrame:
+            dense = np.full((periods, len(keys)), np.nan)
+            dense[timesteps, codes] = values
+            frames[component.name] = pd.DataFrame(
+                dense, index=om.es.timeindex,
+                columns=pd.Index(keys, tupleize_cols=False))
+        elif frame is pd.Series:
+            frames[component.name] = pd.Series(
+                values, index=pd.Index(oemof_tuples, tupleize_cols=False))
+        else:
+            frames[component.name] = pd.Series(
+                values, index=pd.Index(index, tupleize_cols=False))
+    return frames
+
+
+def duals(om):
+    """
+    Get the duals of all constraints of the solved model `om`.
+
+    The model has to import them, see :meth:`receive_duals
+    <oemof.solph.models.OperationalModel.receive_duals>`. Returns a
+    dictionary keyed by constraint name, e.g. `'Bus.balance'`, holding a
+    DataFrame with a row per timestep and a column per oemof tuple for time
+    dependent constraints and a Series indexed by oemof tuple for the others.
+    `duals(om)['Bus.balance']` are the shadow prices of all buses. In
+    :func:`results`, the duals are added as `'<constraint name>.dual'`, except
+    the ones of the bus balances, which are added as `'duals'`.
+    """
+    return _suffix_values(om, om.dual, Constraint)
+
+
+def reduced_costs(om):
+    """
+    Get the reduced costs of all variables of the solved model `om`.
+
+    Like :func:`duals`, keyed by variable name, e.g. `'flow'`. In
+    :func:`results`, the reduced costs are added as `'<variable name>.rc'`.
+    """
+    return _suffix_values(om, om.rc, Var)
 
-    return results
+
+class FlowCube:
+    """
+    The values of all flows of a solved model as one dense array.
+
+    Row `i` of :attr:`values` holds the values of the flow from
+    `nodes[sources[i]]` to `nodes[targets[i]]` for every timestep. Use
+    :func:`flow_cube` to create one from a model.
+
+    Attributes
+    ----------
+    values : numpy.ndarray
+        The flow values, with shape `(len(flows), len(timeindex))`.
+    sources, targets : numpy.ndarray
+        The positions of the source and target nodes of the flows in
+        :attr:`nodes`.
+    nodes : numpy.ndarray
+        An object array of the nodes of the energy system.
+    flows : list
+        The `(source, target)` tuples of the flows, in row order.
+    timeindex : pandas.DatetimeIndex
+    timeincrement : numpy.ndarray
+        The length of every timestep in hours.
+    capacity : numpy.ndarray
+        The nominal value or, for investment flows, the optimized capacity
+        of every flow. `NaN` if a flow has neither.
+    """
+    def __init__(self, values, sources, targets, nodes, flows, timeindex,
+                 timeincrement, capacity):
+        self.values = values
+        self.sources = sources
+        self.targets = targets
+        self.nodes = nodes
+        self.flows = flows
+        self.timeindex = timeindex
+        self.timeincrement = timeincrement
+        self.capacity = capacity
+
+    def energy(self):
+        """ Return the energy transported by every flow over all timesteps.
+        """
+        return self.values.dot(self.timeincrement.astype(self.values.dtype))
+
+    def peak(self):
+        """ Return the maximum value of every flow.
+        """
+        return self.values.max(axis=1)
+
+    def capacity_factor(self):
+        """ Return the ratio of the energy of every flow to the energy it
+        would transport at full capacity.
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.energy() / (self.capacity * self.timeincrement.sum())
+
+    def inflow(self):
+        """ Return the energy flowing into every node, aligned with
+        :attr:`nodes`.
+        """
+        return np.bincount(self.targets, weights=self.energy(),
+                           minlength=len(self.nodes))
+
+    def outflow(self):
+        """ Return the energy flowing out of every node, aligned with
+        :attr:`nodes`.
+        """
+        return np.bincount(self.sources, weights=self.energy(),
+                           minlength=len(self.nodes))
+
+
+def flow_cube(om, dtype=np.float64):
+    """
+    Create a :class:`FlowCube` from the flow values of the solved model `om`.
+
+    `dtype` can be set to :class:`numpy.float32` to halve the memory used
+    for large models.
+    """
+    flows = list(om.FLOWS)
+    timesteps = list(om.TIMESTEPS)
+    nodes = list(om.es.nodes)
+    positions = {n: i for i, n in enumerate(nodes)}
+    for _, target in flows:
+        if target not in positions:
+            positions[target] = len(nodes)
+            nodes.append(target)
+    sources = np.fromiter((positions[s] for s, _ in flows), dtype=np.intp,
+                          count=len(flows))
+    targets = np.fromiter((positions[t] for _, t in flows), dtype=np.intp,
+                          count=len(flows))
+
+    data = om.flow._data
+    values = np.array([data[s, t, ts].value
+                       for s, t in flows for ts in timesteps],
+                      dtype=dtype).reshape(len(flows), len(timesteps))
+
+    capacity = np.array([om.flows[f].nominal_value for f in flows],
+                        dtype=np.float64)
+    if hasattr(om, 'InvestmentFlow'):
+        invest = om.InvestmentFlow.invest
+        for i, f in enumerate(flows):
+            if f in invest:
+                capacity[i] = invest[f].value
+
+    node_array = np.empty(len(nodes), dtype=object)
+    node_array[:] = nodes
+    return FlowCube(values, sources, targets, node_array, flows,
+                    om.es.timeindex,
+                    np.array([om.timeincrement[t] for t in timesteps],
+                             dtype=np.float64),
+                    capacity)
+
+
+def _peak_rss():
+    """ Return the peak resident set size of this process in bytes or `None`
+    if it can't be determined on this platform.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _model_size(om, problem):
+    """ Return the number of rows, columns, nonzeros and integer variables of
+    the model `om`, preferring the numbers reported by the solver.
+    """
+    def reported(key):
+        value = problem.get(key) if problem is not None else None
+        value = getattr(value, 'value', value)
+        return int(value) if isinstance(value, Number) else None
+
+    rows = reported('Number of constraints')
+    if rows is None:
+        rows = sum(1 for _ in om.component_data_objects(Constraint,
+                                                        active=True))
+    columns = reported('Number of variables')
+    if columns is None:
+        columns = sum(1 for _ in om.component_data_objects(Var))
+    integers = sum(1 for v in om.component_data_objects(Var)
+                   if not v.is_continuous())
+    return {'rows': rows, 'columns': columns,
+            'nonzeros': reported('Number of nonzeros'),
+            'integers': integers}
 
 
 def meta_results(om, undefined=False):
@@ -143,7 +597,17 @@ def meta_results(om, undefined=False):
     Fetch some meta data from the Solver. Feel free to add more keys.
 
     Valid keys of the resulting dictionary are: 'objective', 'problem',
-    'solver'.
+    'solver', 'timings', 'size' and 'peak_rss'.
+
+    'timings' holds the wall clock seconds spent for constructing the energy
+    system, i.e. in its constructor, registering and grouping its nodes
+    ('energy_system'), building the model ('build'), solving it, i.e.
+    writing the problem file, running the solver and loading the solution
+    ('solve'), and creating the :func:`results` ('results'), as far as these
+    steps have been run.
+    'size' holds the number of 'rows', 'columns', 'nonzeros' and 'integers'
+    of the problem. 'nonzeros' is `None` if the solver doesn't report it.
+    'peak_rss' is the peak resident set size of the process in bytes.
 
     om : oemof.solph.OperationalModel
         A solved Model.
@@ -174,4 +638,8 @@ def meta_results(om, undefined=False):
                     meta_res[k1][k2] = msg.format(
                         type(om.es.results[k1][0][k2]))
 
+    meta_res['timings'] = dict(getattr(om, 'timings', {}))
+    meta_res['size'] = _model_size(om, meta_res['problem'])
+    meta_res['peak_rss'] = _peak_rss()
+
     return meta_res
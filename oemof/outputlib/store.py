@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+A compressed, chunked on-disk store for solph results.
+
+Results as returned by :func:`processing.results
+<oemof.outputlib.processing.results>` are stored in a directory. Sequences
+are split into chunks of consecutive timesteps, each of which is written to
+a compressed `.npz` file holding one array per oemof tuple. A JSON manifest
+records the keys and the time range of every chunk, so reading the results of
+a few nodes or of a short period only touches the arrays needed. Results of
+consecutive runs, e.g. of a rolling horizon optimization, can be appended.
+
+Keys are stored as tuples of node labels, i.e. like
+:func:`views.convert_keys_to_strings
+<oemof.outputlib.views.convert_keys_to_strings>` returns them.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+VERSION = 1
+
+
+class ResultsStore:
+    """ Write and read solph results to and from the directory `path`.
+
+    Parameters
+    ----------
+    path : str
+        The directory holding the store. It is created on the first write.
+    chunk_size : int, optional
+        The number of timesteps stored per chunk. Defaults to 744, i.e. one
+        month of hourly values.
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> from oemof.network import Bus
+    >>> bus = Bus(label="bus")
+    >>> index = pd.date_range('1/1/2017', periods=4, freq='H')
+    >>> results = {(bus,): {
+    ...     'scalars': pd.Series({'invest': 5.}),
+    ...     'sequences': pd.DataFrame({'duals': [1., 2., 3., 4.]},
+    ...                               index=index)}}
+    >>> store = ResultsStore(tempfile.mkdtemp(), chunk_size=2)
+    >>> store.append(results)
+    >>> store.keys()
+    [('bus',)]
+    >>> store.read(start='2017-01-01 02:00')[('bus',)]['sequences']
+                         duals
+    2017-01-01 02:00:00    3.0
+    2017-01-01 03:00:00    4.0
+    """
+    def __init__(self, path, chunk_size=744):
+        self.path = path
+        self.chunk_size = chunk_size
+        manifest = os.path.join(path, 'manifest.json')
+        if os.path.isfile(manifest):
+            with open(manifest) as f:
+                self._manifest = json.load(f)
+            if self._manifest['version'] > VERSION:
+                raise ValueError(
+                    "Can't read results store version {} with this version "
+                    "of oemof.".format(self._manifest['version']))
+        else:
+            self._manifest = {'version': VERSION, 'keys': [], 'tz': None,
+                              'chunks': []}
+        self._ids = {tuple(k): i for i, k in enumerate(self._manifest['keys'])}
+
+    def keys(self):
+        """ Return the keys of all results stored so far.
+        """
+        return [tuple(k) for k in self._manifest['keys']]
+
+    def _id(self, key):
+        if key not in self._ids:
+            self._ids[key] = len(self._manifest['keys'])
+            self._manifest['keys'].append(list(key))
+        return self._ids[key]
+
+    def append(self, results):
+        """ Append `results` to the store.
+
+        `results` is a dictionary like the one returned by
+        :func:`processing.results <oemof.outputlib.processing.results>`. The
+        sequences have to share one :class:`pandas.DatetimeIndex`, which
+        should start after the last timestep stored so far. Scalars are
+        stored with every chunk written by this call.
+        """
+        results = {tuple(str(n) for n in k): v for k, v in results.items()}
+        index = next((v['sequences'].index for v in results.values()
+                      if not v['sequences'].empty), None)
+        if index is None:
+            index = pd.DatetimeIndex([])
+        if index.tz is not None:
+            self._manifest['tz'] = str(index.tz)
+            index = index.tz_convert('UTC').tz_localize(None)
+        times = index.asi8
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        for start in range(0, max(len(times), 1), self.chunk_size):
+            stop = start + self.chunk_size
+            arrays = {'time': times[start:stop]}
+            for key, value in results.items():
+                i = self._id(key)
+                sequences = value['sequences']
+                scalars = value['scalars']
+                arrays['{}/columns'.format(i)] = np.array(
+                    [str(c) for c in sequences.columns], dtype=str)
+                values = sequences.values[start:stop].astype(np.float64)
+                if not len(sequences):
+                    # e.g. the empty DataFrame of keys without sequences
+                    values = np.full((len(arrays['time']),
+                                      len(sequences.columns)), np.nan)
+                arrays['{}/sequences'.format(i)] = values
+                arrays['{}/scalar_names'.format(i)] = np.array(
+                    [str(c) for c in scalars.index], dtype=str)
+                arrays['{}/scalars'.format(i)] = scalars.values.astype(
+                    np.float64)
+            name = 'chunk-{:06d}.npz'.format(len(self._manifest['chunks']))
+            np.savez_compressed(os.path.join(self.path, name), **arrays)
+            self._manifest['chunks'].append({
+                'file': name,
+                'keys': sorted(self._ids[k] for k in results),
+                'first': int(times[start]) if len(times) else None,
+                'last': (int(times[min(stop, len(times)) - 1])
+                         if len(times) else None)})
+
+        # Writing the manifest last means that an interrupted write leaves
+        # the store as it was before.
+        manifest = os.path.join(self.path, 'manifest.json')
+        with open(manifest + '.tmp', 'w') as f:
+            json.dump(self._manifest, f)
+        os.replace(manifest + '.tmp', manifest)
+
+    def read(self, keys=None, nodes=None, start=None, end=None,
+             energy_system=None):
+        """ Read results from the store.
+
+        Parameters
+        ----------
+        keys : iterable, optional
+            Only read these keys, given as tuples of nodes or node labels.
+        nodes : iterable, optional
+            Only read keys containing at least one of these nodes or node
+            labels.
+        start, end : str or datetime-like, optional
+            Only read sequences from `start` to `end`, inclusive. Only the
+            chunks overlapping this period are read.
+        energy_system : :class:`EnergySystem
+            <oemof.energy_system.EnergySystem>`, optional
+            If given, the labels in the keys of the result are replaced by the
+            nodes of this energy system.
+
+        Returns
+        -------
+        dict
+            Keyed by oemof tuples and holding a dictionary with a
+            :class:`pandas.Series` of `'scalars'` and a
+            :class:`pandas.DataFrame` of `'sequences'` per key, like
+            :func:`processing.results
+            <oemof.outputlib.processing.results>`. Scalars are the ones
+            written last among the chunks read.
+        """
+        wanted = set(self._ids)
+        if keys is not None:
+            wanted &= set(tuple(str(n) for n in k) for k in keys)
+        if nodes is not None:
+            labels = set(str(n) for n in nodes)
+            wanted = set(k for k in wanted if labels.intersection(k))
+        ids = {self._ids[k]: k for k in wanted}
+
+        tz = self._manifest['tz']
+        bounds = []
+        for bound in (start, end):
+            if bound is not None:
+                bound = pd.Timestamp(bound)
+                if tz is not None:
+                    bound = (bound.tz_localize(tz) if bound.tz is None
+                             else bound).tz_convert('UTC').tz_localize(None)
+                bound = bound.value
+            bounds.append(bound)
+        start, end = bounds
+
+        pieces = {k: {'times': [], 'sequences': [], 'scalars': None}
+                  for k in wanted}
+        for chunk in self._manifest['chunks']:
+            if not ids.keys() & set(chunk['keys']):
+                continue
+            if chunk['first'] is not None and (
+                    (start is not None and chunk['last'] < start) or
+                    (end is not None and chunk['first'] > end)):
+                continue
+            with np.load(os.path.join(self.path, chunk['file'])) as data:
+                times = data['time']
+                mask = np.ones(len(times), dtype=bool)
+                if start is not None:
+                    mask &= times >= start
+                if end is not None:
+                    mask &= times <= end
+                for i in ids.keys() & set(chunk['keys']):
+                    piece = pieces[ids[i]]
+                    piece['scalars'] = pd.Series(
+                        data['{}/scalars'.format(i)],
+                        index=data['{}/scalar_names'.format(i)].tolist())
+                    columns = data['{}/columns'.format(i)].tolist()
+                    if not len(times):
+                        continue
+                    piece['times'].append(times[mask])
+                    piece['sequences'].append(pd.DataFrame(
+                        data['{}/sequences'.format(i)][mask],
+                        columns=columns))
+
+        groups = energy_system.groups if energy_system is not None else None
+
+        results = {}
+        for key, piece in pieces.items():
+            if piece['scalars'] is None:
+                continue
+            index = pd.DatetimeIndex(np.concatenate(piece['times'])
+                                     if piece['times'] else [])
+            if tz is not None:
+                index = index.tz_localize('UTC').tz_convert(tz)
+            sequences = (pd.concat(piece['sequences'], ignore_index=True)
+                         if piece['sequences'] else pd.DataFrame())
+            sequences.index = index
+            if groups is not None:
+                key = tuple(groups[label] for label in key)
+            results[key] = {'scalars': piece['scalars'],
+                            'sequences': sequences}
+        return results
@@ -7,6 +7,8 @@ Information about the possible usage is provided within the examples.
 
 import pandas as pd
 
+from oemof.outputlib import processing
+
 
 def convert_keys_to_strings(results):
     """
@@ -20,6 +22,69 @@ def convert_keys_to_strings(results):
     return converted
 
 
+class NodeIndex:
+    """
+    Index of the result keys every node appears in.
+
+    The index is built in one pass over the keys of `results`, without
+    accessing the results themselves, and maps every node as well as its
+    label string to the keys containing the node. :func:`node` uses it to
+    find the results of a node without scanning all keys and caches the
+    frames it builds per node. The index reflects the keys of `results` at
+    construction time.
+    """
+    def __init__(self, results):
+        self.results = results
+        self._keys = {}
+        for k in results:
+            for n in set(k):
+                self._keys.setdefault(n, []).append(k)
+                # keys may consist of labels already, e.g. the ones of
+                # :func:`convert_keys_to_strings`
+                if str(n) != n:
+                    self._keys.setdefault(str(n), []).append(k)
+        self._cache = {}
+
+    def keys(self, node):
+        """ Return the keys of all results `node` appears in.
+
+        `node` can be a node or the label string of a node.
+        """
+        return self._keys.get(node, [])
+
+    def node(self, node):
+        """ Return the results of `node`, see :func:`views.node <node>`.
+        """
+        if node not in self._cache:
+            if type(node) is str:
+                results = {tuple(str(e) for e in k): self.results[k]
+                           for k in self.keys(node)}
+            else:
+                results = {k: self.results[k] for k in self.keys(node)}
+            self._cache[node] = _filtered(results)
+        return dict(self._cache[node])
+
+
+def node_index(results):
+    """
+    Return a :class:`NodeIndex` for `results`.
+
+    The index of a :class:`Results <oemof.outputlib.processing.Results>`
+    object is built only once and stored with it, until the results are
+    modified. For other mappings, like plain dictionaries, a new index is
+    built on every call, so create one with this function and pass it on to
+    :func:`node` when looking up several nodes. `results` can also be a
+    :class:`NodeIndex` already.
+    """
+    if isinstance(results, NodeIndex):
+        return results
+    if isinstance(results, processing.Results):
+        if results._node_index is None:
+            results._node_index = NodeIndex(results)
+        return results._node_index
+    return NodeIndex(results)
+
+
 def node(results, node):
     """
     Obtain results for a single node e.g. a Bus or Component.
@@ -27,40 +92,38 @@ def node(results, node):
     Either a node or its label string can be passed.
     Results are written into a dictionary which is keyed by 'scalars' and
     'sequences' holding respective data in a pandas Series and DataFrame.
+    `results` can also be a :class:`NodeIndex`, see :func:`node_index`.
+    Repeated calls for the same node with the same index return the same
+    pandas objects, so don't modify them in place.
     """
-    # convert to keys if only a string is passed
-    if type(node) is str:
-        results = convert_keys_to_strings(results)
+    return node_index(results).node(node)
+
 
+def _filtered(results):
+    """
+    Concatenate the scalars and sequences of the `results` of one node.
+    """
     filtered = {}
 
     # create a series with tuples as index labels for scalars
     scalars = {k: v['scalars'] for k, v in results.items()
-               if node in k and not v['scalars'].empty}
+               if not v['scalars'].empty}
     if scalars:
         # aggregate data
         filtered['scalars'] = pd.concat(scalars.values(), axis=0)
         # assign index values
-        idx = {k: [c for c in v['scalars'].index]
-               for k, v in results.items()
-               if node in k and not v['scalars'].empty}
-        idx = [tuple((k, m) for m in v) for k, v in idx.items()]
-        idx = [i for sublist in idx for i in sublist]
+        idx = [(k, m) for k, v in scalars.items() for m in v.index]
         filtered['scalars'].index = idx
         filtered['scalars'].sort_index(axis=0, inplace=True)
 
     # create a dataframe with tuples as column labels for sequences
     sequences = {k: v['sequences'] for k, v in results.items()
-                 if node in k and not v['sequences'].empty}
+                 if not v['sequences'].empty}
     if sequences:
         # aggregate data
         filtered['sequences'] = pd.concat(sequences.values(), axis=1)
         # assign column names
-        cols = {k: [c for c in v['sequences'].columns]
-                for k, v in results.items()
-                if node in k and not v['sequences'].empty}
-        cols = [tuple((k, m) for m in v) for k, v in cols.items()]
-        cols = [c for sublist in cols for c in sublist]
+        cols = [(k, m) for k, v in sequences.items() for m in v.columns]
         filtered['sequences'].columns = cols
         filtered['sequences'].sort_index(axis=1, inplace=True)
 
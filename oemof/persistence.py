@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+""" A columnar on-disk format for energy systems.
+
+An energy system is stored in a directory containing two files:
+
+* `tables.npz` holds a node table, a flow table and a table with the
+  attributes of the energy system itself. Every attribute of a node or flow
+  is stored as a column, i.e. as a couple of arrays with one entry per node
+  or flow. Numbers are stored directly, strings and other values which
+  can't be stored as numbers are stored in a shared byte buffer, the latter
+  ones pickled. References to nodes and flows inside of pickled values are
+  stored as indices into the tables, so pickling never drags in the whole
+  graph.
+* `sequences.npy` holds all numeric sequences, i.e. lists, tuples, arrays
+  and series of numbers, concatenated into one contiguous array of floats.
+  It is memory mapped on load, so sequences are only read from disk when
+  they are accessed.
+
+Groups and results are not stored. Groups are rebuilt on load from the
+groupings of the energy system the nodes are loaded into.
+"""
+
+from importlib import import_module
+from io import BytesIO
+import json
+import numbers
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+import dill
+
+from oemof.network import Node, flow
+
+
+VERSION = 1
+
+# The kinds of values stored in a column.
+ABSENT, NONE, BOOL, INT, FLOAT, STR, SEQUENCE, PICKLE, DILL = range(9)
+
+# Marks values which are absent, e.g. attributes a node doesn't have.
+_MISSING = object()
+
+
+def _class_name(obj):
+    return "{}:{}".format(type(obj).__module__, type(obj).__qualname__)
+
+
+def _class(name):
+    module, qualname = name.split(":")
+    cls = import_module(module)
+    for attribute in qualname.split("."):
+        cls = getattr(cls, attribute)
+    return cls
+
+
+def _numeric_sequence(value):
+    """ Return `value` as a float array if it is a numeric sequence, else
+    `None`.
+    """
+    if not isinstance(value, (list, tuple, np.ndarray, pd.Series)):
+        return None
+    array = np.asarray(value)
+    if array.ndim != 1 or array.dtype.kind not in 'iuf':
+        return None
+    return array.astype(np.float64, copy=False)
+
+
+class _Writer:
+    def __init__(self, nodes, flows):
+        self.arrays = {}
+        self.blobs = bytearray()
+        self.sequences = []
+        self.length = 0
+        self.ids = {}
+        for i, node in enumerate(nodes):
+            self.ids[id(node)] = ('node', i)
+        for j, f in enumerate(flows):
+            if hasattr(f, '__dict__'):
+                self.ids[id(f)] = ('flow', j)
+
+    def persistent_id(self, obj):
+        return self.ids.get(id(obj))
+
+    def blob(self, data):
+        start = len(self.blobs)
+        self.blobs.extend(data)
+        return start, len(self.blobs)
+
+    def pickle(self, value):
+        for kind, module in ((PICKLE, pickle), (DILL, dill)):
+            buffer = BytesIO()
+            pickler = module.Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL)
+            pickler.persistent_id = self.persistent_id
+            try:
+                pickler.dump(value)
+            except (pickle.PicklingError, AttributeError, TypeError):
+                if module is dill:
+                    raise
+                continue
+            return (kind,) + self.blob(buffer.getvalue())
+
+    def sequence(self, array):
+        self.sequences.append(array)
+        start = self.length
+        self.length += len(array)
+        return start, self.length
+
+    def cell(self, value):
+        """ Return the kind, the integer, the float and the stop entry
+        representing `value` in a column.
+        """
+        if value is None:
+            return NONE, 0, 0., 0
+        if isinstance(value, bool):
+            return BOOL, int(value), 0., 0
+        if (isinstance(value, numbers.Integral) and
+                -2 ** 63 <= value < 2 ** 63):
+            return INT, int(value), 0., 0
+        if isinstance(value, float):
+            return FLOAT, 0, value, 0
+        if isinstance(value, str):
+            start, stop = self.blob(value.encode('utf-8'))
+            return STR, start, 0., stop
+        array = _numeric_sequence(value)
+        if array is not None:
+            start, stop = self.sequence(array)
+            return SEQUENCE, start, 0., stop
+        kind, start, stop = self.pickle(value)
+        return kind, start, 0., stop
+
+    def column(self, key, values):
+        """ Store `values` as the column `key`. Missing values are given as
+        `_MISSING`.
+        """
+        cells = [(ABSENT, 0, 0., 0) if v is _MISSING else self.cell(v)
+                 for v in values]
+        kinds, integers, floats, stops = (zip(*cells) if cells
+                                          else ((), (), (), ()))
+        self.arrays[key + '/kind'] = np.array(kinds, dtype=np.uint8)
+        self.arrays[key + '/int'] = np.array(integers, dtype=np.int64)
+        self.arrays[key + '/float'] = np.array(floats, dtype=np.float64)
+        self.arrays[key + '/stop'] = np.array(stops, dtype=np.int64)
+
+    def table(self, name, objects):
+        """ Store the attributes of `objects` as columns of table `name` and
+        return the attribute names.
+        """
+        attributes = sorted(set(a for o in objects
+                                for a in getattr(o, '__dict__', ())))
+        for attribute in attributes:
+            self.column(
+                '{}/attributes/{}'.format(name, attribute),
+                [getattr(o, '__dict__', {}).get(attribute, _MISSING)
+                 for o in objects])
+        return attributes
+
+
+class _Reader:
+    def __init__(self, arrays, blobs, sequences):
+        self.arrays = arrays
+        self.blobs = blobs
+        self.sequences = sequences
+        self.objects = {}
+
+    def persistent_load(self, pid):
+        return self.objects[pid]
+
+    def column(self, key):
+        """ Return the values of column `key`, with `_MISSING` marking missing
+        ones.
+        """
+        kinds = self.arrays[key + '/kind']
+        integers = self.arrays[key + '/int'].tolist()
+        floats = self.arrays[key + '/float'].tolist()
+        stops = self.arrays[key + '/stop'].tolist()
+        values = []
+        for row, kind in enumerate(kinds.tolist()):
+            start, stop = integers[row], stops[row]
+            if kind == ABSENT:
+                value = _MISSING
+            elif kind == NONE:
+                value = None
+            elif kind == BOOL:
+                value = bool(start)
+            elif kind == INT:
+                value = start
+            elif kind == FLOAT:
+                value = floats[row]
+            elif kind == STR:
+                value = self.blobs[start:stop].decode('utf-8')
+            elif kind == SEQUENCE:
+                value = self.sequences[start:stop]
+            else:
+                module = pickle if kind == PICKLE else dill
+                unpickler = module.Unpickler(BytesIO(self.blobs[start:stop]))
+                unpickler.persistent_load = self.persistent_load
+                value = unpickler.load()
+            values.append(value)
+        return values
+
+    def table(self, name, objects, attributes):
+        for attribute in attributes:
+            values = self.column('{}/attributes/{}'.format(name, attribute))
+            for o, value in zip(objects, values):
+                if value is not _MISSING:
+                    o.__dict__[attribute] = value
+
+
+def save(energy_system, path):
+    """ Store `energy_system` in the directory `path`.
+
+    The directory is created if necessary. See the module documentation for
+    a description of the format.
+    """
+    nodes = list(energy_system.nodes)
+    for node in nodes:
+        if not isinstance(node, Node):
+            raise TypeError("Only nodes can be saved, got: {!r}".format(node))
+    members = len(nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    flows = energy_system.flows()
+    for _, target in flows:
+        if target not in index:
+            index[target] = len(nodes)
+            nodes.append(target)
+    objects = list(flows.values())
+
+    writer = _Writer(nodes, objects)
+    arrays = writer.arrays
+    arrays['nodes/class'] = np.array([_class_name(n) for n in nodes])
+    arrays['nodes/member'] = np.arange(len(nodes)) < members
+    arrays['nodes/frozen'] = np.array([n.frozen for n in nodes], dtype=bool)
+    writer.column('nodes/label', [n.label if hasattr(n, '_label')
+                                  else _MISSING for n in nodes])
+    node_attributes = writer.table('nodes', nodes)
+
+    arrays['flows/source'] = np.array([index[s] for s, _ in flows],
+                                      dtype=np.intp)
+    arrays['flows/target'] = np.array([index[t] for _, t in flows],
+                                      dtype=np.intp)
+    arrays['flows/class'] = np.array(
+        [_class_name(f) if hasattr(f, '__dict__') else '' for f in objects])
+    writer.column('flows/value', [_MISSING if hasattr(f, '__dict__') else f
+                                  for f in objects])
+    flow_attributes = writer.table('flows', objects)
+
+    writer.column('system/timeindex', [energy_system.timeindex])
+
+    arrays['meta'] = np.array(json.dumps({
+        'version': VERSION,
+        'class': _class_name(energy_system),
+        'nodes': node_attributes,
+        'flows': flow_attributes}))
+    arrays['blobs'] = np.frombuffer(bytes(writer.blobs), dtype=np.uint8)
+
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    np.save(os.path.join(path, 'sequences.npy'),
+            np.concatenate(writer.sequences) if writer.sequences
+            else np.empty(0))
+    np.savez_compressed(os.path.join(path, 'tables.npz'), **arrays)
+
+
+def load(path, mmap=True):
+    """ Load the nodes and flows stored in `path`.
+
+    Returns the nodes which were part of the stored energy system and a
+    dictionary of the stored attributes of the energy system, which can be
+    used as keyword arguments to construct a new one. The nodes are not added
+    to any energy system.
+
+    If `mmap` is `True`, numeric sequences are returned as copy-on-write views
+    of the memory mapped `sequences.npy`, so they are only read when accessed
+    and changing them doesn't change the file. Otherwise, they are read into
+    memory right away. Either way, they are loaded as :class:`numpy arrays
+    <numpy.ndarray>`.
+    """
+    with np.load(os.path.join(path, 'tables.npz')) as tables:
+        arrays = {key: tables[key] for key in tables.files}
+    meta = json.loads(str(arrays['meta']))
+    if meta['version'] > VERSION:
+        raise ValueError(
+            "Can't load format version {} with this version of oemof."
+            .format(meta['version']))
+    sequences = np.load(os.path.join(path, 'sequences.npy'),
+                        mmap_mode='c' if mmap else None)
+    reader = _Reader(arrays, arrays['blobs'].tobytes(), sequences)
+
+    # Create empty nodes and flows first, so that pickled values can refer
+    # to them.
+    classes = {name: _class(name) for name in
+               set(arrays['nodes/class'].tolist()).union(
+                   arrays['flows/class'].tolist()) if name}
+    nodes = [classes[name].__new__(classes[name])
+             for name in arrays['nodes/class'].tolist()]
+    objects = [classes[name].__new__(classes[name]) if name else None
+               for name in arrays['flows/class'].tolist()]
+    reader.objects.update((('node', i), n) for i, n in enumerate(nodes))
+    reader.objects.update((('flow', j), f) for j, f in enumerate(objects)
+                          if f is not None)
+
+    for node, label, frozen in zip(nodes, reader.column('nodes/label'),
+                                   arrays['nodes/frozen'].tolist()):
+        kwargs = {'frozen': frozen}
+        if label is not _MISSING:
+            kwargs['label'] = label
+        Node.__setstate__(node, ((), kwargs))
+    reader.table('nodes', nodes, meta['nodes'])
+    for j, value in enumerate(reader.column('flows/value')):
+        if value is not _MISSING:
+            objects[j] = value
+    reader.table('flows', objects, meta['flows'])
+
+    for s, t, f in zip(arrays['flows/source'].tolist(),
+                       arrays['flows/target'].tolist(), objects):
+        flow[nodes[s], nodes[t]] = f
+    for node in nodes:
+        node._state = ((), {'label': node.label, 'frozen': node.frozen,
+                            'inputs': dict(node.inputs),
+                            'outputs': dict(node.outputs)})
+
+    members = [n for n, member in zip(nodes, arrays['nodes/member'].tolist())
+               if member]
+    return members, {'timeindex': reader.column('system/timeindex')[0]}
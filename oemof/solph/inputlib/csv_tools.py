@@ -1,9 +1,19 @@
 # -*- coding: utf-8 -*-
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import zip_longest
+import csv
+import hashlib
+import numpy as np
 import pandas as pd
 import os
+import pickle
+import shutil
+import tempfile
 import logging
 from oemof import network
+from oemof.tools import helpers
 from ..options import NonConvex, Investment
 from ..plumbing import sequence
 from ..network import (Bus, Source, Sink, Flow, Transformer)
@@ -13,7 +23,7 @@ from ..components import GenericStorage as Storage
 def nodes_from_csv(file_nodes_flows, file_nodes_flows_sequences,
                    delimiter=',', additional_classes=None,
                    additional_seq_attributes=None,
-                   additional_flow_attributes=None):
+                   additional_flow_attributes=None, cache=None):
     """ Creates nodes with their respective flows and sequences from
     a pre-defined CSV structure. An example has been provided in the
     development examples
@@ -23,7 +33,8 @@ def nodes_from_csv(file_nodes_flows, file_nodes_flows_sequences,
     file_nodes_flows : string
         Name of CSV file with nodes and flows
     file_nodes_flows_sequences : string
-        Name of of CSV file containing sequences
+        Name of of CSV file containing sequences or of a binary sequence
+        store created from one by :func:`sequences_to_binary`
     delimiter : str
         Delimiter of CSV file
     additional_classes : dict
@@ -35,6 +46,10 @@ def nodes_from_csv(file_nodes_flows, file_nodes_flows_sequences,
     additional_flow_attributes : iterable
         List of string with attributes that shall be recognized inside the
         csv file and set as flow attribute
+    cache : bool or str
+        Whether to cache the parsed input files in `~/.oemof/csv_cache`, or
+        the directory to cache them in. Defaults to :data:`CACHE`, i.e. no
+        caching.
 
     """
     # Check attributes for None values
@@ -45,16 +60,8 @@ def nodes_from_csv(file_nodes_flows, file_nodes_flows_sequences,
     if additional_flow_attributes is None:
         additional_flow_attributes = list()
 
-    # dataframe creation and manipulation
-    nodes_flows = pd.read_csv(file_nodes_flows, sep=delimiter)
-    nodes_flows_seq = pd.read_csv(file_nodes_flows_sequences, sep=delimiter,
-                                  header=None)
-    nodes_flows_seq.dropna(axis=0, how='all', inplace=True)
-    nodes_flows_seq.drop(0, axis=1, inplace=True)
-    nodes_flows_seq = nodes_flows_seq.transpose()
-    nodes_flows_seq.set_index([0, 1, 2, 3, 4], inplace=True)
-    nodes_flows_seq.columns = range(0, len(nodes_flows_seq.columns))
-    nodes_flows_seq = nodes_flows_seq.astype(float)
+    table, (keys, values) = _read_input(
+        file_nodes_flows, file_nodes_flows_sequences, delimiter, cache)
 
     # class dictionary for dynamic instantiation
     classes = {'Source': Source, 'Sink': Sink,
@@ -72,206 +79,411 @@ def nodes_from_csv(file_nodes_flows, file_nodes_flows_sequences,
     # attributes of different classes
     flow_attrs = list(vars(Flow()).keys()) + additional_flow_attributes
     bus_attrs = vars(Bus()).keys()
+    invest_attrs = vars(Investment()).keys()
+    nonconvex_attrs = vars(NonConvex()).keys()
+
+    # the columns holding node attributes, i.e. all columns except the ones
+    # of flow attributes and the ones identifying a line, with investment
+    # counting as a node attribute because for storages investment needs to
+    # be set as a node attribute (and a flow attribute)
+    flow_attrs_ = [i for i in flow_attrs if i != 'investment']
+    node_attrs = [c for c in table.columns
+                  if c not in flow_attrs_ and
+                  c not in ('class', 'label', 'source', 'target',
+                            'conversion_factors')]
+
+    # only lines of known classes hold valid data
+    table = table[table['class'].isin(list(classes))]
+    unlabeled = table.index[table['label'].isnull()]
+    if len(unlabeled):
+        raise ValueError('Missing label in line {} in csv file.'
+                         .format(unlabeled[0] + 2))
+    present = table.notnull()
+    rows = dict(zip(table.index, (
+        dict((c, v) for c, v, p in zip(table.columns, line, mask) if p)
+        for line, mask in zip(table.values.tolist(),
+                              present.values.tolist()))))
+    seqs = _merge_sequences(table, keys, values)
+
+    def sequence_of(line, attr):
+        seq = seqs[line, attr].tolist()
+        if attr in seq_attributes or attr == 'conversion_factors':
+            return sequence(seq)
+        return seq
+
+    # group the lines by node, numbering the groups in order of appearance
+    codes = table.groupby(['class', 'label'], sort=False).ngroup().values
+    order = np.argsort(codes, kind='mergesort')
+    groups = np.split(table.index.values[order],
+                      np.flatnonzero(np.diff(codes[order])) + 1)
+    # the last line of every node setting a node attribute, as attributes
+    # must be placed either in the first line or in all lines of multiple
+    # node entries (flows) in the csv file
+    last = pd.DataFrame(
+        np.where(present[node_attrs].values,
+                 table.index.values[:, None].astype(float), np.nan),
+        columns=node_attrs).groupby(codes).last()
 
-    # iteration over dataframe rows to create objects
     nodes = {}
-    for i, r in nodes_flows.iterrows():
-
-        # check if current line holds valid data or is just for visual purposes
-        # e.g. a blank line or a line that contains data explanations
-        if isinstance(r['class'], str) and r['class'] in classes.keys():
+    for lines, last_lines in zip(groups, last.values.tolist()):
+        row = rows[lines[0]]
+        label = row['label']
+        try:
+            # create node if not existent and set attributes
+            stage, line = 'node creation', lines[0]
+            node = nodes.get(label)
+            if node is None:
+                node = classes[row['class']](label=label)
+            for attr, line in zip(node_attrs, last_lines):
+                if line != line:
+                    # no line sets the attribute
+                    continue
+                line = int(line)
+                row = rows[line]
+                if row[attr] == 'seq':
+                    setattr(node, attr, sequence_of(line, attr))
+                # again from investment storage the next lines are a
+                # little hacky as we need to create an
+                # solph.options.Investment() object
+                elif isinstance(node, Storage) and attr == 'investment':
+                    setattr(node, attr, Investment())
+                    for iattr in invest_attrs:
+                        if iattr in row and row[attr]:
+                            setattr(node.investment, iattr, row[iattr])
+                elif attr in seq_attributes:
+                    setattr(node, attr, sequence(float(row[attr])))
+                # for all 'normal' attributes
+                else:
+                    setattr(node, attr, row[attr])
 
-            # drop NaN values from series
-            r = r.dropna()
-            # save column labels and row values in dict
-            row = dict(zip(r.index.values, r.values))
+            conversion_factors = {}
+            for line in lines:
+                row = rows[line]
 
-            # create node if not existent and set attributes
-            # (attributes must be placed either in the first line or in all
-            #  lines of multiple node entries (flows) in csv file)
-            try:
-                if row['class'] in classes.keys():
-                    node = nodes.get(row['label'])
-                    if node is None:
-                        node = classes[row['class']](label=row['label'])
-                # for the if check below we use all flow_attrs except
-                # investment
-                # because for storages investment needs to be set as a node
-                # attribute (and a flow attribute)
-                flow_attrs_ = [i for i in flow_attrs if i != 'investment']
-                for attr in row.keys():
-                    if (attr not in flow_attrs_ and
-                       attr not in ('class', 'label', 'source', 'target',
-                                    'conversion_factors')):
-                            if row[attr] != 'seq':
-                                if attr in seq_attributes:
-                                    row[attr] = sequence(float(row[attr]))
-                                # again from investment storage the next lines
-                                # are a little hacky as we need to create an
-                                # solph.options.Investment() object
-                                if (isinstance(node, Storage) and
-                                        attr == 'investment'):
-                                    setattr(node, attr, Investment())
-                                    invest_attrs = vars(Investment()).keys()
-                                    for iattr in invest_attrs:
-                                        if iattr in row.keys() and row[attr]:
-                                            setattr(node.investment,
-                                                    iattr, row[iattr])
-                                # for all 'normal' attributes
-                                else:
-                                    setattr(node, attr, row[attr])
-
-                            else:
-                                seq = nodes_flows_seq.loc[row['class'],
-                                                          row['label'],
-                                                          row['source'],
-                                                          row['target'],
-                                                          attr]
-                                if attr in seq_attributes:
-                                    seq = [i for i in seq]
-                                    seq = sequence(seq)
-                                else:
-                                    seq = [i for i in seq.values]
-                                setattr(node, attr, seq)
-            except:
-                print('Error with node creation in line', i+2, 'in csv file.')
-                print('Label:', row['label'])
-                raise
-
-            # create flow and set attributes
-            try:
+                # create flow and set attributes
+                stage = 'flow creation'
                 flow = Flow()
                 for attr in flow_attrs:
-                    if attr in row.keys() and row[attr]:
-                        if row[attr] != 'seq':
-                            if attr in seq_attributes:
-                                row[attr] = sequence(float(row[attr]))
-                            setattr(flow, attr, row[attr])
-                        if row[attr] == 'seq':
-                            seq = nodes_flows_seq.loc[row['class'],
-                                                      row['label'],
-                                                      row['source'],
-                                                      row['target'],
-                                                      attr]
-                            if attr in seq_attributes:
-                                seq = [i for i in seq]
-                                seq = sequence(seq)
-                            else:
-                                seq = [i for i in seq.values]
-                            setattr(flow, attr, seq)
-                        # this block is only for nonconvex flows!
-                        if attr == 'binary' and row[attr] is True:
-                            # create nonconvex object for flow
-                            setattr(flow, attr, NonConvex())
-                            nonconvex_attrs = vars(NonConvex()).keys()
-                            for battr in nonconvex_attrs:
-                                if battr in row.keys() and row[attr]:
-                                    setattr(flow.nonconvex, battr, row[battr])
-                        # this block is only for investment flows!
-                        if attr == 'investment' and row[attr] is True:
-                            if isinstance(node, Storage):
-                                # set the flows of the storage to Investment as
-                                # without attributes, as costs etc are set at
-                                # the node
-                                setattr(flow, attr, Investment())
-                            else:
-                                # create binary object for flow
-                                setattr(flow, attr, Investment())
-                                invest_attrs = vars(Investment()).keys()
-                                for iattr in invest_attrs:
-                                    if iattr in row.keys() and row[attr]:
-                                        setattr(flow.investment, iattr,
-                                                row[iattr])
-            except:
-                print('Error with flow creation in line', i+2, 'in csv file.')
-                print('Label:', row['label'])
-                raise
-
-            # create an input entry for the current line
-            try:
-                if row['label'] == row['target']:
-                    if row['source'] not in nodes.keys():
-                        nodes[row['source']] = Bus(label=row['source'])
-                        for attr in bus_attrs:
-                            if attr in row.keys() and row[attr] is not None:
-                                setattr(nodes[row['source']], attr, row[attr])
-                    inputs = {nodes[row['source']]: flow}
-                else:
-                    inputs = {}
-            except:
-                print('Error with input creation in line', i+2, 'in csv file.')
-                print('Label:', row['label'])
-                raise
-
-            # create an output entry for the current line
-            try:
-                if row['label'] == row['source']:
-                    if row['target'] not in nodes.keys():
-                        nodes[row['target']] = Bus(label=row['target'])
+                    if attr not in row or not row[attr]:
+                        continue
+                    if row[attr] == 'seq':
+                        setattr(flow, attr, sequence_of(line, attr))
+                    elif attr in seq_attributes:
+                        setattr(flow, attr, sequence(float(row[attr])))
+                    else:
+                        setattr(flow, attr, row[attr])
+                    # this block is only for nonconvex flows!
+                    if attr == 'binary' and row[attr] is True:
+                        # create nonconvex object for flow
+                        setattr(flow, attr, NonConvex())
+                        for battr in nonconvex_attrs:
+                            if battr in row and row[attr]:
+                                setattr(flow.nonconvex, battr, row[battr])
+                    # this block is only for investment flows!
+                    if attr == 'investment' and row[attr] is True:
+                        # set the flows of the storage to Investment
+                        # without attributes, as costs etc are set at the
+                        # node
+                        setattr(flow, attr, Investment())
+                        if not isinstance(node, Storage):
+                            for iattr in invest_attrs:
+                                if iattr in row and row[attr]:
+                                    setattr(flow.investment, iattr,
+                                            row[iattr])
+
+                # create the bus of the input or output entry for the
+                # current line and connect it to the node
+                stage = 'input and output creation'
+                for end, other in (('target', 'source'),
+                                   ('source', 'target')):
+                    if row[end] != label:
+                        continue
+                    bus = nodes.get(row[other])
+                    if bus is None:
+                        bus = nodes[row[other]] = Bus(label=row[other])
                         for attr in bus_attrs:
-                            if attr in row.keys() and row[attr] is not None:
-                                setattr(nodes[row['target']], attr, row[attr])
-                    outputs = {nodes[row['target']]: flow}
-                else:
-                    outputs = {}
-            except:
-                print('Error with output creation in line', i+2,
-                      'in csv file.')
-                print('Label:', row['label'])
-                raise
-
-            # create a conversion_factor entry for the current line
-            try:
-                if row['target'] and 'conversion_factors' in row:
+                            if attr in row:
+                                setattr(bus, attr, row[attr])
+                    if end == 'target':
+                        network.flow[bus, node] = flow
+                    else:
+                        network.flow[node, bus] = flow
+
+                # create a conversion_factor entry for the current line
+                stage = 'conversion factor creation'
+                if 'conversion_factors' in row:
                     if row['conversion_factors'] == 'seq':
-                        seq = nodes_flows_seq.loc[row['class'],
-                                                  row['label'],
-                                                  row['source'],
-                                                  row['target'],
-                                                  'conversion_factors']
-                        seq = [i for i in seq]
-                        seq = sequence(seq)
-                        conversion_factors = {nodes[row['target']]: seq}
+                        factor = sequence_of(line, 'conversion_factors')
                     else:
-                        conversion_factors = \
-                            {nodes[row['target']]:
-                                sequence(float(row['conversion_factors']))}
-                else:
-                    conversion_factors = {}
-            except:
-                print('Error with conversion factor creation in line', i+2,
-                      'in csv file.')
-                print('Label:', row['label'])
-                raise
-
-            # add node to dict and assign attributes depending on
-            # if there are multiple lines per node or not
-            try:
-                for source, f in inputs.items():
-                    network.flow[source, node] = f
-                for target, f in outputs.items():
-                    network.flow[node, target] = f
-                if node.label in nodes.keys():
-                    if not isinstance(node, Bus):
-                        node.conversion_factors.update(conversion_factors)
-                else:
-                    if not isinstance(node, Bus):
-                        node.conversion_factors = conversion_factors
-                        nodes[node.label] = node
-            except:
-                print('Error adding node to dict in line', i+2, 'in csv file.')
-                print('Label:', row['label'])
-                raise
+                        factor = sequence(float(row['conversion_factors']))
+                    conversion_factors[nodes[row['target']]] = factor
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            raise ValueError('Error with {} in line {} in csv file (label '
+                             '{!r}): {!r}'.format(stage, line + 2, label, e)
+                             ) from e
+
+        # add node to dict and assign the conversion factors of all its lines
+        if not isinstance(node, Bus):
+            if label in nodes:
+                node.conversion_factors.update(conversion_factors)
+            else:
+                node.conversion_factors = conversion_factors
+                nodes[label] = node
 
     return nodes
 
 
-def merge_csv_files(path=None, output_path=None, write=True):
+def _merge_sequences(table, keys, values):
+    """ Look up the sequences of all cells of `table` set to 'seq' in one join
+    with the `keys` of the sequences.
+
+    Returns a dictionary mapping the line and column of every such cell to
+    its sequence, i.e. a row of `values`.
+    """
+    key = ['class', 'label', 'source', 'target', 'attribute']
+    cells = (table == 'seq').stack()
+    cells = cells[cells.values].index
+    lines = cells.get_level_values(0)
+    wanted = table.loc[lines, key[:-1]].reset_index(drop=True)
+    wanted['attribute'] = cells.get_level_values(1)
+    available = pd.DataFrame(list(keys), columns=key)
+    available['row'] = np.arange(len(available))
+    # the last of several sequences with the same key wins
+    available = available.drop_duplicates(key, keep='last')
+    merged = wanted.merge(available, how='left', on=key)
+    missing = merged['row'].isnull().values
+    if missing.any():
+        i = missing.argmax()
+        raise ValueError('Error with sequence lookup in line {} in csv file '
+                         '(label {!r}): no sequence for {!r}.'.format(
+                             lines[i] + 2, merged['label'][i],
+                             tuple(merged.loc[i, key])))
+    return dict(zip(zip(lines, merged['attribute']),
+                    values[merged['row'].values.astype(int)]))
+
+
+def _parse_nodes_flows(file_nodes_flows, delimiter):
+    """ Parse a CSV file of nodes and flows for :func:`nodes_from_csv`.
+
+    Returns the lines holding a class as a data frame indexed by their
+    number. Other lines, e.g. blank lines or lines that contain data
+    explanations, are only there for visual purposes.
+    """
+    nodes_flows = pd.read_csv(file_nodes_flows, sep=delimiter)
+    valid = np.array([isinstance(c, str) for c in nodes_flows['class']],
+                     dtype=bool)
+    return nodes_flows[valid]
+
+
+def _parse_sequences(file_nodes_flows_sequences, delimiter):
+    """ Parse a CSV file of sequences for :func:`nodes_from_csv`.
+
+    The five header lines identifying a sequence by class, label, source,
+    target and attribute are read as text, the values in one go as one float
+    array with a row per sequence. Returns the identifying tuples, the
+    entries of the first column, i.e. the timestamps, and the values.
+    """
+    def read(f):
+        header = [line[1:] for line in _read_header(f, delimiter)]
+        values = pd.read_csv(f, sep=delimiter, header=None, index_col=0,
+                             float_precision='round_trip')
+        # drop empty lines, i.e. lines without a timestamp and values
+        values = values[~(values.isnull().all(axis=1).values &
+                          pd.isnull(values.index))]
+        return (list(zip(*header)), values.index.tolist(),
+                values.values.T.astype(float))
+
+    if hasattr(file_nodes_flows_sequences, 'read'):
+        return read(file_nodes_flows_sequences)
+    with open(file_nodes_flows_sequences, newline='') as f:
+        return read(f)
+
+
+def _read_header(f, delimiter, lines=5):
+    """ Read the first `lines` non empty lines of the CSV file `f`.
+    """
+    reader = csv.reader(f, delimiter=delimiter)
+    header = []
+    while len(header) < lines:
+        line = next(reader)
+        if any(line):
+            header.append(line)
+    return header
+
+
+def sequences_to_binary(file_nodes_flows_sequences, path, delimiter=','):
+    """ Convert a CSV file of sequences for :func:`nodes_from_csv` to a
+    binary sequence store.
+
+    The store is a directory holding the values as one float array with a
+    row per sequence in `values.npy` and a table of the class, label,
+    source, target and attribute identifying every row as well as the
+    timestamps of the CSV file in `keys.npz`. The path of the directory can
+    be passed to :func:`nodes_from_csv` instead of the CSV file. The values
+    are memory mapped then, so no text is parsed and only the sequences used
+    are read from disk.
+
+    Parameters
+    ----------
+    file_nodes_flows_sequences : string
+        Name of the CSV file containing sequences
+    path : string
+        The directory to write the store to. It is created if necessary.
+    delimiter : str
+        Delimiter of CSV file
+    """
+    _write_sequences(path, *_parse_sequences(file_nodes_flows_sequences,
+                                             delimiter))
+
+
+def _write_sequences(path, keys, index, values):
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    np.save(os.path.join(path, 'values.npy'), values)
+    np.savez(os.path.join(path, 'keys.npz'),
+             keys=np.array(keys, dtype=str).reshape(-1, 5),
+             index=np.array([str(i) for i in index], dtype=str))
+
+
+def _is_sequence_store(file_nodes_flows_sequences):
+    return (isinstance(file_nodes_flows_sequences, str) and
+            os.path.isdir(file_nodes_flows_sequences))
+
+
+def _read_sequences(file_nodes_flows_sequences, delimiter):
+    """ Read the sequences for :func:`nodes_from_csv` from a CSV file or a
+    binary sequence store.
+
+    Returns the tuples of class, label, source, target and attribute
+    identifying the sequences and the values as one array with a row per
+    sequence.
+    """
+    if _is_sequence_store(file_nodes_flows_sequences):
+        with np.load(os.path.join(file_nodes_flows_sequences,
+                                  'keys.npz')) as data:
+            keys = [tuple(k) for k in data['keys'].tolist()]
+        values = np.load(os.path.join(file_nodes_flows_sequences,
+                                      'values.npy'), mmap_mode='r')
+    else:
+        keys, _, values = _parse_sequences(file_nodes_flows_sequences,
+                                           delimiter)
+    return keys, values
+
+
+#: Whether :func:`nodes_from_csv` caches parsed input files by default.
+#: If enabled, parsed files are written in a binary format to the directory
+#: `~/.oemof/csv_cache`, keyed by the content and modification time of the
+#: files, so unchanged files are only parsed once. The cache takes up to
+#: :data:`CACHE_SIZE` bytes of disk space, so it's disabled by default.
+CACHE = False
+
+#: The size in bytes up to which the cache is allowed to grow. The least
+#: recently used inputs are removed from the cache beyond this size.
+CACHE_SIZE = 2 ** 30
+
+_CACHE_VERSION = 2
+
+
+def _cache_key(files, delimiter):
+    digest = hashlib.sha1('{} {!r}'.format(_CACHE_VERSION, delimiter)
+                          .encode('utf-8'))
+    for name in files:
+        digest.update(str(os.stat(name).st_mtime_ns).encode('utf-8'))
+        with open(name, 'rb') as f:
+            for chunk in iter(lambda: f.read(2 ** 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_input(file_nodes_flows, file_nodes_flows_sequences, delimiter,
+                cache):
+    """ Parse the input files of :func:`nodes_from_csv` or load them from the
+    cache.
+
+    Returns the parsed nodes and flows, see :func:`_parse_nodes_flows`, and
+    the sequences, see :func:`_read_sequences`.
+    """
+    if cache is None:
+        cache = CACHE
+    if cache is True:
+        cache = helpers.extend_basic_path('csv_cache')
+    store = _is_sequence_store(file_nodes_flows_sequences)
+    files = [file_nodes_flows]
+    if not store:
+        files.append(file_nodes_flows_sequences)
+    if not cache or not all(isinstance(f, str) for f in files):
+        return (_parse_nodes_flows(file_nodes_flows, delimiter),
+                _read_sequences(file_nodes_flows_sequences, delimiter))
+
+    entry = os.path.join(cache, _cache_key(files, delimiter))
+    if os.path.isdir(entry):
+        # mark the entry as used
+        os.utime(entry)
+        with open(os.path.join(entry, 'nodes_flows.pickle'), 'rb') as f:
+            nodes_flows = pickle.load(f)
+        return nodes_flows, _read_sequences(
+            file_nodes_flows_sequences if store else entry, delimiter)
+
+    # the entry is written to a temporary directory first, so that it only
+    # becomes visible once it is complete
+    tmp = tempfile.mkdtemp(prefix='.tmp-', dir=cache)
+    try:
+        nodes_flows = _parse_nodes_flows(file_nodes_flows, delimiter)
+        with open(os.path.join(tmp, 'nodes_flows.pickle'), 'wb') as f:
+            pickle.dump(nodes_flows, f, protocol=pickle.HIGHEST_PROTOCOL)
+        if store:
+            sequences = _read_sequences(file_nodes_flows_sequences, delimiter)
+        else:
+            keys, index, values = _parse_sequences(
+                file_nodes_flows_sequences, delimiter)
+            _write_sequences(tmp, keys, index, values)
+            sequences = keys, values
+        os.rename(tmp, entry)
+    except OSError:
+        # the entry has been written by someone else in the meantime or
+        # the cache isn't writable
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(entry):
+            raise
+    _trim_cache(cache, CACHE_SIZE)
+    return nodes_flows, sequences
+
+
+def _trim_cache(cache, size):
+    """ Remove the least recently used entries from the `cache` directory
+    until it is at most `size` bytes large.
+    """
+    entries = []
+    for name in os.listdir(cache):
+        entry = os.path.join(cache, name)
+        if name.startswith('.tmp-') or not os.path.isdir(entry):
+            continue
+        entries.append((os.stat(entry).st_mtime,
+                        sum(os.path.getsize(os.path.join(entry, f))
+                            for f in os.listdir(entry)), entry))
+    total = sum(e[1] for e in entries)
+    for _, entry_size, entry in sorted(entries):
+        if total <= size:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= entry_size
+
+
+def _read_csv_file(filename, sequences):
+    if sequences:
+        return pd.read_csv(filename, index_col=[0], header=[0, 1, 2, 3, 4])
+    return pd.read_csv(filename)
+
+
+def merge_csv_files(path=None, output_path=None, write=True, executor=None,
+                    stream=False):
     """
     Merge csv files from a specified directory. All files with 'seq' will be
     merged and all other files. Make sure that no other csv-files than the ones
     to be merged are inside the specified directory.
 
+    The files are read in parallel and concatenated once.
+
     Parameters
     ----------
     path: str
@@ -280,6 +492,16 @@ def merge_csv_files(path=None, output_path=None, write=True):
         Path where the merged files are written to (default is `path` above)
     write : boolean
         Indicating if new, merged dataframes should be written to csv
+    executor : concurrent.futures.Executor
+        Executor used to read the files, e.g. a
+        :class:`concurrent.futures.ProcessPoolExecutor`. Defaults to a
+        thread pool.
+    stream : boolean
+        Write the merged sequences line by line, straight from the files
+        with 'seq', without reading them into dataframes, so they don't have
+        to fit into memory. The values are copied as they are. All files with
+        'seq' have to have the same timestamps in the same order. Requires
+        `write` and returns `None` instead of the sequences.
 
     Returns
     -------
@@ -287,25 +509,40 @@ def merge_csv_files(path=None, output_path=None, write=True):
     """
     if output_path is None:
         output_path = path
+    if stream and not write:
+        raise ValueError('Streaming the merged sequences requires write=True.')
 
     files = [f for f in os.listdir(path) if f.endswith('.csv')]
-
-    nodes_flows = pd.DataFrame()
-    nodes_flows_seq = pd.DataFrame()
-
-    for f in files:
-        if 'seq' in f:
-            tmp_df = pd.read_csv(os.path.join(path, f), index_col=[0],
-                                 header=[0, 1, 2, 3, 4])
-            nodes_flows_seq = pd.concat([nodes_flows_seq, tmp_df], axis=1)
-        else:
-            tmp_df = pd.read_csv(os.path.join(path, f))
-            nodes_flows = pd.concat([nodes_flows, tmp_df])
+    seq_files = [os.path.join(path, f) for f in files if 'seq' in f]
+    other_files = [os.path.join(path, f) for f in files if 'seq' not in f]
+    read = other_files if stream else other_files + seq_files
+
+    if executor is None:
+        with ThreadPoolExecutor((os.cpu_count() or 1) * 5) as pool:
+            frames = list(pool.map(_read_csv_file, read,
+                                   [f in seq_files for f in read]))
+    else:
+        frames = list(executor.map(_read_csv_file, read,
+                                   [f in seq_files for f in read]))
+
+    nodes_flows = frames[:len(other_files)]
+    nodes_flows = (pd.concat(nodes_flows) if nodes_flows
+                   else pd.DataFrame())
+    if stream:
+        nodes_flows_seq = None
+    else:
+        nodes_flows_seq = frames[len(other_files):]
+        nodes_flows_seq = (pd.concat(nodes_flows_seq, axis=1)
+                           if nodes_flows_seq else pd.DataFrame())
 
     if write is True:
         nodes_flows.to_csv(os.path.join(output_path,
                                         'merged_nodes_flows.csv'), index=False)
-        if isinstance(nodes_flows_seq.columns, pd.MultiIndex):
+        if stream and seq_files:
+            _merge_lines(seq_files, os.path.join(
+                output_path, 'merged_nodes_flows_seq.csv'))
+        elif not stream and isinstance(nodes_flows_seq.columns,
+                                       pd.MultiIndex):
             nodes_flows_seq.to_csv(os.path.join(output_path,
                                    'merged_nodes_flows_seq.csv'))
         else:
@@ -316,24 +553,61 @@ def merge_csv_files(path=None, output_path=None, write=True):
     return nodes_flows, nodes_flows_seq
 
 
+def _merge_lines(files, output):
+    """ Write the lines of all `files` side by side to `output`, keeping the
+    first column only once. Blank lines are skipped.
+    """
+    with ExitStack() as stack:
+        readers = [csv.reader(stack.enter_context(open(f, newline='')))
+                   for f in files]
+        readers = [(line for line in reader if line) for reader in readers]
+        writer = csv.writer(stack.enter_context(open(output, 'w',
+                                                     newline='')),
+                            lineterminator='\n')
+        for number, lines in enumerate(zip_longest(*readers)):
+            if any(line is None for line in lines):
+                raise ValueError('The sequence files have different numbers '
+                                 'of lines.')
+            first = lines[0][0]
+            if any(line[0] != first for line in lines):
+                raise ValueError(
+                    'The first column of the sequence files differs in '
+                    'line {}: {}'.format(number + 1,
+                                         sorted(set(l[0] for l in lines))))
+            writer.writerow([first] + [value for line in lines
+                                       for value in line[1:]])
+
+
+#: How :func:`resample_sequence` aggregates the values of a sequence in a
+#: period, by the attribute in the last header line of the sequence. One of
+#: `'mean'`, `'max'`, `'min'` or `'sum'`, the latter preserving the total of
+#: sequences of energies. Sequences of other attributes are averaged.
+AGGREGATION = {'actual_value': 'mean', 'max': 'max', 'min': 'min'}
+
+
 def resample_sequence(seq_base_file=None, output_path=None,
                       samples=None, file_prefix=None, file_suffix='_seq',
-                      header=[0, 1, 2, 3, 4]):
+                      header=[0, 1, 2, 3, 4], aggregation=None,
+                      binary=False, chunksize=1000, delimiter=','):
     """
     This function can be used for resampling the sequence csv-data file.
     The file is read  from the specified path: `seq_base_file`, resampled and,
     written back to the a specified directory. Note that the sequence files
     are expected to have a timeindex column that can be parsed by
-    pandas, with entries like: '2014-01-01 00:00:00+00:00'
+    pandas, with entries like: '2014-01-01 00:00:00+00:00', in ascending
+    order.
 
+    The file is read in chunks of rows and resampled to all `samples` while
+    reading it, so it is read only once and never held in memory as a whole.
+    Periods without values are written as empty values.
 
     Parameters
     ----------
     seq_base_file : string
         File that contains data to be resampled.
     output_path : string
-        Path for resampled seq-files. If no path is specified,
-        attr:`seq_base_file` path will be used.
+        Path for resampled seq-files. If no path is specified, the directory
+        of :attr:`seq_base_file` will be used.
     samples : list
         List of strings with the resampling rate e.g. ['4H', '2H']. See
         `pandas.DataFrame.resample` method for more information on format.
@@ -345,48 +619,239 @@ def resample_sequence(seq_base_file=None, output_path=None,
         file_prefix.
     header : list
         List of integers to specifiy the header lines
+    aggregation : dict
+        Dictionary mapping attributes to the way their sequences are
+        aggregated, in addition to :data:`AGGREGATION`, e.g.
+        `{'energy': 'sum'}`.
+    binary : bool
+        Whether to write every resampled file as a binary sequence store, see
+        :func:`sequences_to_binary`, named `file_prefix+s+file_suffix`, too.
+    chunksize : int
+        The number of rows read at once.
+    delimiter : str
+        Delimiter of CSV file
+
+    Returns
+    -------
+    pandas.DataFrame
+        The sequences resampled to the last of `samples`, with a column per
+        sequence.
     """
     if samples is None:
         raise ValueError('Missing sample attribute. Please specifiy!')
+    seq_path, seq_file = os.path.split(seq_base_file)
     if output_path is None:
         logging.info('No output_path specified' +
                      ', setting output_path to seq_path!')
-        output_path = seq_base_file
-
-    if not os.path.exists(output_path):
-            os.makedirs(output_path, exist_ok=True)
-
-    seq_path, seq_file = os.path.split(seq_base_file)
-
-    # read the file and parse the dates from the first column (index 0)
-    seq = pd.read_csv(os.path.join(seq_path, seq_file),
-                      header=header, parse_dates=[0])
-
-    # store the first column name for reuse
-    first_col = seq.columns[0]
-    # set the index as datetimeindex from column with parsed dates
-    seq.index = seq[first_col]
-    # set timeindex
-
-    # convert columns to numeric values, except the datetimecolumn, but!
-    # which we keep for reuse
-    for col in seq:
-        if col == first_col:
-            seq[col] = -999999
+        output_path = seq_path
+
+    if output_path and not os.path.exists(output_path):
+        os.makedirs(output_path, exist_ok=True)
+
+    if file_prefix is None:
+        file_prefix = seq_file.split('seq')[0]
+        logging.info('Setting filename prefix to: {}'.format(file_prefix))
+
+    rules = dict(AGGREGATION)
+    rules.update(aggregation or {})
+    unknown = set(rules.values()) - set(_Resampler.rules)
+    if unknown:
+        raise ValueError('Unknown aggregation: {}'.format(
+            ', '.join(sorted(unknown))))
+
+    with ExitStack() as stack:
+        f = stack.enter_context(open(seq_base_file, newline=''))
+        lines = _read_header(f, delimiter, len(header))
+        keys = list(zip(*[line[1:] for line in lines]))
+        columns = [rules.get(k[-1], 'mean') for k in keys]
+
+        outputs = []
+        for number, s in enumerate(samples):
+            filename = os.path.join(output_path,
+                                    file_prefix + s + file_suffix + '.csv')
+            logging.info('Writing sample file to {0}.'.format(filename))
+            writer = csv.writer(stack.enter_context(
+                open(filename, 'w', newline='')), lineterminator='\n')
+            writer.writerows(lines)
+            keep = binary or number == len(samples) - 1
+            outputs.append((_Resampler(s, columns), writer,
+                            [] if keep else None))
+
+        chunks = pd.read_csv(f, sep=delimiter, header=None, index_col=0,
+                             chunksize=chunksize)
+        for chunk in chunks:
+            # drop empty lines, i.e. lines without a timestamp and values
+            chunk = chunk[pd.notnull(chunk.index)]
+            if not len(chunk):
+                continue
+            index = pd.DatetimeIndex(pd.to_datetime(chunk.index))
+            values = chunk.values.astype(float)
+            for resampler, writer, blocks in outputs:
+                _write_block(resampler.update(index, values), writer, blocks)
+        for resampler, writer, blocks in outputs:
+            _write_block(resampler.close(), writer, blocks)
+
+    for (resampler, _, blocks), s in zip(outputs, samples):
+        if blocks is None:
+            continue
+        index = pd.DatetimeIndex(
+            np.concatenate([b[0] for b in blocks]) if blocks else [])
+        if resampler.tz is not None:
+            index = index.tz_localize('UTC').tz_convert(resampler.tz)
+        values = (np.concatenate([b[1] for b in blocks]) if blocks
+                  else np.empty((0, len(keys))))
+        if binary:
+            _write_sequences(os.path.join(output_path,
+                                          file_prefix + s + file_suffix),
+                             keys, [str(i) for i in index], values.T)
+    return pd.DataFrame(values, index=index,
+                        columns=pd.MultiIndex.from_tuples(
+                            keys, names=[l[0] for l in lines]))
+
+
+def _write_block(block, writer, blocks):
+    """ Write the resampled rows `block` as returned by :class:`_Resampler`
+    to the CSV `writer` and keep it in `blocks`, unless that is None.
+    """
+    labels, values, tz = block
+    if not len(labels):
+        return
+    index = pd.DatetimeIndex(labels)
+    if tz is not None:
+        index = index.tz_localize('UTC').tz_convert(tz)
+    writer.writerows([str(t)] + ['' if v != v else v for v in row]
+                     for t, row in zip(index, values.tolist()))
+    if blocks is not None:
+        blocks.append((labels, values))
+
+
+class _Resampler:
+    """ Aggregate rows of values to periods of the sampling rate `freq`.
+
+    The rows are passed in chunks in ascending order of time. The sum, count,
+    maximum and minimum of the values of each period are computed per chunk.
+    Those of the last period of a chunk are kept and merged with the next
+    chunk, as the period may continue there. `columns` holds one of
+    :attr:`rules` per column, which determines the value written for a
+    period. Periods are labelled like :meth:`pandas.DataFrame.resample`
+    labels them, and periods without rows are filled with NaN.
+    """
+    rules = ('mean', 'max', 'min', 'sum')
+
+    def __init__(self, freq, columns):
+        self.offset = pd.tseries.frequencies.to_offset(freq)
+        self.columns = {r: np.array([c == r for c in columns], dtype=bool)
+                        for r in self.rules}
+        self.tz = None
+        self._origin = None
+        self._partial = None
+        self._last = None
+
+    def _fixed(self):
+        """ Whether the periods have a fixed length, i.e. aren't calendar
+        months, weeks or, in a time zone, days.
+        """
+        if not isinstance(self.offset, pd.tseries.offsets.Tick):
+            return False
+        return self.tz is None or not (
+            isinstance(self.offset, pd.tseries.offsets.Day) and
+            pd.Timedelta(days=1).value % self.offset.nanos == 0)
+
+    def _labels(self, index):
+        """ Return the labels of the periods of `index` as nanoseconds.
+        """
+        if self._fixed():
+            # like pandas, count periods from midnight of the first day,
+            # unless they span several days without dividing a day
+            if self._origin is None:
+                day = pd.Timedelta(days=1).value
+                self._origin = (
+                    index[0].value
+                    if isinstance(self.offset, pd.tseries.offsets.Day) and
+                    day % self.offset.nanos else index[0].normalize().value)
+            step = self.offset.nanos
+            return (self._origin +
+                    (index.asi8 - self._origin) // step * step)
+        labels = np.empty(len(index), dtype=np.int64)
+        groups = pd.Series(np.arange(len(index)), index=index).resample(
+            self.offset).indices
+        for label, rows in groups.items():
+            labels[rows] = label.value
+        return labels
+
+    def _range(self, first, last):
+        """ Return the labels of all periods from `first` to `last`.
+        """
+        if self._fixed():
+            step = self.offset.nanos
+            return first + np.arange((last - first) // step + 1) * step
+        first, last = (pd.Timestamp(t, tz='UTC') for t in (first, last))
+        if self.tz is not None:
+            first, last = first.tz_convert(self.tz), last.tz_convert(self.tz)
         else:
-            seq[col] = seq[col].astype(float)
-
-    for s in samples:
-        # resample dataframes
-        seq_sampled = seq.resample(s).mean()
-        # assign the resampled datetimeindex values to the first columns,
-        # replacing the -999999
-        seq_sampled[first_col] = seq_sampled.index
-        if file_prefix is None:
-            file_prefix = seq_file.split('seq')[0]
-            logging.info('Setting filename prefix to: {}'.format(file_prefix))
-
-        filename = os.path.join(output_path, file_prefix+s+file_suffix+'.csv')
-        logging.info('Writing sample file to {0}.'.format(filename))
-        seq_sampled.to_csv(filename, index=False)
-    return seq_sampled
+            first, last = first.tz_localize(None), last.tz_localize(None)
+        return pd.date_range(first, last, freq=self.offset).asi8
+
+    def update(self, index, values):
+        """ Add the `values` at the times `index` and return the labels, the
+        values and the time zone of the periods completed.
+        """
+        self.tz = index.tz
+        labels = self._labels(index)
+        if (np.any(labels[1:] < labels[:-1]) or
+                self._partial is not None and labels[0] < self._partial[0]):
+            raise ValueError('The timestamps of the sequences are not in '
+                             'ascending order.')
+        starts = np.flatnonzero(np.concatenate(
+            ([True], labels[1:] != labels[:-1])))
+        present = ~np.isnan(values)
+        labels = labels[starts]
+        aggregates = [np.add.reduceat(np.where(present, values, 0), starts),
+                      np.add.reduceat(present, starts),
+                      np.fmax.reduceat(values, starts),
+                      np.fmin.reduceat(values, starts)]
+        if self._partial is not None:
+            label, partial = self._partial
+            if label == labels[0]:
+                merge = (np.add, np.add, np.fmax, np.fmin)
+                for a, p, m in zip(aggregates, partial, merge):
+                    a[0] = m(a[0], p)
+            else:
+                labels = np.concatenate(([label], labels))
+                aggregates = [np.concatenate(([p], a))
+                              for a, p in zip(aggregates, partial)]
+        self._partial = labels[-1], [a[-1] for a in aggregates]
+        return self._finish(labels[:-1], [a[:-1] for a in aggregates])
+
+    def close(self):
+        """ Return the labels, the values and the time zone of the last
+        period.
+        """
+        if self._partial is None:
+            return self._finish(np.empty(0, dtype=np.int64), None)
+        label, partial = self._partial
+        self._partial = None
+        return self._finish(np.array([label]), [p[None] for p in partial])
+
+    def _finish(self, labels, aggregates):
+        if not len(labels):
+            return labels, np.empty((0, len(self.columns['mean']))), self.tz
+        sums, counts, maxima, minima = aggregates
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = sums / counts
+        values = np.where(self.columns['max'], maxima,
+                          np.where(self.columns['min'], minima,
+                                   np.where(self.columns['sum'], sums,
+                                            means)))
+        values[counts == 0] = np.nan
+
+        # fill periods without rows, including those since the last call
+        start = labels[0] if self._last is None else self._range(
+            self._last, labels[0])[1]
+        self._last = labels[-1]
+        periods = self._range(start, labels[-1])
+        if len(periods) != len(labels):
+            filled = np.full((len(periods), values.shape[1]), np.nan)
+            filled[np.searchsorted(periods, labels)] = values
+            labels, values = periods, filled
+        return labels, values, self.tz
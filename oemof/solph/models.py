@@ -8,7 +8,9 @@ from pyomo.core.plugins.transform.relax_integrality import RelaxIntegrality
 from oemof.solph import blocks
 from oemof.solph.plumbing import sequence
 from oemof.outputlib import processing
+from oemof.tools import timing
 import logging
+import time
 
 # #############################################################################
 #
@@ -53,8 +55,18 @@ class OperationalModel(po.ConcreteModel):
                          blocks.InvestmentFlow, blocks.Flow,
                          blocks.NonConvexFlow]
 
+    @timing.timed('OperationalModel')
     def __init__(self, es, **kwargs):
         super().__init__()
+        # group the nodes up front, so that grouping counts as constructing
+        # the energy system instead of building the model
+        es.groups
+        start = time.perf_counter()
+        # wall clock seconds spent in the steps from building the energy
+        # system to processing the results, see
+        # :func:`processing.meta_results
+        # <oemof.outputlib.processing.meta_results>`
+        self.timings = {'energy_system': es._construction}
 
         # ########################  Arguments #################################
 
@@ -131,10 +143,14 @@ class OperationalModel(po.ConcreteModel):
             self.add_component(str(block), block)
             # create constraints etc. related with block for all nodes
             # in the group
-            block._create(group=self.es.groups.get(group))
+            with timing.timed(type(block).__name__):
+                block._create(group=self.es.groups.get(group))
 
         # ########################### Objective ###############################
-        self.objective_function()
+        with timing.timed('objective'):
+            self.objective_function()
+
+        self.timings['build'] = time.perf_counter() - start
 
     def objective_function(self, sense=po.minimize, update=False):
         """
@@ -170,6 +186,7 @@ class OperationalModel(po.ConcreteModel):
 
         return result
 
+    @timing.timed('solve')
     def solve(self, solver='cbc', solver_io='lp', **kwargs):
         r""" Takes care of communication with solver to solve the model.
 
@@ -204,6 +221,7 @@ class OperationalModel(po.ConcreteModel):
         for k in solver_cmdline_options:
             options[k] = solver_cmdline_options[k]
 
+        start = time.perf_counter()
         results = opt.solve(self, **solve_kwargs)
 
         status = results["Solver"][0]["Status"].key
@@ -233,6 +251,10 @@ class OperationalModel(po.ConcreteModel):
             logging.error(
                 "Optimization failed with status %s and terminal condition %s"
                 % (status, termination_condition))
+        # writing the problem file, running the solver and loading the
+        # solution are timed as one step, as pyomo's solver interfaces don't
+        # expose them separately
+        self.timings['solve'] = time.perf_counter() - start
 
         return results
 
@@ -39,6 +39,12 @@ class EnergySystem(es.EnergySystem):
                                kwargs.get('groupings', []))
         super().__init__(**kwargs)
 
+    def _copy_flow(self, flow, attributes):
+        # Constructing a new flow converts scalars to sequences where
+        # necessary. Sequences which aren't changed are passed on as they
+        # are and thus shared with the original flow.
+        return type(flow)(**dict(vars(flow), **attributes))
+
 
 class Flow:
     r""" Defines a flow between two nodes.
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 """Optional classes to be added to a network class."""
 
+import pandas as pd
+
+from oemof.tools import economics
+
 
 class Investment:
     """
@@ -20,6 +24,46 @@ class Investment:
         self.minimum = minimum
         self.ep_costs = ep_costs
 
+    @classmethod
+    def from_table(cls, table):
+        """ Create an investment per row of the :class:`pandas.DataFrame`
+        `table`.
+
+        The columns `'maximum'`, `'minimum'` and `'ep_costs'` are passed on
+        to the constructor, missing columns and values meaning the default.
+        Instead of `'ep_costs'`, the table can hold the columns `'capex'`,
+        `'n'`, `'wacc'` and, optionally, `'fom'`, from which the
+        `ep_costs` of all rows are calculated at once, see
+        :func:`economics.ep_costs <oemof.tools.economics.ep_costs>`.
+
+        Returns a :class:`pandas.Series` of the investments, indexed like
+        `table`.
+
+        Examples
+        --------
+        >>> import pandas as pd
+        >>> table = pd.DataFrame({'capex': [1000, 800], 'n': [20, 20],
+        ...                       'wacc': [0.05, 0], 'maximum': [10, None]},
+        ...                      index=['pv', 'wind'])
+        >>> investments = Investment.from_table(table)
+        >>> investments['wind'].ep_costs, investments['wind'].maximum
+        (40.0, inf)
+        """
+        columns = {}
+        if 'ep_costs' not in table and 'capex' in table:
+            columns['ep_costs'] = economics.ep_costs(
+                table['capex'], table['n'], table['wacc'],
+                table['fom'] if 'fom' in table else 0)
+        for c in ('maximum', 'minimum', 'ep_costs'):
+            if c in table:
+                columns[c] = table[c]
+        names = list(columns)
+        rows = zip(*[columns[c].astype(object).where(
+            columns[c].notnull(), None).tolist() for c in names])
+        return pd.Series(
+            [cls(**{c: v for c, v in zip(names, row) if v is not None})
+             for row in rows], index=table.index, dtype=object)
+
 
 class NonConvex:
     """
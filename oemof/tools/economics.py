@@ -2,8 +2,62 @@
 """
 Module to collect useful functions for economic calculation.
 
+All functions accept scalars as well as :class:`numpy arrays
+<numpy.ndarray>` or :class:`pandas.Series` for every parameter, which are
+broadcast against each other, so the costs of many investment candidates are
+calculated at once.
+
+Examples
+--------
+>>> import pandas as pd
+>>> candidates = pd.DataFrame({'capex': [1000, 1200, 800],
+...                            'n': [20, 25, 20],
+...                            'wacc': [0.05, 0.05, 0]})
+>>> annuity(candidates['capex'], candidates['n'], candidates['wacc']).round(2)
+0    80.24
+1    85.14
+2    40.00
+dtype: float64
 """
 
+import numpy as np
+
+
+def annuity_factor(n, wacc):
+    """
+    Return the factor converting a present value to equal annual payments
+    over `n` years, i.e. the capital recovery factor.
+
+    Parameters
+    ----------
+    n : int
+        Number of years that the investment is used (economic lifetime)
+    wacc : float
+        Weighted average cost of capital. A `wacc` of zero spreads the present
+        value evenly over the `n` years.
+
+    Returns
+    -------
+    float
+    """
+    if np.ndim(wacc) == 0 and wacc == 0:
+        return 1 / n
+    q = (1 + wacc) ** n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = wacc * q / (q - 1)
+    return _where_zero(wacc, 1 / n, factor)
+
+
+def _where_zero(rate, limit, value):
+    """ Return `value`, replaced by `limit` where `rate` is zero.
+    """
+    if np.ndim(rate) == 0:
+        return limit if rate == 0 else value
+    if hasattr(value, 'where'):
+        # keep the index of pandas objects
+        return value.where(np.asarray(rate) != 0, limit)
+    return np.where(np.asarray(rate) == 0, limit, value)
+
 
 def annuity(capex, n, wacc):
     """
@@ -21,4 +75,86 @@ def annuity(capex, n, wacc):
     float
 
     """
-    return capex * (wacc * (1 + wacc) ** n) / ((1 + wacc) ** n - 1)
+    return capex * annuity_factor(n, wacc)
+
+
+def present_value(payment, n, wacc):
+    """
+    Return the present value of equal annual `payment`s over `n` years.
+
+    Parameters
+    ----------
+    payment : float
+        The payment at the end of every year
+    n : int
+        Number of years
+    wacc : float
+        Weighted average cost of capital
+
+    Returns
+    -------
+    float
+
+    Examples
+    --------
+    >>> round(present_value(annuity(1000, 20, 0.05), 20, 0.05), 6)
+    1000.0
+    """
+    return payment / annuity_factor(n, wacc)
+
+
+def ep_costs(capex, n, wacc, fom=0):
+    """
+    Return the equivalent periodical costs of an investment, i.e. the annuity
+    of the overnight costs `capex` plus the fixed operation and maintenance
+    costs, e.g. to be used as
+    :attr:`Investment.ep_costs <oemof.solph.options.Investment>`.
+
+    Parameters
+    ----------
+    capex : float
+        Overnight costs per unit of capacity
+    n : int
+        Number of years that the investment is used (economic lifetime)
+    wacc : float
+        Weighted average cost of capital
+    fom : float
+        Fixed operation and maintenance costs per unit of capacity and year
+
+    Returns
+    -------
+    float
+    """
+    return annuity(capex, n, wacc) + fom
+
+
+def levelised_cost(capex, n, wacc, output, fom=0, vom=0):
+    """
+    Return the levelised cost of the `output` of an investment, e.g. the
+    levelised cost of electricity.
+
+    Parameters
+    ----------
+    capex : float
+        Overnight costs per unit of capacity
+    n : int
+        Number of years that the investment is used (economic lifetime)
+    wacc : float
+        Weighted average cost of capital
+    output : float
+        Annual output per unit of capacity, e.g. the full load hours
+    fom : float
+        Fixed operation and maintenance costs per unit of capacity and year
+    vom : float
+        Variable costs per unit of output
+
+    Returns
+    -------
+    float
+
+    Examples
+    --------
+    >>> round(levelised_cost(1000, 20, 0.05, output=2000, fom=20, vom=0.01), 4)
+    0.0601
+    """
+    return ep_costs(capex, n, wacc, fom) / output + vom
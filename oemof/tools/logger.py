@@ -3,6 +3,7 @@
 import os
 import shutil
 import logging
+import warnings
 import logging.config
 from oemof.tools import helpers
 
@@ -121,6 +122,9 @@ def time_logging(start, text, logging_level='debug'):
     Logs the time between the given start time and the actual time. A text
     and the debug level is variable.
 
+    Deprecated, use :func:`timing.timed <oemof.tools.timing.timed>` to time
+    stages of a program instead.
+
     Parameters
     ----------
     start : float
@@ -130,6 +134,8 @@ def time_logging(start, text, logging_level='debug'):
     logging_level : string
         logging_level [default='debug']
     """
+    warnings.warn("time_logging is deprecated, use oemof.tools.timing "
+                  "instead.", DeprecationWarning)
     import time
     end_time = time.time() - start
     hours = int(end_time / 3600)
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Hierarchical timing of the stages of building, solving and processing models.
+
+Stages are timed with :func:`timed`, as a context manager or as a decorator.
+Stages entered while another one is running are nested in it and named by
+their path, e.g. `'OperationalModel/Flow'`. The wall clock times of all
+stages are aggregated per path across runs in a registry and can be looked
+at with :func:`report` or written as a trace in the Chrome trace event
+format with :func:`write_trace`, to be viewed in `chrome://tracing` or
+similar tools.
+
+oemof times energy system construction, grouping, building every block of a
+model, solving and processing the results this way. Timing is disabled by
+default, which makes timed stages cost next to nothing. It is switched on
+with :func:`enable`.
+
+Examples
+--------
+>>> from oemof.tools import timing
+>>> timing.reset()
+>>> timing.enable()
+>>> @timing.timed("inner")
+... def inner():
+...     pass
+>>> for run in range(3):
+...     with timing.timed("outer"):
+...         inner()
+>>> timing.disable()
+>>> timing.report()['count']
+outer          3
+outer/inner    3
+Name: count, dtype: int64
+"""
+
+from functools import wraps
+from threading import get_ident, local, Lock
+import json
+import os
+import time
+
+import pandas as pd
+
+
+#: The maximum number of timed stages kept for :func:`write_trace`. Later
+#: stages are still aggregated, but not kept individually.
+MAX_EVENTS = 10 ** 6
+
+_enabled = False
+_origin = time.perf_counter()
+_stages = {}
+_events = []
+_lock = Lock()
+_local = local()
+
+
+def enable():
+    """ Switch timing on.
+    """
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """ Switch timing off. Stages running at this point are still recorded.
+    """
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    """ Return whether timing is switched on.
+    """
+    return _enabled
+
+
+def reset():
+    """ Remove all timings recorded so far.
+    """
+    with _lock:
+        _stages.clear()
+        del _events[:]
+
+
+def timed(name):
+    """ Time the stage `name`, nested in the stage running at the moment.
+
+    Use it as a context manager to time the `with` block or as a decorator to
+    time every call of the decorated function. Stages are only timed while
+    timing is :func:`enabled <enable>`.
+    """
+    return _Stage(name)
+
+
+class _Stage:
+    __slots__ = ('name', '_path', '_start')
+
+    def __init__(self, name):
+        self.name = name
+        self._path = None
+
+    def __call__(self, function):
+        name = self.name
+
+        @wraps(function)
+        def timed_function(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Stage(name):
+                return function(*args, **kwargs)
+        return timed_function
+
+    def __enter__(self):
+        if _enabled:
+            stack = _stack()
+            self._path = (stack[-1] + '/' + self.name if stack
+                          else self.name)
+            stack.append(self._path)
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._path is not None:
+            end = time.perf_counter()
+            _stack().pop()
+            _record(self._path, self._start, end)
+            self._path = None
+        return False
+
+
+def _stack():
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = []
+        return _local.stack
+
+
+def _record(path, start, end):
+    duration = end - start
+    with _lock:
+        stage = _stages.get(path)
+        if stage is None:
+            _stages[path] = [1, duration, duration, duration]
+        else:
+            stage[0] += 1
+            stage[1] += duration
+            stage[2] = min(stage[2], duration)
+            stage[3] = max(stage[3], duration)
+        if len(_events) < MAX_EVENTS:
+            _events.append((path, start, duration, get_ident()))
+
+
+def report():
+    """ Return the timings recorded so far aggregated per stage.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Indexed by the paths of the stages, every stage followed by the
+        stages nested in it, and holding the number of runs (`'count'`) and
+        the total, mean, shortest and longest wall clock time of the runs of
+        every stage in seconds.
+    """
+    with _lock:
+        stages = [(path,) + tuple(s) for path, s in _stages.items()]
+    stages.sort(key=lambda s: s[0].split('/'))
+    report = pd.DataFrame([s[1:] for s in stages],
+                          index=[s[0] for s in stages],
+                          columns=['count', 'total', 'min', 'max'])
+    report.insert(2, 'mean', report['total'] / report['count'])
+    return report
+
+
+def write_trace(path_or_file):
+    """ Write the timed stages recorded so far in the Chrome trace event
+    format to a path or file object.
+    """
+    with _lock:
+        events = list(_events)
+    trace = {'traceEvents': [
+        {'name': path.rsplit('/', 1)[-1], 'cat': 'oemof', 'ph': 'X',
+         'ts': (start - _origin) * 1e6, 'dur': duration * 1e6,
+         'pid': os.getpid(), 'tid': thread, 'args': {'path': path}}
+        for path, start, duration, thread in events],
+        'displayTimeUnit': 'ms'}
+    if hasattr(path_or_file, 'write'):
+        json.dump(trace, path_or_file)
+    else:
+        with open(path_or_file, 'w') as f:
+            json.dump(trace, f)
@@ -26,7 +26,7 @@ setup(name='oemof',
       url='https://oemof.org/',
       namespace_package=['oemof'],
       long_description=read('README.rst'),
-      packages=find_packages(),
+      packages=find_packages(exclude=['benchmarks']),
       package_data={'oemof': [os.path.join('tools', 'default_files', '*.ini')]},
       install_requires=['dill',
                         'numpy >= 1.7.0',
@@ -7,6 +7,7 @@ from nose.tools import ok_, eq_
 
 import pandas as pd
 import logging
+from tempfile import TemporaryDirectory
 
 # from oemof.core.network.entities.components import transformers as transformer
 from oemof import energy_system as es
@@ -165,3 +166,16 @@ class EnergySystem_Tests:
         eq_(ES.groups[key], set(((bus, node, flows[0]),
                                  (node, bus, flows[1]))))
 
+    def test_restoring_a_dump_without_deferred_grouping(self):
+        NewBus(label="first")
+        self.es.groups
+        # dumps written before grouping was deferred lack `_ungrouped`
+        del self.es._ungrouped
+        with TemporaryDirectory() as path:
+            self.es.dump(path, 'es.oemof')
+            restored = es.EnergySystem()
+            restored.restore(path, 'es.oemof')
+        eq_(str(restored.groups['first']), "first")
+        with restored.active():
+            second = NewBus(label="second")
+        ok_(restored.groups['second'] is second)
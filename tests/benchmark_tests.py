@@ -0,0 +1,56 @@
+from nose.tools import eq_, ok_
+
+from oemof.solph import Transformer
+from oemof.solph.blocks import NonConvexFlow
+from oemof.solph.components import (GenericStorage,
+                                    VariableFractionTransformer)
+from benchmarks import run
+from benchmarks.generator import synthetic_system
+
+
+class Generator_Tests:
+
+    def test_synthetic_system_structure(self):
+        es = synthetic_system(regions=3, fan_in=4, arity=2, storages=2,
+                              chps=1, nonconvex=1, periods=5)
+        eq_(len(es.timeindex), 5)
+        nodes = {str(n): n for n in es.nodes}
+        plants = [n for l, n in nodes.items() if l.startswith('pp_')]
+        eq_(len(plants), 3 * 4)
+        ok_(all(type(n) is Transformer and len(n.inputs) == 2
+                for n in plants))
+        eq_(sum(isinstance(n, GenericStorage) for n in es.nodes), 3 * 2)
+        eq_(sum(isinstance(n, VariableFractionTransformer)
+                for n in es.nodes), 3)
+        eq_(len(es.groups[NonConvexFlow]), 3)
+        eq_(len([l for l in nodes if l.startswith('line_')]), 2 * 3)
+        # plants, wind, shortage, storages, the CHP and the lines from both
+        # neighbours feed the first electricity bus
+        eq_(len(nodes['el_0'].inputs), 4 + 1 + 1 + 2 + 1 + 2)
+        eq_([str(n) for n in synthetic_system(regions=2, periods=2).nodes],
+            [str(n) for n in synthetic_system(regions=2, periods=2).nodes])
+
+
+class Run_Tests:
+
+    def test_run_and_compare(self):
+        results = run.run_case(dict(regions=2, fan_in=1, periods=3),
+                               solver='cbc', repeat=2)
+        eq_(results['size']['nodes'], 28)
+        ok_(results['size']['rows'] > 0)
+        for stage in ('construction', 'grouping', 'OperationalModel',
+                      'OperationalModel/Flow', 'write', 'solve',
+                      'results'):
+            ok_(results['timings'][stage] >= 0)
+
+        current = {'cases': {'case': results}}
+        baseline = {'cases': {'case': dict(results, timings=dict(
+            results['timings'], solve=results['timings']['solve'] / 4,
+            results=results['timings']['results'] * 4))}}
+        comparison = run.compare(current, baseline, threshold=0)
+        eq_(sorted(comparison['stage']),
+            sorted(s for s in results['timings'] if '/' not in s))
+        eq_(list(comparison.loc[comparison['regression'], 'stage']),
+            ['solve'])
+        baseline['cases']['case']['parameters'] = {}
+        eq_(len(run.compare(current, baseline)), 0)
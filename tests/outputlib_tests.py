@@ -0,0 +1,311 @@
+from io import StringIO
+from tempfile import TemporaryDirectory
+from xml.etree import ElementTree
+import json
+import time
+
+from nose.tools import eq_, ok_
+import numpy as np
+import pandas as pd
+import pyomo.environ as po
+
+from oemof.energy_system import EnergySystem as ES
+from oemof.network import Bus, Sink
+from oemof.outputlib import graph_tools, processing, views
+from oemof.outputlib.store import ResultsStore
+import oemof.solph as solph
+
+
+class ResultsStore_Tests:
+
+    def setup(self):
+        self.es = ES()
+        self.bus = Bus(label="bus")
+        self.sink = Sink(label="sink", inputs={self.bus: None})
+
+    def results(self, start, periods, invest):
+        index = pd.date_range(start, periods=periods, freq='H')
+        flow = pd.DataFrame({'flow': range(periods)}, index=index,
+                            dtype=float)
+        duals = pd.DataFrame({'duals': [-1.] * periods}, index=index)
+        return {(self.bus, self.sink): {
+                    'scalars': pd.Series({'invest': invest}),
+                    'sequences': flow},
+                (self.bus,): {'scalars': pd.Series(), 'sequences': duals}}
+
+    def test_appending_and_partial_reads(self):
+        with TemporaryDirectory() as path:
+            ResultsStore(path, chunk_size=24).append(
+                self.results('1/31/2017', 48, 1.))
+            store = ResultsStore(path, chunk_size=24)
+            store.append(self.results('2/2/2017', 24, 2.))
+
+            eq_(sorted(store.keys()), [('bus',), ('bus', 'sink')])
+            everything = store.read()
+            sequences = everything[('bus', 'sink')]['sequences']
+            eq_(len(sequences), 72)
+            eq_(sequences['flow'].tolist(),
+                list(range(48)) + list(range(24)))
+            eq_(everything[('bus', 'sink')]['scalars']['invest'], 2.)
+
+            january = store.read(nodes=["sink"], end='1/31/2017 23:00')
+            eq_(list(january), [('bus', 'sink')])
+            eq_(january[('bus', 'sink')]['sequences']['flow'].tolist(),
+                list(range(24)))
+            eq_(january[('bus', 'sink')]['scalars']['invest'], 1.)
+
+            feb = store.read(keys=[(self.bus,)], start='2/1/2017',
+                             energy_system=self.es)
+            eq_(list(feb), [(self.bus,)])
+            ok_(feb[(self.bus,)]['sequences'].index.equals(
+                pd.date_range('2/1/2017', periods=48, freq='H')))
+
+    def test_empty_sequences(self):
+        results = self.results('1/1/2017', 4, 1.)
+        results[(self.sink,)] = {'scalars': pd.Series({'capacity': 3.}),
+                                 'sequences': pd.DataFrame()}
+        with TemporaryDirectory() as path:
+            store = ResultsStore(path, chunk_size=3)
+            store.append(results)
+            sink = store.read(nodes=["sink"], start='1/1/2017 01:00')[
+                ('sink',)]
+            eq_(sink['scalars']['capacity'], 3.)
+            eq_(sink['sequences'].shape, (3, 0))
+            ok_(sink['sequences'].index.equals(
+                pd.date_range('1/1/2017 01:00', periods=3, freq='H')))
+
+
+class Processing_Tests:
+
+    def setup(self):
+        es = solph.EnergySystem(
+            timeindex=pd.date_range('1/1/2017', periods=3, freq='H'))
+        bus = solph.Bus(label="bus")
+        solph.Source(label="source", outputs={bus: solph.Flow(
+            variable_costs=1, investment=solph.Investment(ep_costs=1))})
+        solph.Sink(label="demand", inputs={bus: solph.Flow(
+            nominal_value=2, actual_value=[1, .5, .2], fixed=True)})
+        self.om = solph.OperationalModel(es)
+        self.om.solve(solver='cbc')
+
+    def test_create_dataframe_matches_row_wise_definition(self):
+        df = processing.create_dataframe(self.om)
+        oemof_tuples = df['pyomo_tuple'].map(processing.get_tuple)
+        eq_(df['timestep'].tolist(),
+            oemof_tuples.map(processing.get_timestep).tolist())
+        eq_(df['oemof_tuple'].tolist(),
+            oemof_tuples.map(processing.remove_timestep).tolist())
+        eq_(df['variable_name'].tolist(),
+            [p[1] for p in df['pyomo_tuple']])
+        eq_(df.loc[df['variable_name'] == 'flow', 'value'].tolist(),
+            [self.om.flow[p[2]].value for p in df['pyomo_tuple']
+             if p[1] == 'flow'])
+        rows = list(zip(df['oemof_tuple'], df['timestep']))
+        eq_(rows, sorted(rows))
+        eq_(len(df), 3 * 2 + 1)
+
+    def test_results_split_scalars_and_sequences(self):
+        results = processing.results(self.om)
+        source, bus = next(k for k in results if len(k) == 2 and
+                           str(k[0]) == "source")
+        flow = results[(source, bus)]
+        eq_(list(flow['sequences'].columns), ['flow'])
+        eq_(flow['sequences']['flow'].tolist(), [2, 1, .4])
+        ok_(flow['sequences'].index.equals(self.om.es.timeindex))
+        eq_(flow['scalars'].to_dict(), {'invest': 2})
+        demand = [v for k, v in results.items() if str(k[-1]) == "demand"]
+        eq_(len(demand), 1)
+        ok_(demand[0]['scalars'].empty)
+
+    def test_results_are_assembled_lazily(self):
+        results = processing.results(self.om)
+        ok_(isinstance(results, processing.Results))
+        eq_(len(results), len(set(results)))
+        eq_(results._cache, {})
+        key = next(iter(results))
+        ok_(results[key] is results[key])
+        eq_(list(results._cache), [key])
+        eq_(dict(results).keys(), set(results.keys()))
+
+    def test_node_views_use_a_cached_index(self):
+        results = processing.results(self.om)
+        index = views.node_index(results)
+        ok_(views.node_index(results) is index)
+        bus = next(n for n in self.om.es.nodes if str(n) == "bus")
+        eq_(set(index.keys(bus)), set(k for k in results if bus in k))
+        eq_(index.keys("bus"), index.keys(bus))
+
+        by_label = views.node(results, "bus")
+        ok_(views.node(results, "bus")['sequences'] is
+            by_label['sequences'])
+        eq_(sorted(c[0] for c in by_label['sequences'].columns),
+            [('bus', 'demand'), ('source', 'bus')])
+        source_bus = next(k for k in results if str(k[0]) == "source")
+        eq_(list(views.node(results, bus)['scalars'].index),
+            [(source_bus, 'invest')])
+
+        results[("extra",)] = {}
+        ok_(views.node_index(results) is not index)
+
+        labelled = views.node_index(views.convert_keys_to_strings(results))
+        eq_(sorted(labelled.keys("bus")),
+            [('bus', 'demand'), ('source', 'bus')])
+
+    def test_flow_cube(self):
+        cube = processing.flow_cube(self.om)
+        eq_(cube.values.shape, (2, 3))
+        labels = [(str(cube.nodes[s]), str(cube.nodes[t]))
+                  for s, t in zip(cube.sources, cube.targets)]
+        eq_(labels, [(str(s), str(t)) for s, t in cube.flows])
+        row = labels.index(("source", "bus"))
+        eq_(cube.values[row].tolist(), [2, 1, .4])
+        eq_(cube.peak()[row], 2)
+        eq_(cube.capacity[row], 2)
+        eq_(cube.capacity_factor()[row], 3.4 / 6)
+        bus = [str(n) for n in cube.nodes].index("bus")
+        eq_(cube.inflow()[bus], 3.4)
+        eq_(cube.outflow()[bus], 3.4)
+        eq_(processing.flow_cube(self.om, dtype=np.float32).values.dtype,
+            np.float32)
+
+    def test_duals_and_reduced_costs(self):
+        es = self.om.es
+        self.om = solph.OperationalModel(es)
+        self.om.receive_duals()
+        self.om.solve(solver='cbc')
+        bus = es.groups["bus"]
+
+        prices = processing.duals(self.om)['Bus.balance']
+        ok_(prices.index.equals(es.timeindex))
+        eq_(list(prices.columns), [(bus,)])
+        eq_(prices[(bus,)].tolist(),
+            [self.om.dual[self.om.Bus.balance[bus, t]] for t in range(3)])
+
+        results = processing.results(self.om)
+        eq_(results[(bus,)]['sequences']['duals'].tolist(),
+            prices[(bus,)].tolist())
+        source = es.groups["source"]
+        flow = results[(source, bus)]
+        eq_(list(flow['sequences'].columns),
+            ['flow', 'InvestmentFlow.max.dual', 'flow.rc'])
+        eq_(flow['scalars']['InvestmentFlow.invest.rc'],
+            processing.reduced_costs(self.om)['InvestmentFlow.invest'][
+                (source, bus)])
+
+    def test_duals_of_constraints_not_indexed_by_timesteps(self):
+        es = self.om.es
+        source, bus = es.groups["source"], es.groups["bus"]
+        self.om = solph.OperationalModel(es)
+        self.om.LABELS = po.Set(initialize=['a', 'b'], ordered=True)
+        self.om.labelled = po.Constraint(
+            self.om.LABELS, rule=lambda m, i: m.flow[source, bus, 0] >= 0)
+        self.om.PERIODS = po.Set(initialize=range(5), ordered=True)
+        self.om.periodic = po.Constraint(
+            self.om.PERIODS,
+            rule=lambda m, k: m.flow[source, bus, 0] >= -k)
+        self.om.receive_duals()
+        self.om.solve(solver='cbc')
+
+        duals = processing.duals(self.om)
+        eq_(list(duals['labelled'].index), ['a', 'b'])
+        eq_(list(duals['periodic'].index), list(range(5)))
+        ok_(duals['Bus.balance'].index.equals(es.timeindex))
+        results = processing.results(self.om)
+        ok_('a' not in results and () not in results)
+        eq_(list(results[(bus,)]['sequences'].columns), ['duals'])
+
+    def test_meta_results_contain_timings_and_size(self):
+        processing.results(self.om)
+        meta = processing.meta_results(self.om)
+        eq_(set(meta['timings']), {'energy_system', 'build', 'solve',
+                                   'results'})
+        ok_(all(t >= 0 for t in meta['timings'].values()))
+        eq_(meta['size']['integers'], 0)
+        ok_(meta['size']['rows'] > 0 and meta['size']['columns'] > 0)
+        ok_(meta['peak_rss'] is None or meta['peak_rss'] > 0)
+
+    def test_energy_system_timing_excludes_idle_time(self):
+        es = self.om.es
+        constructed = self.om.timings['energy_system']
+        time.sleep(0.2)
+        eq_(solph.OperationalModel(es).timings['energy_system'], constructed)
+        ok_(solph.OperationalModel(es.fork()).timings['energy_system'] < 0.2)
+
+
+class GraphExport_Tests:
+
+    def setup(self):
+        self.es = solph.EnergySystem(
+            timeindex=pd.date_range('1/1/2017', periods=3, freq='H'))
+        el_de, el_fr = solph.Bus(label="el_de"), solph.Bus(label="el_fr")
+        solph.Source(label="pp_de", outputs={el_de: solph.Flow(
+            variable_costs=2, investment=solph.Investment(ep_costs=3))})
+        solph.Source(label="pp_fr", outputs={el_fr: solph.Flow(
+            nominal_value=10, variable_costs=1)})
+        solph.Transformer(label="line_fr_de", inputs={el_fr: solph.Flow()},
+                          outputs={el_de: solph.Flow()},
+                          conversion_factors={el_de: 0.9})
+        solph.Sink(label="demand_de", inputs={el_de: solph.Flow(
+            nominal_value=5, actual_value=[1, .5, .2], fixed=True)})
+
+    def test_label_index_and_node_selection(self):
+        index = graph_tools.LabelIndex(self.es.nodes)
+        eq_([str(n) for n in index.matching("_de")],
+            ["el_de", "pp_de", "line_fr_de", "demand_de"])
+        eq_([str(n) for n in index.matching("fr_")], ["line_fr_de"])
+        eq_(index.matching("nowhere"), [])
+        selected = graph_tools.select_nodes(self.es, include=["el_", "pp"],
+                                            exclude=["fr"], index=index)
+        eq_([str(n) for n in selected], ["el_de", "pp_de"])
+
+    def test_graphml_export_with_results(self):
+        om = solph.OperationalModel(self.es)
+        om.solve(solver='cbc')
+        f = StringIO()
+        graph_tools.write_graphml(self.es, f,
+                                  results=processing.results(om))
+        ns = {'g': 'http://graphml.graphdrawing.org/xmlns'}
+        root = ElementTree.fromstring(f.getvalue())
+        keys = {k.get('id'): (k.get('attr.name'), k.get('attr.type'))
+                for k in root.findall('g:key', ns)}
+        graph = root.find('g:graph', ns)
+        eq_([n.get('id') for n in graph.findall('g:node', ns)],
+            [str(n) for n in self.es.nodes])
+        edges = {(e.get('source'), e.get('target')):
+                 {keys[d.get('key')]: d.text for d in e.findall('g:data', ns)}
+                 for e in graph.findall('g:edge', ns)}
+        eq_(len(edges), 5)
+        pp_de = edges['pp_de', 'el_de']
+        eq_(pp_de[('investment.ep_costs', 'long')], '3')
+        eq_(pp_de[('variable_costs', 'long')], '2')
+        ok_(not any(name == 'investment.maximum' for name, _ in pp_de))
+        eq_(float(edges['el_de', 'demand_de'][('flow', 'double')]), 8.5)
+
+    def test_json_export_of_a_subgraph(self):
+        om = solph.OperationalModel(self.es)
+        om.solve(solver='cbc')
+        results = processing.results(om)
+        f = StringIO()
+        nodes = graph_tools.select_nodes(self.es, include=["fr"])
+        graph_tools.write_json(self.es, f, nodes=nodes, results=results)
+        ok_(all(set(str(n) for n in key) <= {"el_fr", "pp_fr", "line_fr_de"}
+                for key in results._cache))
+
+        graph = json.loads(f.getvalue())
+        eq_([n['id'] for n in graph['nodes']],
+            ["el_fr", "pp_fr", "line_fr_de"])
+        eq_(graph['nodes'][0]['type'], "Bus")
+        eq_([(l['source'], l['target'], l.get('nominal_value'))
+             for l in graph['links']],
+            [("el_fr", "line_fr_de", None), ("pp_fr", "el_fr", 10)])
+
+        def reject(constant):
+            raise ValueError(constant)
+
+        # the unbounded maximum of pp_de's investment isn't written as
+        # `Infinity`, which isn't valid JSON
+        f = StringIO()
+        graph_tools.write_json(self.es, f)
+        links = json.loads(f.getvalue(), parse_constant=reject)['links']
+        eq_([l['investment.ep_costs'] for l in links
+             if 'investment.ep_costs' in l], [3])
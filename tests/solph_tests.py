@@ -1,8 +1,18 @@
-from nose.tools import ok_, eq_
+from copy import copy
+import gc
+from io import StringIO
+import json
+import os
+from tempfile import TemporaryDirectory
 
+from nose.tools import assert_raises, ok_, eq_
+import numpy as np
+import pandas as pd
 from oemof.energy_system import EnergySystem as ES
 from oemof.solph.blocks import InvestmentFlow as IF
 from oemof.solph import Investment
+from oemof.solph.inputlib import csv_tools
+from oemof.tools import economics, timing
 import oemof.solph as solph
 
 
@@ -38,3 +48,444 @@ class Grouping_Tests:
             ("Expected InvestmentFlow group to be nonempty.\n" +
              "Got: {}").format(self.es.groups.get(IF)))
 
+
+    def test_batched_grouping_equals_incremental_grouping(self):
+        """ Grouping many nodes in one go should yield the same groups.
+        """
+        with ES().active() as scratch:
+            buses = [solph.Bus(label="bus {}".format(i)) for i in range(10)]
+            for i, (b1, b2) in enumerate(zip(buses, buses[1:])):
+                solph.Transformer(
+                    label="transformer {}".format(i),
+                    inputs={b1: solph.Flow()},
+                    outputs={b2: solph.Flow(investment=(
+                        Investment() if i % 2 else None))},
+                    conversion_factors={b2: 0.5})
+            solph.Sink(label="sink", inputs={buses[-1]: solph.Flow(
+                nonconvex=solph.NonConvex())})
+            solph.components.GenericStorage(
+                label="storage", inputs={buses[0]: solph.Flow()},
+                outputs={buses[0]: solph.Flow()}, nominal_capacity=10,
+                nominal_input_capacity_ratio=1,
+                nominal_output_capacity_ratio=1)
+
+        incremental = solph.EnergySystem()
+        for node in scratch.nodes:
+            incremental.add(node)
+            incremental.groups
+        batched = solph.EnergySystem()
+        batched.add_many(scratch.nodes)
+
+        eq_(batched.groups, incremental.groups)
+
+    def test_removal_updates_groups_incrementally(self):
+        """ Removing nodes and flows should leave the same groups behind as
+        building the reduced system from scratch.
+        """
+        es = solph.EnergySystem()
+        b_gas = solph.Bus(label="gas")
+        b_el = solph.Bus(label="electricity")
+        b_heat = solph.Bus(label="heat")
+        solph.Source(label="gas_source", outputs={b_gas: solph.Flow()})
+        plant = solph.Transformer(
+            label="plant", inputs={b_gas: solph.Flow()},
+            outputs={b_el: solph.Flow(investment=Investment()),
+                     b_heat: solph.Flow()},
+            conversion_factors={b_el: 0.4, b_heat: 0.4})
+        chp = solph.Transformer(
+            label="chp", inputs={b_gas: solph.Flow()},
+            outputs={b_el: solph.Flow(nonconvex=solph.NonConvex()),
+                     b_heat: solph.Flow()})
+        solph.Sink(label="demand", inputs={b_el: solph.Flow()})
+        es.groups
+        adjacency = es.adjacency
+        adjacency.successors(b_gas)
+
+        es.remove(plant)
+        es.remove_flow(chp, b_heat)
+
+        ok_(plant not in es.nodes)
+        eq_(len(b_gas.outputs), 1)
+        eq_(list(chp.outputs), [b_el])
+        eq_(adjacency.in_degree(b_el).tolist(), [1])
+        eq_(adjacency.nodes[adjacency.predecessors(b_el)[0]], chp)
+        ok_(plant not in adjacency)
+        ok_("plant" not in es.groups)
+        ok_(IF not in es.groups)
+
+        fresh = solph.EnergySystem()
+        fresh.add_many(es.nodes)
+        eq_(es.groups, fresh.groups)
+
+    def test_removed_nodes_are_dropped_from_the_nodes_lazily(self):
+        es = solph.EnergySystem()
+        buses = [solph.Bus(label="bus {}".format(i)) for i in range(6)]
+        for b1, b2 in zip(buses, buses[1:]):
+            b2.inputs[b1] = solph.Flow()
+        for bus in buses[1::2]:
+            es.remove(bus)
+        eq_(len(es._entities), 6)
+        with es.active():
+            extra = solph.Bus(label="extra", inputs={buses[4]: solph.Flow()})
+        eq_(es.nodes, buses[::2] + [extra])
+        adjacency = es.adjacency
+        eq_([adjacency.nodes[i] for i in adjacency.successors(buses[4])],
+            [extra])
+        eq_(adjacency.out_degree(buses[:4:2]).tolist(), [0, 0])
+        es.remove(extra)
+        ok_(extra not in adjacency)
+        eq_(es.nodes, buses[::2])
+
+    def test_forks_copy_modified_flows_and_groups_only(self):
+        """ Modifying a flow of a fork should neither change the base energy
+        system nor copy more than the flow and the groups containing it.
+        """
+        base = solph.EnergySystem()
+        b_gas = solph.Bus(label="gas")
+        b_el = solph.Bus(label="electricity")
+        solph.Source(label="gas_source", outputs={b_gas: solph.Flow()})
+        plant = solph.Transformer(
+            label="plant", inputs={b_gas: solph.Flow()},
+            outputs={b_el: solph.Flow(nominal_value=10,
+                                      variable_costs=[1, 2, 3])},
+            conversion_factors={b_el: 0.4})
+        solph.Sink(label="demand", inputs={b_el: solph.Flow()})
+        original = plant.outputs[b_el]
+        base_groups = {k: copy(v) if isinstance(v, set) else v
+                       for k, v in base.groups.items()}
+
+        fork = base.fork()
+        modified = fork.modify_flow(plant, b_el, nominal_value=None,
+                                    investment=Investment(ep_costs=5))
+
+        ok_(plant.outputs[b_el] is original)
+        ok_(base.flows()[plant, b_el] is original)
+        ok_(fork.flows()[plant, b_el] is modified)
+        with fork.active():
+            ok_(plant.outputs[b_el] is modified)
+        ok_(modified.variable_costs is original.variable_costs)
+        eq_(base.groups, base_groups)
+        eq_(fork.groups[IF], {(plant, b_el, modified)})
+        ok_((plant, b_el, original) not in fork.groups[solph.blocks.Flow])
+        ok_(IF not in base.groups)
+        ok_(fork.groups["gas"] is base.groups["gas"])
+        eq_(fork.groups[solph.blocks.Bus], base.groups[solph.blocks.Bus])
+        eq_(set(fork.groups), set(base.groups).union([IF]))
+
+    def test_forks_are_snapshots(self):
+        base = solph.EnergySystem()
+        b_el = solph.Bus(label="electricity")
+        demand = solph.Sink(label="demand", inputs={b_el: solph.Flow()})
+        fork = base.fork()
+        with fork.active():
+            assert_raises(TypeError, solph.Source, label="source",
+                          outputs={b_el: solph.Flow()})
+        eq_(list(b_el.inputs), [])
+        assert_raises(TypeError, solph.Bus, label="heat")
+        assert_raises(TypeError, base.remove, demand)
+        assert_raises(TypeError, base.modify_flow, b_el, demand,
+                      nominal_value=1)
+        child = fork.fork()
+        assert_raises(TypeError, fork.modify_flow, b_el, demand,
+                      nominal_value=1)
+        child.modify_flow(b_el, demand, nominal_value=2)
+
+        del fork, child
+        gc.collect()
+        base.modify_flow(b_el, demand, nominal_value=1)
+        eq_(base.flows()[b_el, demand].nominal_value, 1)
+
+
+class Investment_Tests:
+
+    def test_investments_from_table(self):
+        table = pd.DataFrame({'capex': [1000., 1000., 500.],
+                              'n': [20, 20, 10], 'wacc': [0.05, 0, 0.1],
+                              'fom': [10., 0, 0], 'minimum': [1, None, 2]},
+                             index=['a', 'b', 'c'])
+        expected = [economics.annuity(c, n, w) + f for c, n, w, f in zip(
+            table['capex'], table['n'], table['wacc'], table['fom'])]
+        eq_(expected[1], 50)
+        ok_(np.allclose(economics.ep_costs(table['capex'].values,
+                                           table['n'].values,
+                                           table['wacc'].values,
+                                           table['fom'].values), expected))
+
+        investments = Investment.from_table(table)
+        eq_(list(investments.index), ['a', 'b', 'c'])
+        ok_(np.allclose([i.ep_costs for i in investments], expected))
+        eq_([i.minimum for i in investments], [1, 0, 2])
+        eq_(investments['a'].maximum, float('+inf'))
+
+        table['ep_costs'] = [1, 2, 3]
+        eq_([i.ep_costs for i in Investment.from_table(table)], [1, 2, 3])
+
+
+class Timing_Tests:
+
+    def build_and_solve(self):
+        es = solph.EnergySystem(
+            timeindex=pd.date_range('1/1/2017', periods=2, freq='H'))
+        bus = solph.Bus(label="bus")
+        solph.Source(label="source", outputs={bus: solph.Flow(
+            variable_costs=1)})
+        solph.Sink(label="demand", inputs={bus: solph.Flow(
+            nominal_value=1, actual_value=[1, .5], fixed=True)})
+        om = solph.OperationalModel(es)
+        om.solve(solver='cbc')
+        om.results()
+
+    def test_model_stages_are_timed_when_enabled(self):
+        timing.reset()
+        self.build_and_solve()
+        eq_(len(timing.report()), 0)
+
+        timing.enable()
+        try:
+            for run in range(2):
+                self.build_and_solve()
+        finally:
+            timing.disable()
+        report = timing.report()
+        for stage in ('EnergySystem', 'OperationalModel',
+                      'OperationalModel/groupings', 'OperationalModel/Flow',
+                      'OperationalModel/objective', 'solve', 'results',
+                      'results/create_dataframe'):
+            eq_(report.loc[stage, 'count'], 2)
+        ok_((report['total'] >= report['max']).all())
+        ok_(report.loc['OperationalModel', 'total'] >=
+            report.loc['OperationalModel/Flow', 'total'])
+
+        f = StringIO()
+        timing.write_trace(f)
+        events = json.loads(f.getvalue())['traceEvents']
+        eq_(len(events), report['count'].sum())
+        eq_(set(e['ph'] for e in events), {'X'})
+        eq_(sorted(set(e['args']['path'] for e in events)),
+            sorted(report.index))
+        timing.reset()
+
+
+class Persistence_Tests:
+
+    def test_save_and_load_round_trip(self):
+        """ Loading a saved energy system should rebuild nodes, flows and
+        groups, with numeric sequences memory mapped.
+        """
+        es = solph.EnergySystem(
+            timeindex=pd.date_range('1/1/2012', periods=3, freq='H'))
+        b_gas = solph.Bus(label="gas", balanced=False)
+        b_el = solph.Bus(label="electricity")
+        solph.Transformer(
+            label="plant", inputs={b_gas: solph.Flow()},
+            outputs={b_el: solph.Flow(nominal_value=10,
+                                      variable_costs=[1, 2, 3],
+                                      investment=Investment(ep_costs=5))},
+            conversion_factors={b_el: 0.4})
+        solph.Sink(label="demand", inputs={b_el: solph.Flow(
+            nominal_value=5, actual_value=np.array([.5, 1, .2]), fixed=True)})
+
+        with TemporaryDirectory() as path:
+            es.save(path)
+            loaded = solph.EnergySystem.load(path)
+
+            eq_([n.label for n in loaded.nodes], [n.label for n in es.nodes])
+            eq_(sorted(map(str, loaded.groups)), sorted(map(str, es.groups)))
+            plant, b_el = loaded.groups["plant"], loaded.groups["electricity"]
+            eq_(set(plant.conversion_factors),
+                {b_el, loaded.groups["gas"]})
+            eq_(plant.conversion_factors[b_el][0], 0.4)
+            ok_(loaded.groups["gas"].balanced is False)
+            ok_(loaded.timeindex.equals(es.timeindex))
+
+            f = plant.outputs[b_el]
+            ok_(isinstance(f.variable_costs, np.memmap))
+            eq_(f.variable_costs.tolist(), [1, 2, 3])
+            eq_(f.investment.ep_costs, 5)
+            eq_(loaded.groups[IF], {(plant, b_el, f)})
+            eq_(loaded.groups["demand"].inputs[b_el].actual_value.tolist(),
+                [.5, 1, .2])
+
+
+class CsvTools_Tests:
+
+    nodes_flows = """\
+class,label,source,target,conversion_factors,nominal_value,actual_value,fixed,variable_costs,investment,ep_costs,capacity_loss,balanced
+Source,wind,wind,b_el,,66,seq,True,,,,,
+LinearTransformer,chp,b_gas,chp,,100,,,,,,,False
+LinearTransformer,chp,chp,b_el,0.3,,,,seq,,,,
+LinearTransformer,chp,chp,b_th,seq,,,,,,,,
+,,,,,,,,,,,,
+Storage,storage,b_el,storage,,,,,,True,1500,seq,
+Storage,storage,storage,b_el,,,,,2,True,1500,,
+"""
+    sequences = """\
+class,Source,LinearTransformer,LinearTransformer,Storage
+label,wind,chp,chp,storage
+source,wind,chp,chp,b_el
+target,b_el,b_el,b_th,storage
+attribute,actual_value,variable_costs,conversion_factors,capacity_loss
+2017-01-01 00:00,0.3,40,0.5,0.01
+
+2017-01-01 01:00,0.2,42,0.45,0.02
+"""
+
+    def test_nodes_from_csv(self):
+        es = solph.EnergySystem()
+        nodes = csv_tools.nodes_from_csv(StringIO(self.nodes_flows),
+                                         StringIO(self.sequences))
+        eq_(sorted(nodes), ['b_el', 'b_gas', 'b_th', 'chp', 'storage',
+                            'wind'])
+        ok_(all(n in es.nodes for n in nodes.values()))
+        wind, chp, storage = nodes['wind'], nodes['chp'], nodes['storage']
+        b_el, b_th = nodes['b_el'], nodes['b_th']
+
+        eq_(wind.outputs[b_el].actual_value, [0.3, 0.2])
+        eq_(wind.outputs[b_el].nominal_value, 66)
+        ok_(wind.outputs[b_el].fixed is True)
+        ok_(nodes['b_gas'].balanced is False)
+        eq_(chp.inputs[nodes['b_gas']].nominal_value, 100)
+        eq_(chp.outputs[b_el].variable_costs, [40, 42])
+        eq_(chp.conversion_factors[b_el][5], 0.3)
+        eq_(chp.conversion_factors[b_th], [0.5, 0.45])
+
+        ok_(isinstance(storage, solph.components.GenericStorage))
+        eq_(storage.investment.ep_costs, 1500)
+        eq_(storage.capacity_loss, [0.01, 0.02])
+        ok_(isinstance(storage.inputs[b_el].investment, Investment))
+        eq_(storage.outputs[b_el].variable_costs[0], 2)
+
+    def test_errors_tell_the_line(self):
+        nodes_flows = self.nodes_flows.replace('2,True', 'two,True')
+        with assert_raises(ValueError) as e:
+            csv_tools.nodes_from_csv(StringIO(nodes_flows),
+                                     StringIO(self.sequences))
+        ok_("line 8 in csv file (label 'storage')" in str(e.exception))
+
+        sequences = self.sequences.replace('capacity_loss', 'capacity')
+        with assert_raises(ValueError) as e:
+            csv_tools.nodes_from_csv(StringIO(self.nodes_flows),
+                                     StringIO(sequences))
+        ok_("line 7 in csv file (label 'storage')" in str(e.exception))
+
+    def test_nodes_from_binary_sequences(self):
+        with TemporaryDirectory() as path:
+            csv_tools.sequences_to_binary(StringIO(self.sequences), path)
+            from_csv = csv_tools.nodes_from_csv(StringIO(self.nodes_flows),
+                                                StringIO(self.sequences))
+            from_binary = csv_tools.nodes_from_csv(
+                StringIO(self.nodes_flows), path)
+        eq_(sorted(from_binary), sorted(from_csv))
+        b_el, b_th = from_binary['b_el'], from_binary['b_th']
+        eq_(from_binary['wind'].outputs[b_el].actual_value,
+            from_csv['wind'].outputs[from_csv['b_el']].actual_value)
+        eq_(from_binary['chp'].conversion_factors[b_th], [0.5, 0.45])
+        eq_(from_binary['storage'].capacity_loss, [0.01, 0.02])
+
+    def test_parsed_input_is_cached(self):
+        with TemporaryDirectory() as path:
+            files = [os.path.join(path, name) for name in ('n.csv', 's.csv')]
+            for name, content in zip(files, (self.nodes_flows,
+                                             self.sequences)):
+                with open(name, 'w') as f:
+                    f.write(content)
+            cache = os.path.join(path, 'cache')
+            os.mkdir(cache)
+
+            home = os.environ.get('HOME')
+            os.environ['HOME'] = cache
+            try:
+                csv_tools.nodes_from_csv(*files)
+            finally:
+                if home is None:
+                    del os.environ['HOME']
+                else:
+                    os.environ['HOME'] = home
+            eq_(os.listdir(cache), [])
+            first = csv_tools.nodes_from_csv(*files, cache=cache)
+            eq_(len(os.listdir(cache)), 1)
+
+            parse = csv_tools._parse_nodes_flows
+            csv_tools._parse_nodes_flows = None
+            try:
+                cached = csv_tools.nodes_from_csv(*files, cache=cache)
+            finally:
+                csv_tools._parse_nodes_flows = parse
+            eq_(sorted(cached), sorted(first))
+            eq_(cached['storage'].capacity_loss, [0.01, 0.02])
+            eq_(cached['wind'].outputs[cached['b_el']].actual_value,
+                [0.3, 0.2])
+
+            with open(files[0], 'a') as f:
+                f.write("Sink,demand,b_el,demand,,10,,,,,,,\n")
+            ok_('demand' in csv_tools.nodes_from_csv(*files, cache=cache))
+            eq_(len(os.listdir(cache)), 2)
+            csv_tools._trim_cache(cache, 0)
+            eq_(os.listdir(cache), [])
+
+    def test_merge_csv_files(self):
+        nodes = self.nodes_flows.splitlines()
+        sequences = [l.split(',') for l in self.sequences.splitlines()]
+        with TemporaryDirectory() as path:
+            for name, lines in (('a.csv', nodes[:4]),
+                                ('b.csv', nodes[:1] + nodes[4:])):
+                with open(os.path.join(path, name), 'w') as f:
+                    f.write('\n'.join(lines) + '\n')
+            for name, columns in (('a_seq.csv', slice(0, 3)),
+                                  ('b_seq.csv', slice(3, 5))):
+                with open(os.path.join(path, name), 'w') as f:
+                    f.write('\n'.join(','.join(l[:1] + l[1:][columns])
+                                      for l in sequences) + '\n')
+            output = os.path.join(path, 'merged')
+            os.mkdir(output)
+
+            nodes_flows, merged = csv_tools.merge_csv_files(path, output)
+            eq_(len(nodes_flows), len(nodes) - 1)
+            eq_(merged.shape, (2, 4))
+            ok_(merged.columns.get_level_values(1).isin(
+                ['wind', 'chp', 'storage']).all())
+            _, streamed = csv_tools.merge_csv_files(path, output,
+                                                    stream=True)
+            ok_(streamed is None)
+            read = pd.read_csv(
+                os.path.join(output, 'merged_nodes_flows_seq.csv'),
+                index_col=[0], header=[0, 1, 2, 3, 4])
+            ok_(read.equals(merged))
+
+    def test_resample_sequence(self):
+        sequences = """\
+class,Source,Source,Sink
+label,wind,wind,demand
+source,wind,wind,b_el
+target,b_el,b_el,demand
+attribute,actual_value,max,energy
+2017-01-01 00:00,0.2,0.5,10
+2017-01-01 01:00,0.4,0.3,
+2017-01-01 02:00,0.1,0.9,20
+
+2017-01-01 06:00,0.3,0.1,5
+"""
+        with TemporaryDirectory() as path:
+            with open(os.path.join(path, 'a_seq.csv'), 'w') as f:
+                f.write(sequences)
+            resampled = csv_tools.resample_sequence(
+                os.path.join(path, 'a_seq.csv'), samples=['H', '2H'],
+                aggregation={'energy': 'sum'}, binary=True, chunksize=2)
+
+            eq_(resampled.index.tolist(),
+                pd.date_range('1/1/2017', periods=4, freq='2H').tolist())
+            expected = [[0.3, 0.5, 10], [0.1, 0.9, 20],
+                        [np.nan] * 3, [0.3, 0.1, 5]]
+            ok_(np.allclose(resampled.values, expected, equal_nan=True))
+            written = pd.read_csv(os.path.join(path, 'a_2H_seq.csv'),
+                                  index_col=[0], header=[0, 1, 2, 3, 4],
+                                  parse_dates=True)
+            ok_(np.allclose(written.values, expected, equal_nan=True))
+            eq_(list(written.columns), list(resampled.columns))
+            keys, values = csv_tools._read_sequences(
+                os.path.join(path, 'a_2H_seq'), ',')
+            row = keys.index(('Sink', 'demand', 'b_el', 'demand', 'energy'))
+            ok_(np.allclose(values[row], [10, 20, np.nan, 5],
+                            equal_nan=True))
+            eq_(len(pd.read_csv(os.path.join(path, 'a_H_seq.csv'),
+                                header=[0, 1, 2, 3, 4])), 7)
@@ -1,9 +1,11 @@
+from concurrent.futures import ThreadPoolExecutor
 from traceback import format_exception_only as feo
 
 from nose.tools import assert_raises, eq_, ok_
+import numpy as np
 
 from oemof.energy_system import EnergySystem as ES
-from oemof.network import Bus, Node, Transformer
+from oemof.network import Bus, Node, Transformer, flow
 
 
 class Node_Tests:
@@ -199,6 +201,33 @@ class Node_Tests:
         eq_(n1.outputs[n2], n1n2)
         eq_(n1.outputs, {n2: n1n2})
 
+    def test_that_inputs_and_outputs_are_cached_live_views(self):
+        n1 = Node(label="N1")
+        n2 = Node(label="N2")
+        inputs, outputs = n2.inputs, n1.outputs
+        ok_(n2.inputs is inputs)
+        ok_(n1.outputs is outputs)
+        n1.outputs[n2] = "flow"
+        eq_(inputs, {n1: "flow"})
+        eq_(outputs, {n2: "flow"})
+
+    def test_relabeling_keeps_the_hash(self):
+        n = Node(label="old")
+        h = hash(n)
+        lookup = {n: "value"}
+        n.label = "new"
+        eq_(n.label, "new")
+        eq_(hash(n), h)
+        eq_(lookup[n], "value")
+
+    def test_frozen_nodes_cannot_be_relabeled(self):
+        n = Node(label="frozen", frozen=True)
+        ok_(n.frozen)
+        ok_(not Node(label="thawed").frozen)
+        with assert_raises(AttributeError):
+            n.label = "molten"
+        eq_(n.label, "frozen")
+
 class EnergySystem_Nodes_Integration_Tests:
 
     def setup(self):
@@ -211,3 +240,124 @@ class EnergySystem_Nodes_Integration_Tests:
         b2 = Bus(label='<B2>')
         Transformer(label='<TF1>', inputs=[b1], outputs=[b2])
         ok_(isinstance(self.es.entities[2], Transformer))
+
+
+class EnergySystem_Registry_Tests:
+
+    def setup(self):
+        self.es = ES()
+
+    def test_active_scopes_the_registry(self):
+        other = ES()
+        with self.es.active():
+            b1 = Bus(label='<B1>')
+        b2 = Bus(label='<B2>')
+        eq_(self.es.nodes, [b1])
+        eq_(other.nodes, [b2])
+        eq_(Node.registry, other)
+
+    def test_concurrent_energy_system_construction(self):
+        """ Nodes built in worker threads should end up in their own system.
+        """
+        def build(i):
+            es = ES()
+            buses = [Bus(label="bus {}".format(j)) for j in range(20)]
+            for j, (b1, b2) in enumerate(zip(buses, buses[1:])):
+                Transformer(label="transformer {}".format(j),
+                            inputs={b1: (i, j)}, outputs={b2: (i, j)})
+            return i, es, buses
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            systems = list(pool.map(build, range(64)))
+
+        for i, es, buses in systems:
+            eq_(len(es.nodes), 39)
+            eq_(set(es.nodes[:20]), set(buses))
+            for j, b in enumerate(buses[1:]):
+                t = es.groups["transformer {}".format(j)]
+                eq_(list(b.inputs), [t])
+                eq_(b.inputs[t], (i, j))
+        eq_(self.es.nodes, [])
+
+
+class Adjacency_Tests:
+
+    def setup(self):
+        self.es = ES()
+
+    def test_queries_follow_edits(self):
+        b1, b2 = Bus(label="b1"), Bus(label="b2")
+        t = Transformer(label="t", inputs=[b1], outputs=[b2])
+        adjacency = self.es.adjacency
+        eq_(adjacency.successors(b1).tolist(), [2])
+        eq_(adjacency.predecessors([b2, t]).tolist(), [2, 0])
+
+        late = Bus(label="late", inputs=[t])
+        b1.outputs[b2] = "flow"
+        eq_(sorted(adjacency.successors(t).tolist()), [1, 3])
+        eq_(adjacency.out_degree(np.array([0, 2])).tolist(), [2, 2])
+        eq_(adjacency.in_degree().tolist(), [0, 2, 1, 1])
+
+        del b1.outputs[b2]
+        del t.outputs[late]
+        eq_(adjacency.out_degree().tolist(), [1, 0, 1, 0])
+        eq_(adjacency.index(late), 3)
+
+    def test_components(self):
+        b1, b2, b3 = (Bus(label=l) for l in ["b1", "b2", "b3"])
+        Transformer(label="t1", inputs=[b1], outputs=[b2])
+        Transformer(label="t2", inputs=[b3])
+        eq_(self.es.adjacency.components().tolist(), [0, 0, 2, 0, 2])
+
+    def test_edits_only_reach_the_energy_system_of_the_edge(self):
+        b1 = Bus(label="b1")
+        Transformer(label="t", inputs=[b1])
+        adjacency = self.es.adjacency
+        cache = self.es._flow_cache()
+        adjacency._sync()
+        self.es.flows()
+        csr, flows = adjacency._csr, cache._flows
+
+        other = ES()
+        b2 = Bus(label="b2")
+        t2 = Transformer(label="t2", inputs=[b2])
+        eq_(other.adjacency.successors(b2).tolist(), [1])
+        b2.outputs[t2] = "replaced"
+        del b2.outputs[t2]
+        ok_(adjacency._csr is csr)
+        ok_(cache._flows is flows)
+        other.flows()
+        eq_({w() for w in flow._watchers[b2]},
+            {other.adjacency, other._flow_cache()})
+        eq_(other.adjacency.successors(b2).tolist(), [])
+
+
+class EnergySystem_Flows_Tests:
+
+    def setup(self):
+        self.es = ES()
+
+    def test_flows_are_cached_until_edges_change(self):
+        b1, b2 = Bus(label="b1"), Bus(label="b2")
+        t = Transformer(label="t", inputs={b1: "in"}, outputs={b2: "out"})
+        cache = self.es._flow_cache()
+        eq_(self.es.flows(), {(b1, t): "in", (t, b2): "out"})
+        cached = cache._flows
+        self.es.flows()
+        ok_(cache._flows is cached)
+
+        t.outputs[b2] = "replaced"
+        eq_(self.es.flows()[t, b2], "replaced")
+        b3 = Bus(label="b3", inputs={t: "new"})
+        eq_(self.es.flows()[t, b3], "new")
+        self.es.remove_flow(t, b3)
+        ok_((t, b3) not in self.es.flows())
+
+    def test_flow_arrays(self):
+        b1, b2, b3 = Bus(label="b1"), Bus(label="b2"), Bus(label="b3")
+        t = Transformer(label="t", inputs={b1: "in"},
+                        outputs={b3: "out3", b2: "out"})
+        sources, targets, flows = self.es.flow_arrays()
+        eq_(sources.tolist(), [0, 3, 3])
+        eq_(targets.tolist(), [3, 1, 2])
+        eq_(flows.tolist(), ["in", "out", "out3"])
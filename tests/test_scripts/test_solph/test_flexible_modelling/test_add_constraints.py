@@ -74,13 +74,18 @@ def test_add_constraints_example(solver='cbc', nologg=False):
     # add the sub-model to the oemof OperationalModel instance
     om.add_component('MyBlock', myblock)
 
+    # the adjacency index of the energy system gives us all inflows of a node
+    # without having to scan through all flows for every timestep
+    adjacency = es.adjacency
+
     def _inflow_share_rule(m, s, e, t):
         """pyomo rule definition: Here we can use all objects from the block or
         the om object, in this case we don't need anything from the block
         except the newly defined set MYFLOWS.
         """
         expr = (om.flow[s, e, t] >= om.flows[s, e].outflow_share[t] *
-                sum(om.flow[i, o, t] for (i, o) in om.FLOWS if o == e))
+                sum(om.flow[adjacency.nodes[i], e, t]
+                    for i in adjacency.predecessors(e)))
         return expr
 
     myblock.inflow_share = po.Constraint(myblock.MYFLOWS, om.TIMESTEPS,